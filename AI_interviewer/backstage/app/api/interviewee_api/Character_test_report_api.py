@@ -1,16 +1,25 @@
 # Character_test_report_api.py
 import json
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from openai import OpenAI
+from sqlalchemy import select, update
+from sqlalchemy.orm import undefer
 
 # 引入你的 Pydantic 模型 (schemas)
 from app.schemas.Character_test_report import ReportSchema
 # 引入数据库会话依赖
-from app.db.session import get_db
+from app.db.session import get_db, AsyncSessionLocal
+from app.core.config import settings
 from app.core.get_user import get_current_user_id 
 from app.models.Character_answer import Character_answer
+from app.utils.llm_gateway import chat_completion, stream_chat_completion, PROVIDER_DEEPSEEK
+from app.utils.incremental_json import IncrementalJSONObjectParser
+from app.utils.single_flight import single_flight
+from app.utils.report_cache import get_cached_report, set_cached_report, get_cache_stats
+from app.utils.job_queue import STATUS_PENDING, STATUS_RUNNING, STATUS_FAILED, STATUS_DONE
+from app.utils.report_jobs import report_queue, enqueue_report_job
 
 router = APIRouter()
 
@@ -139,66 +148,9 @@ def _force_clean_llm_lists(report: dict) -> dict:
         
     return report
 
-@router.get("/generate_report", response_model=ReportSchema)
-async def generate_report(
-    current_user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
-):
-    """
-    根据数据库中的问答对生成测试报告。
-    逻辑：优先读取数据库已有的分析结果；如果没有，则调用 AI 生成并保存。
-    """
-    # 1. 取该用户最新一条记录
-    result = await db.execute(
-        select(Character_answer)
-        .where(Character_answer.userId == current_user_id)
-        .order_by(Character_answer.submissionTime.desc())
-        .limit(1)
-    )
-    record = result.scalar_one_or_none()
-
-    if not record:
-        # 无记录时，返回一个完整的空结构（包含新增字段），避免前端渲染报错
-        empty_report = {
-            "total": 0,
-            "personality_type": "",
-            "career_preferences": [],
-            "strengths": [],
-            "weaknesses": [],
-            "summary": "尚未提交任何问卷数据，无法生成测试报告。",
-        }
-        empty_report = _ensure_extended_fields(empty_report)
-        return ReportSchema(**empty_report)
 
-    # =================================================================
-    # NEW: 检查数据库中是否已经有分析结果 (缓存机制)
-    # =================================================================
-    # 假设数据库模型中的字段名为 analysis_report (请确保 models/Character_answer.py 中有此字段)
-    if record.analysis_report:
-        print("✅ 命中缓存：直接从数据库返回分析报告，无需调用 AI。")
-        # 直接将数据库存储的 JSON (字典) 转为 Schema 返回
-        # 如果数据库存的是字符串，这里需要 json.loads(record.analysis_report)
-        cached = record.analysis_report
-        cached = _ensure_extended_fields(cached)
-        # 可选：补齐后回写一次，保证后续直接命中完整字段
-        try:
-            record.analysis_report = cached
-            await db.commit()
-            await db.refresh(record)
-        except Exception:
-            await db.rollback()
-        return ReportSchema(**cached)
-
-    # =================================================================
-    # 如果数据库中 analysis_report 为 NULL，则执行 AI 分析流程
-    # =================================================================
-    print("⏳ 未找到缓存报告，正在调用 AI 进行分析...")
-
-    qa_list = record.question_and_answer  # 这是 JSON 列表
-
-    # -----------------------------
-    # 生成 Prompt
-    # -----------------------------
+def _build_report_prompt(qa_list: list) -> str:
+    """根据问答对拼出报告生成的 Prompt"""
     qa_text = "\n".join([
         f"Q{idx}: {qa['question']}\nA{idx}: {qa['answer']}\n"
         for idx, qa in enumerate(qa_list, 1)
@@ -242,40 +194,21 @@ async def generate_report(
 
 请输出纯 JSON，严禁使用 markdown 代码块包裹。
 """
+    return prompt
 
-    # -----------------------------
-    # 调用 LLM 生成报告
-    # -----------------------------
-    raw_text = ""
-    try:
-        # 建议加上 timeout 防止请求卡死
-        client = OpenAI(
-            api_key="sk-3615ad3d723a4578b7a36dd23de7b398", 
-            base_url="https://api.deepseek.com",
-            timeout=60.0 # 设置 60秒超时
-        )
 
-        completion = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": "你是一名资深职业性格与职业规划分析专家，精通 MBTI 理论及其在职业发展中的应用。"},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.2
-        )
-        
-        raw_text = completion.choices[0].message.content.strip()
-        print(raw_text)
-    except Exception as e:
-        print("❌ LLM API 调用失败：", e)
-        # 这里可以选择抛出异常，或者返回一个空的报告结构
-        raise HTTPException(500, f"大模型接口调用失败: {str(e)}")
+# Prompt 版本号：修改 _build_report_prompt / REPORT_SYSTEM_PROMPT 后务必递增，旧缓存会自动失效
+REPORT_PROMPT_VERSION = "v1"
+
+REPORT_SYSTEM_PROMPT = "你是一名资深职业性格与职业规划分析专家，精通 MBTI 理论及其在职业发展中的应用。"
+
+
+def _parse_report_text(raw_text: str) -> dict:
+    """
+    解析大模型返回的文本为报告字典，并完成清洗与字段补齐。
+    """
+    raw_text = (raw_text or "").strip()
 
-    # -----------------------------
-    # 解析 JSON
-    # -----------------------------
-    report_json = {}
-    
     # 简单的清洗逻辑，防止 AI 返回 ```json 包裹
     if raw_text.startswith("```json"):
         raw_text = raw_text.replace("```json", "").replace("```", "")
@@ -287,28 +220,331 @@ async def generate_report(
     except json.JSONDecodeError:
         print("❌ LLM 返回格式不规范：", raw_text)
         raise HTTPException(500, "大模型返回了非 JSON 内容")
-    # ==========================================
-    # 【新增代码】在此处调用清洗函数，修复格式错误
-    # ==========================================
-    report_json = _force_clean_llm_lists(report_json) 
-    # ==========================================
 
-    # 原有的补齐字段逻辑保持不变
+    # 强制清洗列表字段，修复格式错误
+    report_json = _force_clean_llm_lists(report_json)
+    # 补齐扩展字段
     report_json = _ensure_extended_fields(report_json)
+    return report_json
+
+
+async def _call_report_llm(qa_list: list) -> dict:
+    """
+    通过共享的异步网关调用 DeepSeek 生成报告（不阻塞事件循环）。
+    """
+    prompt = _build_report_prompt(qa_list)
+    try:
+        raw_text = await chat_completion(
+            PROVIDER_DEEPSEEK,
+            messages=[
+                {"role": "system", "content": REPORT_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.2
+        )
+        print(raw_text)
+    except Exception as e:
+        print("❌ LLM API 调用失败：", e)
+        raise HTTPException(500, f"大模型接口调用失败: {str(e)}")
+
+    return _parse_report_text(raw_text)
+
+
+async def _stream_report_llm(qa_list: list, emit) -> dict:
+    """
+    流式调用 DeepSeek：
+    - 每段原始输出通过 emit("delta", ...) 推送
+    - 顶层字段一旦完整 (personality_type / strengths / competency_radar ...) 通过 emit("field", ...) 推送
+    最后对完整文本做与非流式接口相同的清洗与补齐。
+    """
+    prompt = _build_report_prompt(qa_list)
+    parser = IncrementalJSONObjectParser()
+    chunks = []
+    try:
+        async for delta in stream_chat_completion(
+            PROVIDER_DEEPSEEK,
+            messages=[
+                {"role": "system", "content": REPORT_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.2
+        ):
+            chunks.append(delta)
+            emit("delta", {"text": delta})
+            for name, value in parser.feed(delta):
+                emit("field", {"name": name, "value": value})
+    except Exception as e:
+        print("❌ LLM 流式调用失败：", e)
+        raise HTTPException(500, f"大模型接口调用失败: {str(e)}")
+
+    return _parse_report_text("".join(chunks))
+
+
+async def _save_report(record_id: int, report_json: dict):
+    """用独立会话回写报告（流式响应期间请求级的 db 会话可能已经关闭）"""
+    async with AsyncSessionLocal() as session:
+        try:
+            await session.execute(
+                update(Character_answer)
+                .where(Character_answer.id == record_id)
+                .values(analysis_report=report_json)
+            )
+            await session.commit()
+            print("✅ 数据库更新成功！")
+        except Exception as e:
+            print(f"⚠️ 报告已生成但保存数据库失败: {e}")
+            await session.rollback()
+
+
+def _sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# =================================================================
+# 后台预生成：提交问卷时入队 (app/utils/report_jobs.py)，由独立 worker 进程 (app/utils/report_worker.py) 消费
+# =================================================================
+async def generate_report_for_answer(answer_id: int):
+    """
+    worker 使用：为指定答卷生成报告并写入 analysis_report。
+    与流式接口共用同一个 single-flight key，同一份答卷只会调用一次模型。
+    """
+    async def _generate_and_save():
+        async with AsyncSessionLocal() as session:
+            record = await session.get(
+                Character_answer, answer_id,
+                options=[undefer(Character_answer.question_and_answer)]
+            )
+            if record is None:
+                print(f"⚠️ 答卷不存在，跳过: {answer_id}")
+                return None
+            if record.analysis_report:
+                return _ensure_extended_fields(record.analysis_report)
+            qa_list = record.question_and_answer
+
+        # 相同问答对 (与用户无关) 直接复用已生成的报告
+        report_json = await get_cached_report(qa_list, REPORT_PROMPT_VERSION)
+        if report_json is None:
+            print(f"⏳ 正在调用 AI 为答卷 {answer_id} 生成报告...")
+            report_json = await _call_report_llm(qa_list)
+            await set_cached_report(qa_list, REPORT_PROMPT_VERSION, report_json)
+
+        print("💾 正在将新生成的报告保存到数据库...")
+        await _save_report(answer_id, report_json)
+        return report_json
+
+    return await single_flight(f"character_report:{answer_id}", _generate_and_save)
+
+
+@router.get("/generate_report", response_model=ReportSchema)
+async def generate_report(
+    response: Response,
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    读取最新一份答卷的测试报告（纯读取，不在请求内调用大模型）。
+    报告由提交问卷时入队的后台任务生成；尚未生成时返回 status=pending (HTTP 202)，前端轮询即可。
+    """
+    # 1. 取该用户最新一条记录（走 (userId, submissionTime) 复合索引；question_and_answer 延迟加载，不读取）
+    result = await db.execute(
+        select(Character_answer)
+        .where(Character_answer.userId == current_user_id)
+        .order_by(Character_answer.submissionTime.desc())
+        .limit(1)
+    )
+    record = result.scalar_one_or_none()
+
+    if not record:
+        # 无记录时，返回一个完整的空结构（包含新增字段），避免前端渲染报错
+        empty_report = {
+            "total": 0,
+            "personality_type": "",
+            "career_preferences": [],
+            "strengths": [],
+            "weaknesses": [],
+            "summary": "尚未提交任何问卷数据，无法生成测试报告。",
+        }
+        empty_report = _ensure_extended_fields(empty_report)
+        return ReportSchema(**empty_report)
 
     # =================================================================
-    # NEW: 将生成的报告回写到数据库 (更新操作)
+    # 数据库中已经有分析结果，直接返回
     # =================================================================
-    try:
+    if record.analysis_report:
+        print("✅ 命中缓存：直接从数据库返回分析报告，无需调用 AI。")
+        cached = _ensure_extended_fields(record.analysis_report)
+        return ReportSchema(**cached)
+
+    # =================================================================
+    # 报告尚未生成：查看后台任务状态
+    # =================================================================
+    job = await report_queue.get_status(str(record.id))
+    report_status = job["status"] if job else None
+
+    # 历史答卷没有任务 (或状态已过期) / 任务完成但报告缺失：补排队一次，
+    # 冷却期内不再重复，避免前端每次轮询都触发一次付费的模型调用。
+    # 失败的任务已在队列内按 REPORT_JOB_MAX_ATTEMPTS 重试过，这里不再重排，直接返回 failed
+    if report_status in (None, STATUS_DONE):
+        if await report_queue.claim_once(f"requeue:{record.id}", settings.REPORT_REQUEUE_COOLDOWN_SECONDS):
+            await enqueue_report_job(record.id)
+
+    # 只有报告未生成时才需要问答对（用于 total）
+    await db.refresh(record, attribute_names=["question_and_answer"])
+    pending_report = _ensure_extended_fields({
+        "total": len(record.question_and_answer or []),
+        "personality_type": "",
+        "career_preferences": [],
+        "strengths": [],
+        "weaknesses": [],
+        "summary": "报告生成失败，请点击“重新生成”重试。" if report_status == STATUS_FAILED else "报告正在生成中，请稍后刷新。",
+    })
+    pending_report["status"] = STATUS_FAILED if report_status == STATUS_FAILED else STATUS_PENDING
+    response.status_code = 202
+    return ReportSchema(**pending_report)
+
+
+@router.post("/retry_report", status_code=202)
+async def retry_report(
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    重新生成最新一份答卷的报告 (报告生成失败、重试次数用完之后由用户手动触发)。
+    每份答卷在 REPORT_RETRY_COOLDOWN_SECONDS 内只能触发一次，避免反复点击产生付费的模型调用
+    """
+    result = await db.execute(
+        select(Character_answer.id, Character_answer.analysis_report)
+        .where(Character_answer.userId == current_user_id)
+        .order_by(Character_answer.submissionTime.desc())
+        .limit(1)
+    )
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="尚未提交任何问卷")
+    if row.analysis_report:
+        raise HTTPException(status_code=409, detail="报告已生成")
+
+    job = await report_queue.get_status(str(row.id))
+    if job and job["status"] in (STATUS_PENDING, STATUS_RUNNING):
+        return {"status": STATUS_PENDING}
+
+    if not await report_queue.claim_once(f"retry:{row.id}", settings.REPORT_RETRY_COOLDOWN_SECONDS):
+        raise HTTPException(status_code=429, detail="操作过于频繁，请稍后再试")
+    await enqueue_report_job(row.id)
+    return {"status": STATUS_PENDING}
+
+
+@router.get("/report_cache_stats")
+async def report_cache_stats():
+    """报告缓存命中 / 未命中统计"""
+    return await get_cache_stats()
+
+
+@router.get("/generate_report_stream")
+async def generate_report_stream(
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    /generate_report 的流式版本 (Server-Sent Events)。
+    事件类型：
+    - status：连接建立后立即发送
+    - delta：模型原始输出片段
+    - field：某个顶层字段已完整，例如 {"name": "personality_type", "value": "INFP"}
+    - done：最终报告（与 /generate_report 的返回结构一致）
+    - error：生成失败
+    """
+    result = await db.execute(
+        select(Character_answer)
+        .options(undefer(Character_answer.question_and_answer))
+        .where(Character_answer.userId == current_user_id)
+        .order_by(Character_answer.submissionTime.desc())
+        .limit(1)
+    )
+    record = result.scalar_one_or_none()
+
+    record_id = record.id if record else None
+    qa_list = record.question_and_answer if record else None
+    existing_report = record.analysis_report if record else None
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: str, data):
+        queue.put_nowait((event, data))
+
+    async def _stream_and_save() -> dict:
+        # 领头者再确认一次数据库，防止其他请求刚刚写完
+        async with AsyncSessionLocal() as session:
+            latest = await session.scalar(
+                select(Character_answer.analysis_report).where(Character_answer.id == record_id)
+            )
+        if latest:
+            return _ensure_extended_fields(latest)
+
+        report_json = await get_cached_report(qa_list, REPORT_PROMPT_VERSION)
+        if report_json is None:
+            print("⏳ 未找到缓存报告，正在流式调用 AI 进行分析...")
+            report_json = await _stream_report_llm(qa_list, emit)
+            await set_cached_report(qa_list, REPORT_PROMPT_VERSION, report_json)
+
         print("💾 正在将新生成的报告保存到数据库...")
-        record.analysis_report = report_json # 更新字段
-        await db.commit()       # 提交事务
-        await db.refresh(record) # 刷新数据
-        print("✅ 数据库更新成功！")
-    except Exception as e:
-        print(f"⚠️ 报告已生成但保存数据库失败: {e}")
-        # 这里即使保存失败，为了用户体验，也可以先把结果返回给前端
-        # 但通常建议 rollback 防止事务锁死
-        await db.rollback()
+        await _save_report(record_id, report_json)
+        return report_json
+
+    async def _run() -> dict:
+        try:
+            # 与非流式接口共用同一个 single-flight key：跟随者不会再次调用模型
+            return await single_flight(f"character_report:{record_id}", _stream_and_save)
+        finally:
+            queue.put_nowait(None)
+
+    async def event_source():
+        yield _sse_event("status", {"state": "started"})
+
+        if not record:
+            empty_report = _ensure_extended_fields({
+                "total": 0,
+                "personality_type": "",
+                "career_preferences": [],
+                "strengths": [],
+                "weaknesses": [],
+                "summary": "尚未提交任何问卷数据，无法生成测试报告。",
+            })
+            yield _sse_event("done", ReportSchema(**empty_report).model_dump())
+            return
+
+        if existing_report:
+            print("✅ 命中缓存：直接从数据库返回分析报告，无需调用 AI。")
+            yield _sse_event("done", ReportSchema(**_ensure_extended_fields(existing_report)).model_dump())
+            return
+
+        # 生成任务独立于连接：客户端中途断开时报告仍会生成并入库
+        task = asyncio.create_task(_run())
+        # 客户端断开后没人 await 这个任务，这里消费掉异常，避免 "exception was never retrieved"
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            event, data = item
+            yield _sse_event(event, data)
 
-    return ReportSchema(**report_json)
+        try:
+            report_json = await task
+            yield _sse_event("done", ReportSchema(**report_json).model_dump())
+        except HTTPException as e:
+            yield _sse_event("error", {"detail": e.detail})
+        except TimeoutError:
+            yield _sse_event("error", {"detail": "报告正在生成中，请稍后重试"})
+        except Exception as e:
+            print(f"❌ 流式报告生成失败: {e}")
+            yield _sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # 防止 Nginx 缓冲导致首包延迟
+        },
+    )
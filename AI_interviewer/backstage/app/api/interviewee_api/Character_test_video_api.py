@@ -2,8 +2,8 @@
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, status
 import os
-from jose import jwt, JWTError
-from app.core.config import settings
+from jose import JWTError
+from app.core.get_user import verify_token
 
 router = APIRouter()
 
@@ -27,23 +27,10 @@ async def websocket_video_stream(
 
     # --- 🔒 身份验证与 ID 解析 ---
     try:
-        # 1. 解码 Token
-        payload = jwt.decode(
-            token, 
-            settings.SECRET_KEY, 
-            algorithms=[settings.ALGORITHM]
-        )
-        
-        # 2. 从 Token 中提取 user_id (通常在 'sub' 字段)
-        # 如果你的 token 里存 ID 的字段叫 'id' 或 'user_id'，请这里相应修改
-        current_user_id = payload.get("sub")
+        # 与 HTTP 接口共用已验证 Token 缓存，同一个 Token 只做一次签名校验
+        current_user_id = verify_token(token).sub
 
-        if current_user_id is None:
-            print("Token invalid: No user ID found in token")
-            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-            return
-
-    except JWTError as e:
+    except (JWTError, ValueError, TypeError) as e:
         print(f"Token validation failed: {e}")
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
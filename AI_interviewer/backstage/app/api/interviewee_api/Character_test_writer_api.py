@@ -1,16 +1,16 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func  # 引入 select 用于查询, func 用于数据库函数
+from typing import Literal, Optional
 
 # 引入你的 Pydantic 模型 (schemas)
-from app.schemas.Character_test_writer_problem import SurveyQuestion, SurveyResponse
-# 引入你的 ORM 模型 (models)
-from app.models.Character_question import Character_question
+from app.schemas.Character_test_writer_problem import SurveyResponse
 # 引入数据库会话依赖
 from app.db.session import get_db
 from app.schemas.Character_test_writer_problem import SurveySubmissionSchema
 from app.core.get_user import get_current_user_id 
 from app.models.Character_answer import Character_answer  # 导入你的模型
+from app.utils.report_jobs import enqueue_report_job
+from app.utils.question_bank import get_question_bank
 
 router = APIRouter()
 
@@ -18,54 +18,34 @@ router = APIRouter()
 # 2. 通过变量设置题目数量
 # ===================================================================
 # 你可以在这里修改，来控制最终问卷的题目总数
+# 题库已在内存中建好索引，调大这个值不会增加数据库压力
 TOTAL_QUESTIONS_TO_FETCH = 5
+# 单次问卷最多返回的题目数 (分层模式 per_type × 维度数 也不会超过它)
+MAX_QUESTIONS_TO_FETCH = 50
 
 
 @router.get("/questions", response_model=SurveyResponse)
 async def get_survey_questions(
+    mode: Literal["random", "stratified"] = Query("random", description="random：完全随机；stratified：按维度 (type) 分层抽题"),
+    per_type: Optional[int] = Query(None, ge=1, le=20, description="仅 mode=stratified 可用：每个维度抽取的题目数，不传则按总题数平均分配；总数不超过 MAX_QUESTIONS_TO_FETCH"),
     db: AsyncSession = Depends(get_db),
     current_user_id: str = Depends(get_current_user_id) 
     ):
     """
-    从数据库中随机获取指定数量的问卷题目列表
+    从题库中随机获取指定数量的问卷题目列表
+    题库在进程内建好索引（见 app/utils/question_bank.py），抽题为 O(k)，不再 ORDER BY random() 全表扫描
     """
-    
-    # ===================================================================
-    # 3. 从数据表中随机抽取题目
-    # ===================================================================
-    # 构建查询语句：
-    # - select(Character_question): 选择要查询的表
-    # - order_by(func.random()): 按随机顺序排序。
-    #   注意: func.random() 适用于 PostgreSQL 和 SQLite。
-    #   如果你的数据库是 MySQL，请使用 func.rand()
-    # - limit(TOTAL_QUESTIONS_TO_FETCH): 限制返回的记录数量
-    
-    # 假设你使用的是 PostgreSQL 或 SQLite
-    stmt = select(Character_question).order_by(func.random()).limit(TOTAL_QUESTIONS_TO_FETCH)
-    
-    # 如果你用的是 MySQL，请使用下面这行代替
-    # stmt = select(Character_question).order_by(func.rand()).limit(TOTAL_QUESTIONS_TO_FETCH)
-
-    # 执行查询
-    result = await db.execute(stmt)
-    # 获取所有查询到的 ORM 对象实例
-    db_questions = result.scalars().all()
+    if per_type is not None and mode != "stratified":
+        raise HTTPException(status_code=422, detail="per_type 仅在 mode=stratified 时可用")
 
-    # ===================================================================
-    # 1. 将数据库数据格式化为接口需要的格式
-    # ===================================================================
-    # 将从数据库取出的 ORM 对象列表，转换为 Pydantic 模型列表
-    questions_data = []
-    for db_question in db_questions:
-        # 数据库里的 answers 字段是 JSON，SQLAlchemy 会自动将其解析为 Python 的 list of dicts,
-        # Pydantic 可以直接用它来填充 options
-        question = SurveyQuestion(
-            id=str(db_question.id),          # 将数据库的 int 类型 id 转为 str
-            title=db_question.questions,
-            required=True,                   # 根据需要可以设为 True 或 False
-            options=db_question.answers
+    bank = await get_question_bank(db)
+    if mode == "stratified":
+        # 分层抽题：保证每个维度都有题，避免 5 道题全部落在同一个 MBTI 维度上
+        questions_data = bank.sample_stratified(
+            TOTAL_QUESTIONS_TO_FETCH, per_type=per_type, max_total=MAX_QUESTIONS_TO_FETCH
         )
-        questions_data.append(question)
+    else:
+        questions_data = bank.sample(TOTAL_QUESTIONS_TO_FETCH)
 
     # 返回符合 SurveyResponse 模型的最终结果
     return SurveyResponse(code=200, msg="success", data=questions_data)
@@ -105,4 +85,12 @@ async def submit_survey_data(
         print(f"数据库保存失败: {e}")
         return {"code": 500, "msg": "服务器内部错误，保存失败", "data": None}
 
+    # 提交成功后立即排队生成报告，用户打开报告页时大概率已经生成完毕
+    try:
+        await enqueue_report_job(new_record.id)
+        print(f"📮 报告生成任务已入队: {new_record.id}")
+    except Exception as e:
+        # 入队失败不影响提交结果，读取报告时会自动补排队
+        print(f"⚠️ 报告生成任务入队失败: {e}")
+
     return {"code": 200, "msg": "提交成功", "data": {"user_id": current_user_id}}
\ No newline at end of file
@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from typing import List
+from sqlalchemy import select, desc, or_, and_
+from typing import List, Optional
+from datetime import datetime
+import asyncio
+import base64
+import json
 
 from app.db.session import get_db
-from app.core.get_user import get_current_user_id, get_current_user_int_id
+from app.core.get_user import get_current_user_id, get_current_user_int_id, get_current_principal, Principal
 from app.models.Interview_record import Interview_record
 from app.models.Interview_position import Interview_position
 from app.models.Interviewer import Interviewer
-from app.schemas.Interview_record import InterviewRecordCreate, InterviewRecord
+from app.schemas.Interview_record import InterviewRecordCreate, InterviewRecord, InterviewRecordPage
+from app.utils.video_session import is_valid_session_id, load_session
 
 router = APIRouter()
 
@@ -16,47 +21,88 @@ router = APIRouter()
 async def create_record(
     record_in: InterviewRecordCreate,
     current_user_id: int = Depends(get_current_user_int_id),
+    principal: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db)
 ):
+    # 录像会话必须是当前用户自己上传的 (视频会话按 Token 的 sub 记录归属)
+    if record_in.video_session_id:
+        session = None
+        if is_valid_session_id(record_in.video_session_id):
+            session = await asyncio.to_thread(load_session, record_in.video_session_id)
+        if session is None or session.user_id != principal.sub:
+            raise HTTPException(status_code=400, detail="录像会话不存在")
+
     new_record = Interview_record(
         user_id=current_user_id,
         position_id=record_in.position_id,
-        interviewer_id=record_in.interviewer_id
+        interviewer_id=record_in.interviewer_id,
+        video_session_id=record_in.video_session_id
     )
     db.add(new_record)
     await db.commit()
     await db.refresh(new_record)
     return new_record
 
-@router.get("/get_records", response_model=List[InterviewRecord])
+def _encode_cursor(time: datetime, record_id: int) -> str:
+    raw = json.dumps({"t": time.isoformat(), "id": record_id})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(raw["t"]), int(raw["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/get_records", response_model=InterviewRecordPage)
 async def get_records(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor，不传则从最新记录开始"),
     current_user_id: int = Depends(get_current_user_int_id),
     db: AsyncSession = Depends(get_db)
 ):
-    # 查询记录并关联岗位和面试官信息
+    """
+    面试历史（按时间倒序的游标分页）
+    基于 (time, id) 的 keyset 分页，配合 (user_id, time DESC) 复合索引，翻页成本与页码无关
+    """
+    # 只查需要的列，并关联岗位和面试官名称
     stmt = (
-        select(Interview_record, Interview_position.position_name, Interviewer.name)
+        select(
+            Interview_record.id,
+            Interview_record.user_id,
+            Interview_record.position_id,
+            Interview_record.interviewer_id,
+            Interview_record.time,
+            Interview_record.video_session_id,
+            Interview_position.position_name,
+            Interviewer.name.label("interviewer_name")
+        )
         .join(Interview_position, Interview_record.position_id == Interview_position.id)
         .join(Interviewer, Interview_record.interviewer_id == Interviewer.id)
         .where(Interview_record.user_id == current_user_id)
-        .order_by(desc(Interview_record.time))
     )
-    
+
+    if cursor:
+        cursor_time, cursor_id = _decode_cursor(cursor)
+        stmt = stmt.where(
+            or_(
+                Interview_record.time < cursor_time,
+                and_(Interview_record.time == cursor_time, Interview_record.id < cursor_id)
+            )
+        )
+
+    # 多取一条用于判断是否还有下一页
+    stmt = stmt.order_by(desc(Interview_record.time), desc(Interview_record.id)).limit(limit + 1)
+
     result = await db.execute(stmt)
-    records = result.all()
-    
-    # 构造返回数据
-    response_data = []
-    for record, position_name, interviewer_name in records:
-        record_dict = {
-            "id": record.id,
-            "user_id": record.user_id,
-            "position_id": record.position_id,
-            "interviewer_id": record.interviewer_id,
-            "time": record.time,
-            "position_name": position_name,
-            "interviewer_name": interviewer_name
-        }
-        response_data.append(record_dict)
-        
-    return response_data
+    rows = result.mappings().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = _encode_cursor(last["time"], last["id"])
+
+    return {"items": rows, "next_cursor": next_cursor}
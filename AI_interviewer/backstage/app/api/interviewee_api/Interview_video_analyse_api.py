@@ -0,0 +1,166 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+import asyncio
+
+from app.core.get_user import get_current_user_id
+from app.utils.analysis_store import (
+    STAGE_DONE,
+    STAGE_FAILED,
+    STAGE_PENDING,
+    STAGE_RUNNING,
+    load_stages,
+    save_stage,
+)
+from app.utils.audio_analysis import analyze_audio
+from app.utils.video_analysis import analyze_video
+from app.utils.video_session import is_valid_session_id, load_session
+
+router = APIRouter()
+
+# 分析阶段：名称 -> 同步分析函数 (在线程中执行，函数内部自行使用进程池)，各阶段并行执行
+ANALYSIS_STAGES = {
+    "video": analyze_video,
+    "audio": analyze_audio,
+}
+
+# 本进程内正在分析的会话，避免重复启动
+_running: dict[str, asyncio.Task] = {}
+
+
+def start_analysis(session_id: str) -> bool:
+    """在后台启动一个会话的全部分析阶段，已在分析中时返回 False"""
+    task = _running.get(session_id)
+    if task is not None and not task.done():
+        return False
+    task = asyncio.create_task(_run_analysis(session_id))
+    _running[session_id] = task
+    task.add_done_callback(lambda _: _running.pop(session_id, None))
+    return True
+
+
+async def _run_analysis(session_id: str):
+    session = await asyncio.to_thread(load_session, session_id)
+    if session is None:
+        print(f"⚠️ [VideoAnalysis] 会话不存在: {session_id}")
+        return
+    for stage in ANALYSIS_STAGES:
+        await asyncio.to_thread(save_stage, session_id, stage, STAGE_PENDING)
+    await asyncio.gather(*(
+        _run_stage(session, stage, analyze) for stage, analyze in ANALYSIS_STAGES.items()
+    ))
+
+
+async def _run_stage(session, stage: str, analyze):
+    session_id = session.session_id
+    await asyncio.to_thread(save_stage, session_id, stage, STAGE_RUNNING)
+    try:
+        result = await asyncio.to_thread(analyze, session)
+        await asyncio.to_thread(save_stage, session_id, stage, STAGE_DONE, result)
+    except Exception as e:
+        print(f"❌ [VideoAnalysis] {session_id} 阶段 {stage} 失败: {e}")
+        await asyncio.to_thread(save_stage, session_id, stage, STAGE_FAILED, None, str(e))
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, secs = divmod(int(round(seconds)), 60)
+    return f"{minutes}分{secs:02d}秒" if minutes else f"{secs}秒"
+
+
+def _level(value: float, high: float, medium: float) -> str:
+    if value >= high:
+        return "高"
+    if value >= medium:
+        return "中"
+    return "低"
+
+
+def _emotion_tags(video: dict, audio: dict) -> list[dict]:
+    """把画面 / 音频统计转换成报告页的 {name, level} 标签"""
+    tags = []
+    if video:
+        motion = video["motion_energy"]
+        tags += [
+            # 人在镜头前的时间占比
+            {"name": "专注度", "level": _level(video["face_presence_ratio"], 0.8, 0.5)},
+            # 大幅动作越少越稳定
+            {"name": "稳定度", "level": _level(1 - motion["active_ratio"], 0.8, 0.5)},
+            # 适度的动作 / 手势
+            {"name": "表现力", "level": _level(motion["mean"], 0.015, 0.005)},
+        ]
+    if audio:
+        tags += [
+            # 说话时间占比
+            {"name": "表达积极性", "level": _level(audio["talk_ratio"], 0.5, 0.3)},
+            # 平均停顿越短越流畅
+            {"name": "表达流畅度", "level": _level(-audio["pauses"]["mean_seconds"], -0.8, -1.5)},
+        ]
+    return tags
+
+
+def _overall_status(statuses: dict) -> str:
+    values = set(statuses.values())
+    if STAGE_FAILED in values:
+        return STAGE_FAILED
+    if values == {STAGE_DONE}:
+        return STAGE_DONE
+    if STAGE_RUNNING in values:
+        return STAGE_RUNNING
+    return STAGE_PENDING
+
+
+async def _load_owned_session(session_id: str, current_user_id: str):
+    session = None
+    if is_valid_session_id(session_id):
+        session = await asyncio.to_thread(load_session, session_id)
+    if session is None or session.user_id != str(current_user_id):
+        raise HTTPException(status_code=404, detail="录像不存在")
+    return session
+
+
+@router.post("/video_analysis/{session_id}", status_code=status.HTTP_202_ACCEPTED)
+async def trigger_video_analysis(
+    session_id: str,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """(重新) 分析一段已上传完成的录像"""
+    session = await _load_owned_session(session_id, current_user_id)
+    if not session.completed:
+        raise HTTPException(status_code=409, detail="录像尚未上传完成")
+    return {"session_id": session_id, "started": start_analysis(session_id)}
+
+
+@router.get("/video_analysis/{session_id}")
+async def get_video_analysis(
+    session_id: str,
+    response: Response,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    获取录像分析结果。报告页需要的 duration / emotions 直接给出，各阶段原始统计放在对应字段里
+    (video：画面统计；audio：说话时长、停顿分布、响应等待时间、最长静音)。
+    还在分析中时返回 202，客户端轮询即可。
+    """
+    session = await _load_owned_session(session_id, current_user_id)
+    stages = await asyncio.to_thread(load_stages, session_id)
+
+    # 录像已完成但从未分析过 (例如服务重启前没来得及)：补一次
+    if not stages and session.completed:
+        start_analysis(session_id)
+
+    statuses = {stage: stages.get(stage, {}).get("status", STAGE_PENDING) for stage in ANALYSIS_STAGES}
+    overall = _overall_status(statuses)
+    if overall in (STAGE_PENDING, STAGE_RUNNING):
+        response.status_code = status.HTTP_202_ACCEPTED
+
+    video = stages.get("video", {}).get("result")
+    audio = stages.get("audio", {}).get("result")
+    duration = (video or audio or {}).get("duration_seconds")
+    return {
+        "session_id": session_id,
+        "status": overall,
+        "stages": statuses,
+        "errors": {stage: data["error"] for stage, data in stages.items() if data.get("error")},
+        "duration": _format_duration(duration) if duration is not None else "",
+        "emotions": _emotion_tags(video, audio),
+        "video": video,
+        "audio": audio,
+    }
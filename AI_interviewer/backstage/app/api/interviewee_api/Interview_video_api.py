@@ -1,42 +1,100 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, status
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, Query, status
+import asyncio
+import json
 import os
-from datetime import datetime
-from jose import jwt, JWTError
+import struct
+import uuid
+from jose import JWTError
 from app.core.config import settings
+from app.core.get_user import get_current_user_id, verify_token
+from app.api.interviewee_api.Interview_video_analyse_api import start_analysis
+from app.utils.stream_metrics import (
+    StreamStats,
+    active_count,
+    record_close,
+    register_stream,
+    snapshot,
+    unregister_stream,
+)
+from app.utils.video_ingest import BufferedVideoWriter, run_io
+from app.utils.video_session import (
+    SegmentedVideoStore,
+    create_session,
+    is_valid_session_id,
+    load_session,
+    prepare_resume,
+    save_session,
+)
 
 router = APIRouter()
 
 # 确保上传目录存在
-UPLOAD_DIR = "data/videos"
+UPLOAD_DIR = settings.VIDEO_UPLOAD_DIR
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# 可续传协议的二进制帧：8 字节大端序号 + 视频数据
+FRAME_HEADER = struct.Struct(">Q")
+
+# session_id -> 处理该会话的协程任务；同一会话重连时接管旧连接
+_active_streams: dict[str, asyncio.Task] = {}
+
+
+class _SessionBusy(Exception):
+    """旧连接在限定时间内没有退出，新连接暂时不能接管该会话 (客户端稍后重连)"""
+
+
+class _StreamLimitExceeded(Exception):
+    """连接触发配额 (空闲超时 / 会话字节上限)，需要由服务端主动关闭"""
+
+    def __init__(self, reason: str, code: int, detail: str):
+        super().__init__(detail)
+        self.reason = reason   # 指标里的分类：idle / quota
+        self.code = code
+        self.detail = detail
+
+
+@router.get("/video_stream_metrics")
+async def video_stream_metrics(current_user_id: str = Depends(get_current_user_id)):
+    """
+    当前进程的视频流连接指标：活跃连接数、速率、分片大小、落盘延迟、距上一个分片的时间。
+    streams 为全部连接的匿名统计；my_streams 为调用者自己的连接 (含 session_id)
+    """
+    return snapshot(current_user_id)
+
+
 @router.websocket("/ws/video_stream")
 async def websocket_video_stream(
-    websocket: WebSocket, 
-    token: str = Query(...) 
+    websocket: WebSocket,
+    token: str = Query(...)
 ):
     """
     WebSocket 视频流接口
     URL 格式: ws://domain/api/ws/video_stream?token=ey...
+
+    可续传协议（第一条消息为文本）：
+    1. 客户端 -> {"type": "hello", "session_id": 可选，续传时带上}
+       服务端 -> {"type": "ready", "session_id", "next_seq", "offset"}
+    2. 客户端发送二进制帧：8 字节大端 seq + 数据，seq 从 0 连续递增
+       - seq < next_seq：重复分片，直接丢弃
+       - seq > next_seq：服务端回 {"type": "gap", "expected"}，客户端从 expected 开始重发
+    3. 每批数据落盘后服务端回 {"type": "ack", "seq", "offset"}，客户端可丢弃 seq 及之前的分片
+    4. 录制结束客户端发 {"type": "end"}，服务端落盘后回 {"type": "done", "offset"} 并关闭连接
+    第一条消息是二进制时按旧协议处理：不带序号的原始分片直接追加写入。
+    视频按大小 / 时长分段保存在 {VIDEO_UPLOAD_DIR}/{session_id}/，manifest.json 记录各分段的偏移与字节数。
+
+    配额：并发连接超过 VIDEO_MAX_CONCURRENT_STREAMS 时以 1013 关闭 (客户端稍后重试)；
+    会话累计超过 VIDEO_MAX_SESSION_BYTES 时回 {"type": "error", "reason": "max_session_bytes"} 并以 1008 关闭；
+    超过 VIDEO_IDLE_TIMEOUT_SECONDS 没有消息时以 1001 关闭 (会话仍可续传)。关闭前缓冲数据都会落盘。
     """
-    
+
     current_user_id = None
 
     # --- 🔒 身份验证与 ID 解析 ---
     try:
-        payload = jwt.decode(
-            token, 
-            settings.SECRET_KEY, 
-            algorithms=[settings.ALGORITHM]
-        )
-        
-        current_user_id = payload.get("sub")
-        if current_user_id is None:
-            print("Token invalid: No user ID found in token")
-            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-            return
+        # 与 HTTP 接口共用已验证 Token 缓存，同一个 Token 只做一次签名校验
+        current_user_id = verify_token(token).sub
 
-    except JWTError as e:
+    except (JWTError, ValueError, TypeError) as e:
         print(f"Token validation failed: {e}")
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
@@ -47,19 +105,254 @@ async def websocket_video_stream(
 
     # --- ✅ 验证通过，建立连接 ---
     await websocket.accept()
-    
-    # --- 修改点：在文件名后加时间戳 ---
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_path = os.path.join(UPLOAD_DIR, f"{current_user_id}_interview_{timestamp}.webm")
-    print(f"User {current_user_id} connected. Saving to {file_path}")
-    
+
+    stats = register_stream(uuid.uuid4().hex, current_user_id, settings.VIDEO_MAX_CONCURRENT_STREAMS)
+    if stats is None:
+        print(f"⚠️ Too many video streams ({active_count()}), rejecting user {current_user_id}")
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="too_many_streams")
+        return
+
+    try:
+        try:
+            first = await _receive_message(websocket, stats)
+        except WebSocketDisconnect:
+            print(f"User {current_user_id} disconnected before sending data")
+            return
+        except _StreamLimitExceeded as e:
+            await _close_for_limit(websocket, e)
+            return
+
+        if first.get("bytes") is not None:
+            await _legacy_stream(websocket, current_user_id, first["bytes"], stats)
+        else:
+            await _resumable_stream(websocket, current_user_id, first.get("text"), stats)
+    finally:
+        unregister_stream(stats)
+
+
+async def _receive_message(websocket: WebSocket, stats: StreamStats) -> dict:
+    try:
+        message = await asyncio.wait_for(websocket.receive(), timeout=settings.VIDEO_IDLE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise _StreamLimitExceeded("idle", status.WS_1001_GOING_AWAY, "idle_timeout")
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", status.WS_1000_NORMAL_CLOSURE))
+    if message.get("bytes") is not None:
+        stats.record_chunk(len(message["bytes"]))
+    return message
+
+
+def _check_session_quota(total_bytes: int):
+    if total_bytes > settings.VIDEO_MAX_SESSION_BYTES:
+        raise _StreamLimitExceeded("quota", status.WS_1008_POLICY_VIOLATION, "max_session_bytes")
+
+
+async def _close_for_limit(websocket: WebSocket, limit: _StreamLimitExceeded, send_json=None):
+    """
+    缓冲数据落盘之后调用：超出会话配额时先告诉客户端原因 (客户端收到 error 后不再重连)，再正常关闭；
+    空闲超时只关闭连接，客户端仍可带 session_id 续传
+    """
+    record_close(limit.reason)
+    try:
+        if send_json is not None and limit.reason == "quota":
+            await send_json({"type": "error", "reason": limit.detail})
+        await websocket.close(code=limit.code, reason=limit.detail)
+    except Exception as e:
+        print(f"Error closing video stream: {e}")
+
+
+async def _legacy_stream(websocket: WebSocket, current_user_id, first_chunk: bytes, stats: StreamStats):
+    """旧协议：不带序号的原始分片，断线即结束"""
+    session = await run_io(create_session, current_user_id)
+    stats.session_id = session.session_id
+    print(f"User {current_user_id} connected. Saving to {session.directory}")
+
+    # 缓冲写入：分片先进内存，批量在线程池中落盘，不阻塞事件循环
+    writer = BufferedVideoWriter(SegmentedVideoStore(session), stats=stats)
+    limit = None
     try:
-        with open(file_path, "ab") as video_file:
-            while True:
-                data = await websocket.receive_bytes()
-                video_file.write(data)
-                
+        await writer.open()
+        data = first_chunk
+        received = 0
+        while True:
+            received += len(data)
+            _check_session_quota(received)
+            # 磁盘跟不上时这里会等待（背压），暂停读取 WebSocket
+            await writer.write(data)
+            data = None
+            while data is None:
+                data = (await _receive_message(websocket, stats)).get("bytes")
+
     except WebSocketDisconnect:
         print(f"User {current_user_id} disconnected")
+    except _StreamLimitExceeded as e:
+        print(f"User {current_user_id} video stream closed: {e.detail}")
+        limit = e
+    except Exception as e:
+        print(f"Error processing video stream: {e}")
+    finally:
+        try:
+            await writer.close()
+            print(f"User {current_user_id} video saved: {session.directory} "
+                  f"({writer.bytes_written} bytes, {len(session.segments)} segments)")
+        except Exception as e:
+            print(f"Error closing video file: {e}")
+        if limit is not None:
+            await _close_for_limit(websocket, limit)
+
+
+async def _take_over(session_id: str):
+    """
+    同一会话的旧连接还没察觉断线时，取消它并等它的任务真正结束 (缓冲数据落盘、分段文件关闭)，
+    之后新连接才能写同一组分段；超时仍未结束时抛出 _SessionBusy
+    """
+    task = _active_streams.get(session_id)
+    if task is None or task.done():
+        return
+    print(f"Session {session_id} reconnected, taking over the previous connection")
+    task.cancel()
+    done, _ = await asyncio.wait({task}, timeout=settings.VIDEO_FLUSH_INTERVAL_SECONDS * 2)
+    if not done:
+        print(f"⚠️ Session {session_id} previous connection did not finish in time")
+        raise _SessionBusy(session_id)
+
+
+async def _open_session(current_user_id, hello: dict):
+    """新建或恢复一个上传会话，无法续传时返回 None"""
+    session_id = hello.get("session_id")
+
+    if not session_id:
+        return await run_io(create_session, current_user_id)
+
+    session = None
+    if is_valid_session_id(session_id):
+        session = await run_io(load_session, session_id)
+    if session is None or session.user_id != str(current_user_id) or session.completed:
+        return None
+
+    await _take_over(session_id)
+    # 旧连接关闭时可能又推进了进度，重新读取一次
+    session = await run_io(load_session, session_id)
+    await run_io(prepare_resume, session)
+    return session
+
+
+async def _resumable_stream(websocket: WebSocket, current_user_id, hello_text: str, stats: StreamStats):
+    try:
+        hello = json.loads(hello_text or "")
+    except json.JSONDecodeError:
+        hello = None
+    if not isinstance(hello, dict) or hello.get("type") != "hello":
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="expected hello")
+        return
+
+    try:
+        session = await _open_session(current_user_id, hello)
+    except _SessionBusy:
+        # 不发 error：客户端按退避策略重连即可
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="session_busy")
+        return
+    if session is None:
+        await websocket.send_text(json.dumps({"type": "error", "reason": "session_not_resumable"}))
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    session_id = session.session_id
+    stats.session_id = session_id
+    current_task = asyncio.current_task()
+    _active_streams[session_id] = current_task
+
+    # ack 由落盘协程发送，和主循环里的 gap 消息共用一把锁，避免并发写 WebSocket
+    send_lock = asyncio.Lock()
+
+    async def send_json(message: dict):
+        async with send_lock:
+            await websocket.send_text(json.dumps(message))
+
+    async def send_ack(seq, offset):
+        if seq is not None:
+            await send_json({"type": "ack", "seq": seq, "offset": offset})
+
+    writer = BufferedVideoWriter(SegmentedVideoStore(session), ack_hook=send_ack, stats=stats)
+    next_seq = session.next_seq
+    # 会话累计字节数 = 续传起点 + 本连接接收的新数据
+    session_bytes = session.durable_offset
+    gap_reported = None
+    ended = False
+    limit = None
+    print(f"User {current_user_id} session {session_id} ready at seq={next_seq}, offset={session.durable_offset}")
+
+    try:
+        await writer.open()
+        await send_json({
+            "type": "ready",
+            "session_id": session_id,
+            "next_seq": next_seq,
+            "offset": session.durable_offset,
+        })
+
+        while True:
+            message = await _receive_message(websocket, stats)
+            data = message.get("bytes")
+
+            if data is None:
+                try:
+                    control = json.loads(message.get("text") or "{}")
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(control, dict) and control.get("type") == "end":
+                    ended = True
+                    break
+                continue
+
+            if len(data) < FRAME_HEADER.size:
+                continue
+            (seq,) = FRAME_HEADER.unpack_from(data)
+
+            if seq < next_seq:
+                # 重连后客户端重发的、服务端已经收过的分片
+                continue
+            if seq > next_seq:
+                # 中间缺了分片：同一个缺口只提示一次，等客户端从 expected 重发
+                if gap_reported != next_seq:
+                    gap_reported = next_seq
+                    await send_json({"type": "gap", "expected": next_seq})
+                continue
+
+            chunk = data[FRAME_HEADER.size:]
+            session_bytes += len(chunk)
+            _check_session_quota(session_bytes)
+            # 磁盘跟不上时这里会等待（背压），暂停读取 WebSocket
+            await writer.write(chunk, seq=seq)
+            next_seq += 1
+
+    except WebSocketDisconnect:
+        print(f"User {current_user_id} session {session_id} disconnected at seq={next_seq}")
+    except asyncio.CancelledError:
+        # 被新连接接管：finally 里落盘清理完后继续向上抛出取消
+        print(f"User {current_user_id} session {session_id} replaced by a new connection")
+        raise
+    except _StreamLimitExceeded as e:
+        print(f"User {current_user_id} session {session_id} closed: {e.detail}")
+        limit = e
     except Exception as e:
         print(f"Error processing video stream: {e}")
+    finally:
+        try:
+            await writer.close()
+            if ended:
+                session.completed = True
+                await run_io(save_session, session)
+                # 录像完整上传后在后台开始分析
+                start_analysis(session_id)
+                await send_json({"type": "done", "offset": writer.bytes_written})
+                await websocket.close(code=status.WS_1000_NORMAL_CLOSURE)
+            print(f"User {current_user_id} video saved: {session.directory} "
+                  f"({writer.bytes_written} bytes, {len(session.segments)} segments)")
+        except Exception as e:
+            print(f"Error closing video file: {e}")
+        finally:
+            if limit is not None:
+                await _close_for_limit(websocket, limit, send_json)
+            if _active_streams.get(session_id) is current_task:
+                _active_streams.pop(session_id, None)
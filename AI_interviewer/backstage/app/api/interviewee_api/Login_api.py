@@ -9,7 +9,9 @@ from app.db.session import get_db
 from app.models.user import User
 from app.schemas.user import UserCreate, UserResponse
 
-from app.core.security import verify_password, get_password_hash, create_access_token
+from app.core.security import verify_and_update_password, hash_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.refresh_token import issue_refresh_token, rotate_refresh_token, revoke_refresh_token, revoke_user_refresh_tokens
+from app.core.get_user import get_current_user_id
 router = APIRouter()
 
 
@@ -18,6 +20,9 @@ class LoginRequest(BaseModel):
     username: str
     password: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 # --- 定义接口 ---
 @router.get("/")
 def read_root():
@@ -41,20 +46,37 @@ async def login(data: LoginRequest, db: AsyncSession = Depends(get_db)):
     user = result.scalar_one_or_none()  # 获取唯一结果，如果不存在则为 None
 
     # 3. 验证账户和密码
-    # 【修改点 3】: 使用 verify_password 验证密文是否匹配
+    # 【修改点 3】: 在哈希线程池中验证密文是否匹配 (不阻塞事件循环，线程池饱和时返回 429)
     # (data.password 是前端传来的 "123456"，user.password 是数据库里的哈希值)
-    if user and verify_password(data.password, user.password):
+    verified, new_hash = False, None
+    if user:
+        verified, new_hash = await verify_and_update_password(data.password, user.password)
+
+    if verified:
+        # bcrypt 成本因子调整过：用本次登录的明文按新成本重新哈希并写回
+        if new_hash:
+            user.password = new_hash
+            await db.commit()
+            print(f"🔐 [Login] 已按新的成本因子更新用户 {user.id} 的密码哈希")
         
         # 【修改点 4】: 验证成功，生成真正的 JWT Token
         # 我们可以把用户名或用户ID放入 Token 载荷中
         access_token = create_access_token(
             data={"sub": user.username, "id": user.id}
         )
+        # 刷新令牌：访问令牌过期后调用 /refresh 换新，不用重新输入密码
+        try:
+            refresh_token = await issue_refresh_token(user.username, user.id)
+        except Exception as e:
+            print(f"⚠️ [Login] 刷新令牌签发失败，仅返回访问令牌: {e}")
+            refresh_token = None
 
         return {
             "code": 200, 
             "message": "登录成功", 
-            "token": access_token  # 返回真正的加密 Token
+            "token": access_token,  # 返回真正的加密 Token
+            "refresh_token": refresh_token,
+            "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60
         }
     else:
         return {
@@ -62,6 +84,37 @@ async def login(data: LoginRequest, db: AsyncSession = Depends(get_db)):
             "message": "用户名或密码错误"
         }
 
+@router.post("/refresh")
+async def refresh(data: RefreshRequest):
+    """
+    用刷新令牌换新的访问令牌 + 刷新令牌 (旧刷新令牌立即失效)。
+    只查 Redis，不查库、不做密码哈希；令牌无效 / 过期 / 已吊销时返回 401，客户端需重新登录
+    """
+    rotated = await rotate_refresh_token(data.refresh_token)
+    if rotated is None:
+        raise HTTPException(status_code=401, detail="登录已过期，请重新登录")
+    claims, refresh_token = rotated
+    access_token = create_access_token(data={"sub": claims["sub"], "id": claims["id"]})
+    return {
+        "code": 200,
+        "message": "刷新成功",
+        "token": access_token,
+        "refresh_token": refresh_token,
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
+
+@router.post("/logout")
+async def logout(data: RefreshRequest):
+    """退出登录：吊销刷新令牌 (访问令牌在短有效期后自然失效)"""
+    await revoke_refresh_token(data.refresh_token)
+    return {"code": 200, "message": "已退出登录"}
+
+@router.post("/logout_all")
+async def logout_all(current_user_id: str = Depends(get_current_user_id)):
+    """退出所有设备：吊销当前用户的全部刷新令牌 (各设备的访问令牌在短有效期后自然失效)"""
+    await revoke_user_refresh_tokens(current_user_id)
+    return {"code": 200, "message": "已退出所有设备"}
+
 # --- 场景1: 注册用户 (写操作) ---
 # 策略: 写入 MySQL -> 删除可能的缓存
 @router.post("/register", response_model=UserResponse)
@@ -71,7 +124,7 @@ async def register_user(
 ):
     # 【修改点 1】: 获取密码的哈希值（加密）
     # 不再直接存储 user_in.password，而是存储 hashed_password
-    hashed_password = get_password_hash(user_in.password)
+    hashed_password = await hash_password(user_in.password)
 
     new_user = User(
         username=user_in.username,
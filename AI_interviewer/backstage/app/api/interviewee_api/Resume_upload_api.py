@@ -1,96 +1,212 @@
-from fastapi import APIRouter, Form, UploadFile, File, Depends, BackgroundTasks
+from fastapi import APIRouter, Form, UploadFile, File, Depends, HTTPException
+from sqlalchemy import inspect
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
-from app.db.session import AsyncSessionLocal
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.db.session import AsyncSessionLocal, engine
 from app.core.get_user import get_current_user_id
 from app.models.Resume_message import Resume_messages
-from app.utils.qwen_client import call_vl_model_multipage
-import shutil
+from app.core.config import settings
+from app.utils.qwen_client import call_vl_model_multipage, DEFAULT_RESUME_PROMPT
+from app.utils.ocr_cache import make_ocr_cache_key, get_cached_ocr, set_cached_ocr
+from app.utils.job_queue import JobQueue
+import hashlib
 import os
 import asyncio
 import uuid
 
 router = APIRouter()
 
-# === 后台任务处理函数 ===
-async def process_and_save_resume(user_id: str, job_data: dict, file_path: str, resume_text_input: str):
+RESUME_UPLOAD_DIR = "data/resumes"
+
+# 按文件头识别的简历类型 -> 保存时使用的扩展名 (后续解析按扩展名判断类型)
+_MAGIC_TYPES = (
+    (b"%PDF-", ".pdf"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+)
+
+
+def _sniff_extension(head: bytes):
+    for magic, ext in _MAGIC_TYPES:
+        if head.startswith(magic):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def _save_upload(src, user_id: str, max_bytes: int) -> tuple[str, str]:
+    """
+    同步执行 (放在线程里调用)：按块把上传内容写到 RESUME_UPLOAD_DIR，边写边计算 SHA-256
+    - 第一块按文件头判断类型，不是 PDF / 图片直接 415，不落盘
+    - 累计超过 max_bytes 立即停止读取并删除已写部分，返回 413
+    返回 (保存路径, sha256)
+    """
+    chunk_size = settings.RESUME_UPLOAD_CHUNK_BYTES
+    head = src.read(chunk_size)
+    if not head:
+        raise HTTPException(status_code=400, detail="上传的简历文件为空")
+    ext = _sniff_extension(head)
+    if ext is None:
+        raise HTTPException(status_code=415, detail="仅支持 PDF、JPG、PNG、WEBP 格式的简历")
+
+    os.makedirs(RESUME_UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(RESUME_UPLOAD_DIR, f"{user_id}_{uuid.uuid4()}{ext}")
+    digest = hashlib.sha256()
+    total = 0
+    try:
+        with open(path, "wb") as buffer:
+            chunk = head
+            while chunk:
+                total += len(chunk)
+                if total > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"简历文件不能超过 {max_bytes // (1024 * 1024)} MB")
+                digest.update(chunk)
+                buffer.write(chunk)
+                chunk = src.read(chunk_size)
+    except BaseException:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+    return path, digest.hexdigest()
+
+# 冲突 (同一 user_id) 时更新的列：session_id / created_at 保持首次创建时的值
+_UPSERT_UPDATE_COLUMNS = (
+    "job_name", "job_desc", "company_intended", "company_intended_type",
+    "resume_text", "resume_file_text", "resume_file_path",
+)
+
+
+def _upsert_resume_statement(dialect_name: str, values: dict):
+    """
+    按数据库方言生成单条 upsert：
+    MySQL：INSERT ... ON DUPLICATE KEY UPDATE；SQLite / PostgreSQL：INSERT ... ON CONFLICT (user_id) DO UPDATE
     """
-    后台异步处理：
-    1. 调用 DeepSeek-VL2 生成/优化简历文本
+    table = Resume_messages.__table__
+    if dialect_name == "mysql":
+        stmt = mysql_insert(table).values(**values)
+        return stmt.on_duplicate_key_update(
+            **{column: stmt.inserted[column] for column in _UPSERT_UPDATE_COLUMNS}
+        )
+    if dialect_name in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect_name == "sqlite" else postgresql_insert
+        stmt = insert(table).values(**values)
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={column: stmt.excluded[column] for column in _UPSERT_UPDATE_COLUMNS},
+        )
+    raise ValueError(f"不支持的数据库方言: {dialect_name}")
+
+
+def _has_unique_user_id(conn) -> bool:
+    inspector = inspect(conn)
+    table_name = Resume_messages.__tablename__
+    unique_sets = [idx["column_names"] for idx in inspector.get_indexes(table_name) if idx.get("unique")]
+    unique_sets += [uc["column_names"] for uc in inspector.get_unique_constraints(table_name)]
+    return ["user_id"] in unique_sets
+
+
+async def ensure_resume_upsert_index():
+    """
+    upsert 依赖 user_id 上的唯一索引：没有索引时 MySQL 会退化成普通 INSERT 产生重复行，
+    SQLite / PostgreSQL 的 ON CONFLICT 直接报错。API / worker 启动时检查，缺失就拒绝启动
+    """
+    async with engine.connect() as conn:
+        if not await conn.run_sync(_has_unique_user_id):
+            raise RuntimeError(
+                f"{Resume_messages.__tablename__}.user_id 缺少唯一索引，"
+                f"请先运行 app/utils/sync_db.py 去重并建立索引"
+            )
+
+
+# =================================================================
+# 简历解析任务：上传时入队，由独立 worker 进程 (app/utils/resume_worker.py) 消费，
+# 失败按指数退避重试，次数用完进入死信列表
+# =================================================================
+resume_queue = JobQueue("resume_parse", max_attempts=settings.RESUME_JOB_MAX_ATTEMPTS)
+
+
+async def process_and_save_resume(user_id: str, job_data: dict, file_path: str, resume_text_input: str,
+                                  file_sha256: str = None):
+    """
+    worker 使用：
+    1. 调用 DeepSeek-VL2 生成/优化简历文本 (同一文件内容 + Prompt + 模型命中缓存时直接复用)
     2. 存入数据库 (Upsert) - 将用户输入的文本和AI解析的文本分开存储
+    解析失败时岗位信息照常保存，然后抛出异常交给任务队列重试；数据库写入失败同样抛出
     """
     print(f"🔄 [Background] Start processing for User: {user_id}")
     
     # 初始化 AI 解析内容为空
     ai_parsed_content = ""
+    ocr_error = None
     
-    # 1. 如果有文件，调用 VL 模型解析内容
-    if file_path and os.path.exists(file_path):
+    cache_key = None
+    if file_sha256:
+        cache_key = make_ocr_cache_key(file_sha256, DEFAULT_RESUME_PROMPT, settings.SILICON_OCR_MODEL)
+        try:
+            cached_text = await get_cached_ocr(cache_key)
+        except Exception as e:
+            print(f"⚠️ [Background] OCR cache lookup failed: {e}")
+            cached_text = None
+        if cached_text is not None:
+            ai_parsed_content = cached_text
+            print("✅ [Background] Reusing cached OCR result")
+
+    # 1. 如果有文件且没有命中缓存，调用 VL 模型解析内容
+    if not ai_parsed_content and file_path and os.path.exists(file_path):
         print(f"🤖 [Background] Calling DeepSeek-VL2 for file: {file_path}")
         try:
-            # 使用 asyncio.to_thread 将同步的 API 调用放入线程池，避免阻塞事件循环
-            ai_generated_text = await asyncio.to_thread(call_vl_model_multipage, file_path)
-            
-            if ai_generated_text and not ai_generated_text.startswith("Error"):
+            # call_vl_model_multipage 走共享的异步网关，直接 await 即可，不会阻塞事件循环；失败时抛出 ResumeParseError
+            ai_generated_text = await call_vl_model_multipage(file_path)
+        except Exception as e:
+            ai_generated_text = ""
+            ocr_error = str(e)
+            print(f"❌ [Background] AI processing failed: {e}")
+        else:
+            if ai_generated_text.strip():
                 # 修改点：将 API 返回的内容赋值给独立变量，不再拼接到 resume_text
                 ai_parsed_content = ai_generated_text
                 print("✅ [Background] AI parsing successful")
-            elif ai_generated_text.startswith("Error"):
-                 print(f"⚠️ [Background] AI processing returned error: {ai_generated_text}")
-
-        except Exception as e:
-            print(f"❌ [Background] AI processing failed: {e}")
+                # 只缓存真实的模型输出
+                if cache_key:
+                    await set_cached_ocr(cache_key, ai_generated_text)
+            else:
+                ocr_error = "模型返回空内容"
+                print(f"⚠️ [Background] AI processing returned error: {ocr_error}")
 
-    # 2. 数据库操作 (Upsert)
+    # 2. 数据库操作 (Upsert)：user_id 唯一，一条语句完成“不存在则插入、存在则更新”
+    values = {
+        "session_id": str(uuid.uuid4()),   # 只在首次插入时生效
+        "user_id": user_id,
+        "job_name": job_data['job_name'],
+        "job_desc": job_data['job_desc'],
+        "company_intended": job_data['company_name'],
+        "company_intended_type": job_data['company_desc'],
+        # 分别存储用户输入的文本和AI解析的文件文本
+        "resume_text": resume_text_input,      # 用户手动粘贴的文本
+        "resume_file_text": ai_parsed_content, # API返回的文本
+        "resume_file_path": file_path,
+    }
     async with AsyncSessionLocal() as db:
         try:
-            # 检查是否存在该用户的记录
-            stmt = select(Resume_messages).where(Resume_messages.user_id == user_id)
-            result = await db.execute(stmt)
-            existing_record = result.scalars().first()
-            
-            if existing_record:
-                print(f"📝 [Background] Updating existing record for User: {user_id}")
-                # 更新现有记录
-                existing_record.job_name = job_data['job_name']
-                existing_record.job_desc = job_data['job_desc']
-                existing_record.company_intended = job_data['company_name']
-                existing_record.company_intended_type = job_data['company_desc']
-                
-                # 修改点：分别存储用户输入的文本和AI解析的文件文本
-                existing_record.resume_text = resume_text_input     # 用户手动粘贴的文本
-                existing_record.resume_file_text = ai_parsed_content # API返回的文本 (新增字段)
-                
-                existing_record.resume_file_path = file_path
-            else:
-                print(f"🆕 [Background] Creating new record for User: {user_id}")
-                # 创建新记录
-                new_record = Resume_messages(
-                    session_id=str(uuid.uuid4()),
-                    user_id=user_id,
-                    job_name=job_data['job_name'],
-                    job_desc=job_data['job_desc'],
-                    company_intended=job_data['company_name'],
-                    company_intended_type=job_data['company_desc'],
-                    
-                    # 修改点：分别存储
-                    resume_text=resume_text_input,      # 用户手动粘贴的文本
-                    resume_file_text=ai_parsed_content, # API返回的文本 (新增字段)
-                    
-                    resume_file_path=file_path
-                )
-                db.add(new_record)
-            
+            await db.execute(_upsert_resume_statement(db.bind.dialect.name, values))
             await db.commit()
             print(f"✅ [Background] Data saved successfully for User: {user_id}")
             
         except Exception as e:
             print(f"❌ [Background] Database error: {e}")
             await db.rollback()
+            raise
+
+    if ocr_error:
+        raise RuntimeError(f"简历解析失败: {ocr_error}")
 
 @router.post("/upload_resume")
 async def create_interview_session(
-    background_tasks: BackgroundTasks,
     job_name: str = Form(...),
     job_desc: str = Form(""),
     company_name: str = Form(""),
@@ -101,22 +217,28 @@ async def create_interview_session(
 ):
     print(f"📥 [API] Received request from User: {current_user_id}, Job: {job_name}")
 
-    # === 1. 立即保存文件 (主线程/IO线程) ===
-    base_path = "data/resumes"
-    os.makedirs(base_path, exist_ok=True)
-    
+    # === 1. 保存文件：在线程里分块写盘，不阻塞事件循环 ===
     saved_file_path = ""
+    file_sha256 = None
     if resume_file:
-        file_ext = os.path.splitext(resume_file.filename)[1]
-        file_name = f"{current_user_id}_{uuid.uuid4()}{file_ext}"
-        saved_file_path = os.path.join(base_path, file_name)
-        
+        max_bytes = settings.RESUME_MAX_UPLOAD_BYTES
+        # multipart 解析时已经知道大小的，直接拒绝，不再复制
+        if resume_file.size is not None and resume_file.size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"简历文件不能超过 {max_bytes // (1024 * 1024)} MB")
+
         try:
-            with open(saved_file_path, "wb+") as buffer:
-                shutil.copyfileobj(resume_file.file, buffer)
-            print(f"💾 [API] File saved to: {saved_file_path}")
+            saved_file_path, file_sha256 = await asyncio.to_thread(
+                _save_upload, resume_file.file, current_user_id, max_bytes
+            )
+            print(f"💾 [API] File saved to: {saved_file_path} (sha256={file_sha256[:12]})")
+        except HTTPException as e:
+            print(f"⚠️ [API] Resume upload rejected: {e.status_code} {e.detail}")
+            raise
         except Exception as e:
             print(f"❌ [API] File save failed: {e}")
+            saved_file_path, file_sha256 = "", None
+        finally:
+            await resume_file.close()
 
     # === 2. 准备数据包 ===
     job_data = {
@@ -126,14 +248,38 @@ async def create_interview_session(
         "company_desc": company_desc
     }
 
-    # === 3. 添加后台任务 ===
-    background_tasks.add_task(
-        process_and_save_resume,
-        user_id=current_user_id,
-        job_data=job_data,
-        file_path=saved_file_path,
-        resume_text_input=resume_text
-    )
-
-    # === 4. 立即返回成功 ===
-    return {"message": "Upload successful, processing in background", "status": "processing"}
\ No newline at end of file
+    # === 3. 入队解析任务 (持久化在 Redis 中，API 重启不会丢) ===
+    job_id = f"{current_user_id}-{uuid.uuid4().hex}"
+    await resume_queue.enqueue(job_id, {
+        "user_id": current_user_id,
+        "job_data": job_data,
+        "file_path": saved_file_path,
+        "resume_text_input": resume_text,
+        "file_sha256": file_sha256,
+    }, owner=current_user_id)
+
+    # === 4. 立即返回，客户端用 job_id 轮询解析状态 ===
+    return {"message": "Upload successful, processing in background", "status": "processing", "job_id": job_id}
+
+
+@router.get("/upload_resume/status/{job_id}")
+async def get_resume_job_status(
+    job_id: str,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    简历解析任务状态：pending (排队 / 等待重试) / running / done / failed。
+    failed 表示重试次数已用完，任务已进入死信列表，岗位信息已保存但没有简历解析文本。
+    """
+    job = await resume_queue.get_status(job_id)
+    # 归属按入队时记录的 owner 精确比较 (job_id 前缀是用户名，不能用来判断归属)
+    if job is None or job.get("owner") != str(current_user_id):
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "attempts": job.get("attempts", 0),
+        "max_attempts": resume_queue.max_attempts,
+        "retry_at": job.get("retry_at"),
+        "error": job.get("error"),
+    }
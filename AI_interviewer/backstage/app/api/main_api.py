@@ -1,13 +1,24 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.api.interviewee_api import Resume_upload_api
 from .interviewee_api import Interview_video_api
 from app.api.interviewee_api import Login_api   
 from app.db.session import engine, Base
 from app.core.get_user import get_current_user_id
+from app.utils.llm_gateway import close_clients
+from app.utils.video_analysis import shutdown_analysis_pool
+from app.utils.qwen_client import shutdown_render_pool
+from app.core.security import shutdown_hash_executor
+from app.utils.job_queue import run_worker
+from app.utils.report_worker import handle_report_job
+from app.utils.report_jobs import report_queue
+from app.utils.resume_worker import handle_resume_job
+from app.core.config import settings
+import asyncio
 from fastapi import Depends
-from app.api.interviewee_api import Character_test_writer_api,Character_test_report_api, Interview_position_api, Interview_record_api
+from app.api.interviewee_api import Character_test_writer_api,Character_test_report_api, Interview_position_api, Interview_record_api, Interview_video_analyse_api
 app = FastAPI()
 
 # 添加日志中间件，用于调试请求是否到达
@@ -22,6 +33,24 @@ async def log_request_start(request: Request, call_next):
         print(f"❌ [Middleware] Request failed: {request.method} {request.url} - Error: {str(e)}")
         raise e
 
+# 简历上传在解析 multipart 之前按 Content-Length 拒绝超大请求，避免先把整个请求体读进临时文件
+# (没有 Content-Length 的分块请求由上传接口在复制时按实际字节数限制)
+RESUME_UPLOAD_PATH = "/api/interview/upload_resume"
+RESUME_FORM_OVERHEAD_BYTES = 64 * 1024  # 表单文本字段与 multipart 边界的余量
+
+@app.middleware("http")
+async def limit_resume_upload_size(request: Request, call_next):
+    if request.method == "POST" and request.url.path == RESUME_UPLOAD_PATH:
+        length = request.headers.get("content-length")
+        limit = settings.RESUME_MAX_UPLOAD_BYTES + RESUME_FORM_OVERHEAD_BYTES
+        if length and length.isdigit() and int(length) > limit:
+            print(f"⚠️ [Middleware] Resume upload too large: {length} bytes")
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"简历文件不能超过 {settings.RESUME_MAX_UPLOAD_BYTES // (1024 * 1024)} MB"},
+            )
+    return await call_next(request)
+
 # # ==========================================
 # # 关键步骤：解决跨域问题 (CORS)
 # # ==========================================
@@ -36,6 +65,49 @@ async def init_tables():
     async with engine.begin() as conn:
         # 这一步会在数据库里自动创建 users 表
         await conn.run_sync(Base.metadata.create_all)
+    # 已有的旧表不会被 create_all 补索引：简历 upsert 依赖的唯一索引缺失时拒绝启动
+    await Resume_upload_api.ensure_resume_upsert_index()
+
+@app.on_event("startup")
+async def start_local_workers():
+    # JOB_QUEUE_MODE=local 时没有独立 worker 进程，直接在 API 进程内消费队列
+    if report_queue.is_local:
+        app.state.report_worker_task = asyncio.create_task(
+            run_worker(
+                report_queue,
+                handle_report_job,
+                settings.REPORT_WORKER_CONCURRENCY
+            )
+        )
+    if Resume_upload_api.resume_queue.is_local:
+        app.state.resume_worker_task = asyncio.create_task(
+            run_worker(
+                Resume_upload_api.resume_queue,
+                handle_resume_job,
+                settings.RESUME_WORKER_CONCURRENCY
+            )
+        )
+
+@app.on_event("shutdown")
+async def close_llm_clients():
+    # 释放大模型网关的长连接池
+    await close_clients()
+
+@app.on_event("shutdown")
+async def close_analysis_pool():
+    # 录像分析的进程池
+    shutdown_analysis_pool()
+
+@app.on_event("shutdown")
+async def close_render_pool():
+    # 简历 PDF 渲染的进程池
+    shutdown_render_pool()
+
+@app.on_event("shutdown")
+async def close_hash_executor():
+    # 密码哈希线程池
+    shutdown_hash_executor()
+
 @app.get("/")
 async def root():
     return {"message": "AI Interviewer Backend Running"}
@@ -53,8 +125,13 @@ app.include_router(Login_api.router, prefix="/api/interviewee", tags=["interview
 app.include_router(Character_test_writer_api.router, prefix="/api/interviewee", tags=["Interviewee Survey"],dependencies=[Depends(get_current_user_id)])
 app.include_router(Character_test_report_api.router, prefix="/api/interviewee", tags=["Interviewee Survey"],dependencies=[Depends(get_current_user_id)])
 app.include_router(Interview_video_api.router, tags=["video_stream"])
+app.include_router(Interview_video_analyse_api.router, prefix="/api/interviewee", tags=["Video Analysis"], dependencies=[Depends(get_current_user_id)])
 app.include_router(Interview_position_api.router, prefix="/api/interviewee", tags=["Interview Position"], dependencies=[Depends(get_current_user_id)])
 app.include_router(Interview_record_api.router, prefix="/api/interviewee", tags=["Interview Record"], dependencies=[Depends(get_current_user_id)])
 app.include_router(Resume_upload_api.router, prefix="/api/interview", tags=["Interview Create"], dependencies=[Depends(get_current_user_id)])
 # 启动命令（在终端运行）：终端路径需要抵达backstage
-# uvicorn app.api.main_api:app --reload --port 8000
\ No newline at end of file
+# uvicorn app.api.main_api:app --reload --port 8000
+# 性格报告后台 worker（另开终端，同样在 backstage 目录下）：
+# python -m app.utils.report_worker
+# 简历解析后台 worker（同上）：
+# python -m app.utils.resume_worker
\ No newline at end of file
@@ -17,6 +17,136 @@ class Settings(BaseSettings):
     ALGORITHM: str
 
     Silicon_OCR_API_Key: str
+
+    # --- 大模型网关 (app/utils/llm_gateway.py) ---
+    # DeepSeek：性格测试报告生成（Key 必须在 .env 中配置，与 SECRET_KEY 一样没有默认值）
+    DeepSeek_API_Key: str
+    DEEPSEEK_BASE_URL: str = "https://api.deepseek.com"
+    DEEPSEEK_REPORT_MODEL: str = "deepseek-chat"
+
+    # 硅基流动：简历 OCR 多模态模型
+    SILICON_BASE_URL: str = "https://api.siliconflow.cn/v1"
+    SILICON_OCR_MODEL: str = "Qwen/Qwen3-VL-235B-A22B-Thinking"
+
+    # 超时 / 重试 / 连接池 (每个服务商共用一个长连接池)
+    LLM_TIMEOUT_SECONDS: float = 60.0
+    LLM_CONNECT_TIMEOUT_SECONDS: float = 10.0
+    LLM_MAX_RETRIES: int = 2
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    LLM_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+
+    # --- 报告生成请求合并 (app/utils/single_flight.py) ---
+    SINGLE_FLIGHT_LOCK_TTL_SECONDS: float = 180.0
+    SINGLE_FLIGHT_WAIT_TIMEOUT_SECONDS: float = 200.0
+    SINGLE_FLIGHT_POLL_INTERVAL_SECONDS: float = 0.5
+    SINGLE_FLIGHT_RESULT_TTL_SECONDS: int = 60
+
+    # --- 报告内容寻址缓存 (app/utils/report_cache.py) ---
+    REPORT_CACHE_LRU_SIZE: int = 256
+    REPORT_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    REPORT_CACHE_REDIS_MAX_ENTRIES: int = 5000
+
+    # --- 任务队列 (app/utils/job_queue.py) ---
+    # redis：API 入队，独立 worker 进程消费；local：进程内队列，无需 Redis（调试 / 测试用）
+    JOB_QUEUE_MODE: str = "redis"
+    JOB_STATUS_TTL_SECONDS: int = 24 * 3600
+    # 性格报告 worker：进程数 × 每进程并发数 = 同时进行的 LLM 调用上限
+    REPORT_WORKER_PROCESSES: int = 2
+    REPORT_WORKER_CONCURRENCY: int = 4
+    # 报告任务最多执行次数 (含首次)；查询接口补排队的冷却时间
+    REPORT_JOB_MAX_ATTEMPTS: int = 3
+    REPORT_REQUEUE_COOLDOWN_SECONDS: int = 24 * 3600
+    # 用户手动“重新生成”失败报告的冷却时间 (POST /retry_report)
+    REPORT_RETRY_COOLDOWN_SECONDS: int = 300
+    # 失败重试：第 n 次失败后等待 BASE * 2^(n-1) 秒 (上限 MAX)，次数用完进入死信列表
+    JOB_RETRY_BASE_SECONDS: float = 5.0
+    JOB_RETRY_MAX_SECONDS: float = 300.0
+    JOB_DEAD_LETTER_MAX: int = 1000
+    # 执行中的任务超过这么久没有续约，视为 worker 失联，重新调度
+    JOB_LEASE_SECONDS: float = 120.0
+    # 简历解析 worker (app/utils/resume_worker.py)：同时进行的 VL 调用上限 = 进程数 × 每进程并发数
+    RESUME_WORKER_PROCESSES: int = 2
+    RESUME_WORKER_CONCURRENCY: int = 2
+    RESUME_JOB_MAX_ATTEMPTS: int = 4
+
+    # --- 性格测试题库索引 (app/utils/question_bank.py) ---
+    # 每隔多少秒检查一次 Redis 中的题库版本号
+    QUESTION_BANK_VERSION_CHECK_SECONDS: float = 5.0
+
+    # --- 岗位目录缓存 (app/utils/position_catalog.py) ---
+    # 正常情况下由 ORM 事件主动失效，TTL 只是兜底
+    POSITION_CATALOG_TTL_SECONDS: int = 600
+
+    # --- 面试视频写入 (app/utils/video_ingest.py) ---
+    VIDEO_UPLOAD_DIR: str = "data/videos"
+    VIDEO_FLUSH_BYTES: int = 1024 * 1024          # 内存中攒够多少字节落盘一次
+    VIDEO_FLUSH_INTERVAL_SECONDS: float = 5.0     # 最长多久落盘一次
+    VIDEO_WRITE_QUEUE_SIZE: int = 8               # 每个连接最多排队的待写批次，满了即背压
+    # always：每批 fsync 数据与清单后才回 ack，ack 过的分片断电也不会丢
+    # close / never：ack 只表示数据已交给操作系统，只能扛住进程崩溃，断电可能丢掉已 ack 的分片
+    VIDEO_FSYNC_POLICY: str = "always"            # always / close / never
+    VIDEO_IO_THREADS: int = 4
+    VIDEO_SEGMENT_MAX_BYTES: int = 32 * 1024 * 1024   # 单个分段最大字节数，超过后轮转
+    VIDEO_SEGMENT_MAX_SECONDS: float = 60.0           # 单个分段最长时长，超过后轮转
+
+    # --- 视频流配额 (app/api/interviewee_api/Interview_video_api.py) ---
+    VIDEO_MAX_CONCURRENT_STREAMS: int = 100               # 每个进程同时允许的视频连接数
+    VIDEO_MAX_SESSION_BYTES: int = 2 * 1024 * 1024 * 1024 # 单个上传会话最多写入的字节数
+    VIDEO_IDLE_TIMEOUT_SECONDS: float = 30.0              # 超过这么久没收到任何消息就断开
+
+    # --- 录像分析 (app/utils/video_analysis.py，依赖 ffmpeg 可执行文件) ---
+    FFMPEG_BINARY: str = "ffmpeg"
+    VIDEO_ANALYSIS_PROCESSES: int = 4              # 帧统计进程池大小
+    VIDEO_ANALYSIS_SAMPLE_FPS: float = 2.0         # 每秒抽取的帧数
+    VIDEO_ANALYSIS_FRAME_WIDTH: int = 160          # 抽帧后缩放到的尺寸
+    VIDEO_ANALYSIS_FRAME_HEIGHT: int = 120
+    VIDEO_ANALYSIS_BATCH_FRAMES: int = 240         # 每个进程池任务处理的帧数
+    VIDEO_ANALYSIS_MOTION_THRESHOLD: float = 0.02  # 运动能量超过该值视为“有动作”
+    VIDEO_ANALYSIS_FACE_SKIN_RATIO: float = 0.15   # 人脸区域肤色占比超过该值视为“人在镜头前”
+    VIDEO_ANALYSIS_TIMELINE_SECONDS: float = 10.0  # 时间线分桶长度
+
+    # --- 录像音频活动分析 (app/utils/audio_analysis.py) ---
+    AUDIO_ANALYSIS_SAMPLE_RATE: int = 16000
+    AUDIO_VAD_BLOCK_SECONDS: float = 10.0          # 每次从 ffmpeg 读取的音频长度，决定内存上限
+    AUDIO_VAD_FRAME_MS: int = 30                   # 分帧长度
+    AUDIO_VAD_ENERGY_MARGIN_DB: float = 10.0       # 能量高出噪声底多少 dB 视为说话
+    AUDIO_VAD_ZCR_MAX: float = 0.25                # 浊音的过零率上限
+    AUDIO_VAD_HANGOVER_MS: int = 200               # 说话帧之后的拖尾
+    AUDIO_VAD_MIN_PAUSE_SECONDS: float = 0.3       # 短于该值的静音不算停顿
+    AUDIO_VAD_TURN_GAP_SECONDS: float = 2.0        # 长于该值的停顿视为一次问答切换
+
+    # --- 简历 PDF 渲染 (app/utils/qwen_client.py) ---
+    PDF_RENDER_PROCESSES: int = 4                  # 渲染进程池大小
+    PDF_RENDER_DPI: int = 144                      # 144 DPI 即原来的 2 倍放大
+    # 文本层快速通道：质量分 = 字符数项 × 乱码项 × 覆盖率项，达到阈值的页不再走多模态模型
+    PDF_TEXT_MIN_CHARS: int = 100                  # 字符数达到该值时字符数项满分
+    PDF_TEXT_MAX_GARBAGE_RATIO: float = 0.2        # 乱码率达到该值时乱码项为 0
+    PDF_TEXT_MIN_COVERAGE: float = 0.05            # 文本块覆盖率达到该值时覆盖率项满分
+    PDF_TEXT_QUALITY_THRESHOLD: float = 0.6
+
+    # --- 简历 OCR 结果缓存 (app/utils/ocr_cache.py) ---
+    OCR_CACHE_DIR: str = "data/ocr_cache"
+    OCR_CACHE_TTL_SECONDS: int = 30 * 24 * 3600    # Redis 中的过期时间，磁盘上的结果不过期
+
+    # --- 简历上传 (app/api/interviewee_api/Resume_upload_api.py) ---
+    RESUME_MAX_UPLOAD_BYTES: int = 20 * 1024 * 1024
+    RESUME_UPLOAD_CHUNK_BYTES: int = 1024 * 1024
+
+    # --- 登录态 (app/core/get_user.py) ---
+    # 已验证 Token 的进程内 LRU 条目上限 (条目在 Token 过期时失效)
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    # 访问令牌 (JWT) 有效期，过期后客户端用刷新令牌换新 (app/core/refresh_token.py)
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+
+    # --- 密码哈希 (app/core/security.py) ---
+    # bcrypt 成本因子；修改后旧密码在用户下次登录时自动按新成本重新哈希
+    BCRYPT_ROUNDS: int = 12
+    # 哈希线程数，以及正在执行 + 排队的上限 (超过返回 429)
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 32
+
     # --- 2. 告诉 Pydantic 去哪里找配置 ---
     class Config:
         # 指定读取根目录下的 .env 文件
@@ -1,3 +1,7 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
@@ -5,71 +9,135 @@ from jose import jwt, JWTError
 from pydantic import ValidationError
 
 # 引入你的配置，获取 SECRET_KEY 和 ALGORITHM
-from app.core.config import settings 
+from app.core.config import settings
 # 如果你还没有 settings，暂时可以用硬编码 (不推荐)：
 # settings = type('Settings', (), {'SECRET_KEY': 'YOUR_SECRET_KEY', 'ALGORITHM': 'HS256'})
 
 # 1. 定义 OAuth2 模式
 # tokenUrl 指向你的登录接口路由，这样 Swagger UI (http://localhost:8000/docs) 里的 "Authorize" 按钮才能工作
 reusable_oauth2 = OAuth2PasswordBearer(
-    tokenUrl="/api/login" 
+    tokenUrl="/api/login"
 )
 
-# 2. 核心函数：解析 Token 获取 User ID
-def get_current_user_id(
-    token: str = Depends(reusable_oauth2)
-) -> str:
+
+# 2. 已验证的登录身份：Token 中的 sub (用户名) 与 id (数据库主键)
+@dataclass(frozen=True)
+class Principal:
+    sub: str
+    id: Optional[int]
+    expires_at: Optional[float]  # exp (unix 秒)，缓存据此过期
+
+
+# 3. 已验证 Token 的进程内 LRU：token -> Principal
+# 同一个 Token 在有效期内只做一次签名校验；过期的条目在访问时删除，缓存满时先清理过期条目再按 LRU 淘汰
+_verified_tokens: "OrderedDict[str, Principal]" = OrderedDict()
+_cache_lock = threading.Lock()
+_last_sweep = 0.0
+_SWEEP_INTERVAL_SECONDS = 60.0
+
+
+def _cache_get(token: str) -> Optional[Principal]:
+    with _cache_lock:
+        principal = _verified_tokens.get(token)
+        if principal is None:
+            return None
+        if principal.expires_at is not None and principal.expires_at <= time.time():
+            del _verified_tokens[token]
+            return None
+        _verified_tokens.move_to_end(token)
+        return principal
+
+
+def _sweep_expired(now: float):
+    global _last_sweep
+    _last_sweep = now
+    expired = [
+        token for token, principal in _verified_tokens.items()
+        if principal.expires_at is not None and principal.expires_at <= now
+    ]
+    for token in expired:
+        del _verified_tokens[token]
+
+
+def _cache_set(token: str, principal: Principal):
+    with _cache_lock:
+        _verified_tokens[token] = principal
+        _verified_tokens.move_to_end(token)
+        if len(_verified_tokens) > settings.AUTH_TOKEN_CACHE_SIZE:
+            now = time.time()
+            if now - _last_sweep >= _SWEEP_INTERVAL_SECONDS:
+                _sweep_expired(now)
+        while len(_verified_tokens) > settings.AUTH_TOKEN_CACHE_SIZE:
+            _verified_tokens.popitem(last=False)
+
+
+def verify_token(token: str) -> Principal:
     """
-    依赖项：
-    1. 自动从 Header 提取 Authorization: Bearer <token>
-    2. 验证 Token 签名和有效期
-    3. 返回 Token 中包含的 User ID (sub)
+    校验 Token 签名与有效期，返回 Principal (HTTP 依赖与 WebSocket 共用)。
+    无效时抛出 JWTError / ValueError，由调用方转换成 401 或关闭连接。
     """
-    # 定义验证失败时的 401 错误
-    credentials_exception = HTTPException(
+    principal = _cache_get(token)
+    if principal is not None:
+        return principal
+
+    # --- 解密核心逻辑 ---
+    payload = jwt.decode(
+        token,
+        settings.SECRET_KEY,
+        algorithms=[settings.ALGORITHM]
+    )
+    # 获取 Token 中的 'sub' 字段 (通常存放用户名)
+    sub = payload.get("sub")
+    if sub is None:
+        raise JWTError("Token 中缺少 sub")
+    raw_id = payload.get("id")
+    exp = payload.get("exp")
+    principal = Principal(
+        sub=str(sub),
+        id=int(raw_id) if raw_id is not None else None,
+        expires_at=float(exp) if exp is not None else None,
+    )
+    _cache_set(token, principal)
+    return principal
+
+
+# 4. 核心依赖：每个请求只解析一次 Token
+# FastAPI 在同一请求内缓存依赖结果，路由级的 Depends(get_current_user_id) 与接口参数共用这一次解析
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+
+async def get_current_principal(
+    token: str = Depends(reusable_oauth2)
+) -> Principal:
+    """
+    依赖项：
+    1. 自动从 Header 提取 Authorization: Bearer <token>
+    2. 验证 Token 签名和有效期 (命中已验证缓存时跳过)
+    3. 返回 Principal (sub + id)
+    """
     try:
-        # --- 解密核心逻辑 ---
-        # 使用配置中的密钥解密
-        payload = jwt.decode(
-            token, 
-            settings.SECRET_KEY, 
-            algorithms=[settings.ALGORITHM]
-        )
-        
-        # 获取 Token 中的 'sub' 字段 (通常存放 User ID)
-        user_id: str = payload.get("sub")
-        
-        if user_id is None:
-            raise credentials_exception
-            
-        return user_id
-
-    except (JWTError, ValidationError):
+        return verify_token(token)
+    except (JWTError, ValidationError, ValueError, TypeError):
         # 如果 Token 过期、伪造或格式错误，抛出 401
-        raise credentials_exception
+        raise _credentials_exception()
 
-def get_current_user_int_id(
-    token: str = Depends(reusable_oauth2)
+
+async def get_current_user_id(
+    principal: Principal = Depends(get_current_principal)
+) -> str:
+    """返回 Token 中包含的 User ID (sub)"""
+    return principal.sub
+
+
+async def get_current_user_int_id(
+    principal: Principal = Depends(get_current_principal)
 ) -> int:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(
-            token, 
-            settings.SECRET_KEY, 
-            algorithms=[settings.ALGORITHM]
-        )
-        user_id = payload.get("id")
-        if user_id is None:
-            raise credentials_exception
-        return int(user_id)
-    except (JWTError, ValidationError, ValueError):
-        raise credentials_exception
\ No newline at end of file
+    """返回 Token 中包含的数据库用户 ID (id)"""
+    if principal.id is None:
+        raise _credentials_exception()
+    return principal.id
@@ -0,0 +1,140 @@
+"""
+刷新令牌 (refresh token)
+- 访问令牌 (JWT) 有效期短 (ACCESS_TOKEN_EXPIRE_MINUTES)，过期后用刷新令牌换新，不查库、不做 bcrypt
+- 刷新令牌是随机串，Redis 中只保存它的 SHA-256：
+    refresh_token:{hash}     -> {"sub", "id", "family"}，TTL = REFRESH_TOKEN_EXPIRE_DAYS
+    refresh_family:{family}  -> 同一次登录派生出的令牌链，删除即整条链失效
+    refresh_used:{hash}      -> 已轮换掉的旧令牌 (值为 family)，再次出现视为泄露，整条链作废
+    refresh_user:{sub}       -> 该用户所有 family，用于“退出所有设备”
+- 每次刷新都轮换：删除旧令牌并签发同一 family 的新令牌，检查 family 与写入新令牌在同一段 Lua 脚本里原子完成，
+  与吊销 (删除 family) 并发时不会把已吊销的令牌链重新建出来；轮换只延长已存在的 family 键，从不重新创建
+- 吊销 = 删除 Redis 键，校验只是一次 Redis 查询
+"""
+
+import hashlib
+import json
+import secrets
+import uuid
+from typing import Optional
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.db.redis_tool import pool
+
+TOKEN_PREFIX = "refresh_token:"
+FAMILY_PREFIX = "refresh_family:"
+USED_PREFIX = "refresh_used:"
+USER_PREFIX = "refresh_user:"
+
+
+# 轮换：旧令牌仍是读到的那条 (没被并发轮换 / 吊销) 且 family 仍存在时，才删除旧令牌、写入新令牌并续期
+# KEYS: 旧令牌, family, 旧令牌的 used 标记, 新令牌, 用户的 family 集合
+# ARGV: 读到的旧令牌内容 (新令牌沿用同样的 sub / id / family), TTL, family
+_ROTATE_LUA = """
+if redis.call("get", KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call("del", KEYS[1])
+if redis.call("exists", KEYS[2]) == 0 then
+    return 0
+end
+redis.call("set", KEYS[3], ARGV[3], "EX", ARGV[2])
+redis.call("set", KEYS[4], ARGV[1], "EX", ARGV[2])
+redis.call("expire", KEYS[2], ARGV[2])
+redis.call("expire", KEYS[5], ARGV[2])
+return 1
+"""
+
+
+def _get_redis_client() -> redis.Redis:
+    return redis.Redis(connection_pool=pool)
+
+
+def _ttl_seconds() -> int:
+    return settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
+
+
+def _token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+async def issue_refresh_token(sub: str, user_id: Optional[int]) -> str:
+    """登录时签发刷新令牌，开始一条新的令牌链 (轮换见 rotate_refresh_token)"""
+    token = secrets.token_urlsafe(32)
+    family = uuid.uuid4().hex
+    ttl = _ttl_seconds()
+    data = json.dumps({"sub": sub, "id": user_id, "family": family})
+
+    client = _get_redis_client()
+    try:
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.set(TOKEN_PREFIX + _token_hash(token), data, ex=ttl)
+            pipe.set(FAMILY_PREFIX + family, sub, ex=ttl)
+            pipe.sadd(USER_PREFIX + sub, family)
+            pipe.expire(USER_PREFIX + sub, ttl)
+            await pipe.execute()
+    finally:
+        await client.close()
+    return token
+
+
+async def rotate_refresh_token(token: str) -> Optional[tuple[dict, str]]:
+    """
+    用刷新令牌换一个新的刷新令牌，旧令牌立即失效。
+    返回 ({"sub", "id", "family"}, 新令牌)；令牌无效 / 已过期 / 已吊销时返回 None
+    """
+    token_hash = _token_hash(token)
+    client = _get_redis_client()
+    try:
+        raw = await client.get(TOKEN_PREFIX + token_hash)
+        if raw is None:
+            # 已经轮换过的旧令牌又被使用：令牌可能泄露，吊销整条链
+            family = await client.get(USED_PREFIX + token_hash)
+            if family:
+                print(f"🚨 [RefreshToken] 检测到旧令牌重放，吊销令牌链 {family[:8]}")
+                await client.delete(FAMILY_PREFIX + family)
+            return None
+
+        data = json.loads(raw)
+        new_token = secrets.token_urlsafe(32)
+        rotated = await client.eval(
+            _ROTATE_LUA, 5,
+            TOKEN_PREFIX + token_hash,
+            FAMILY_PREFIX + data["family"],
+            USED_PREFIX + token_hash,
+            TOKEN_PREFIX + _token_hash(new_token),
+            USER_PREFIX + data["sub"],
+            raw, _ttl_seconds(), data["family"],
+        )
+    finally:
+        await client.close()
+
+    # 0：令牌链已吊销，或同一令牌被并发请求抢先轮换
+    if not rotated:
+        return None
+    return data, new_token
+
+
+async def revoke_refresh_token(token: str):
+    """退出登录：吊销该令牌所在的整条令牌链"""
+    client = _get_redis_client()
+    try:
+        raw = await client.getdel(TOKEN_PREFIX + _token_hash(token))
+        if raw is None:
+            return
+        data = json.loads(raw)
+        await client.delete(FAMILY_PREFIX + data["family"])
+        await client.srem(USER_PREFIX + data["sub"], data["family"])
+    finally:
+        await client.close()
+
+
+async def revoke_user_refresh_tokens(sub: str):
+    """吊销某个用户的全部刷新令牌 (例如修改密码 / 封禁账号)"""
+    client = _get_redis_client()
+    try:
+        families = await client.smembers(USER_PREFIX + sub)
+        keys = [FAMILY_PREFIX + family for family in families] + [USER_PREFIX + sub]
+        await client.delete(*keys)
+    finally:
+        await client.close()
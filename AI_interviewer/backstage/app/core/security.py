@@ -1,7 +1,10 @@
 # app/core/security.py
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Union
+from fastapi import HTTPException, status
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
@@ -9,10 +12,55 @@ from app.core.config import settings
 # 这是一个随机生成的密钥，用于给 Token 签名，绝对不能泄露
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60  # Token 有效期 30 分钟
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES  # 访问令牌有效期，过期后用刷新令牌换新
 
 # 2. 密码哈希上下文
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min_rounds / max_rounds 与 rounds 相同：成本因子与配置不一致的旧哈希会在登录时被判定为需要更新
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+# bcrypt 每次要消耗上百毫秒 CPU，放到专用线程池里执行 (bcrypt 计算时释放 GIL)，不占用事件循环
+_hash_executor: ThreadPoolExecutor = None
+# 正在执行 + 排队中的哈希任务数，超过 PASSWORD_HASH_MAX_PENDING 直接 429
+_hash_pending = 0
+
+
+def _get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+        )
+    return _hash_executor
+
+
+def shutdown_hash_executor():
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
+
+async def _run_hashing(func, *args):
+    global _hash_pending
+    if _hash_pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        print(f"⚠️ [Security] 密码哈希队列已满 ({_hash_pending})，拒绝请求")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="登录请求过多，请稍后重试",
+            headers={"Retry-After": "1"},
+        )
+    _hash_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hash_executor(), func, *args)
+    finally:
+        _hash_pending -= 1
 
 # --- 功能A: 密码处理 ---
 
@@ -24,6 +72,17 @@ def get_password_hash(password: str) -> str:
     """将明文密码转换为哈希值"""
     return pwd_context.hash(password)
 
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """
+    在哈希线程池中验证密码 (线程池饱和时抛出 429)。
+    返回 (是否匹配, 新哈希)：成本因子与配置不一致时新哈希不为 None，调用方应写回数据库
+    """
+    return await _run_hashing(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def hash_password(password: str) -> str:
+    """在哈希线程池中生成密码哈希 (线程池饱和时抛出 429)"""
+    return await _run_hashing(pwd_context.hash, password)
+
 # --- 功能B: Token 生成 ---
 
 def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None):
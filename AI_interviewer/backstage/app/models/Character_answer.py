@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, JSON, DateTime  # 1. 引入 DateTime
+from sqlalchemy import Column, Integer, String, JSON, DateTime, Index  # 1. 引入 DateTime
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func # 可选：用于设置数据库层面的默认时间
 from app.db.session import Base
 
@@ -6,6 +7,13 @@ class Character_answer(Base):
     __tablename__ = "character_answers" # 修正：对应你init_db.py里检查的表名，注意这里通常用复数
     id = Column(Integer, primary_key=True, index=True)
     userId = Column(String(50), unique=False, index=True)
-    question_and_answer = Column(JSON)
+    # 问答对较大且只在生成报告时用到：延迟加载，读取报告时不再拉取这一列
+    # 需要时请显式 undefer(Character_answer.question_and_answer)
+    question_and_answer = deferred(Column(JSON))
     submissionTime = Column(DateTime, server_default=func.now())
-    analysis_report = Column(JSON, nullable=True)  # 可选字段，存储分析报告的 JSON 数据
\ No newline at end of file
+    analysis_report = Column(JSON, nullable=True)  # 可选字段，存储分析报告的 JSON 数据
+
+    # 复合索引：按用户取最新一条答卷 (WHERE userId = ? ORDER BY submissionTime DESC LIMIT 1) 无需 filesort
+    __table_args__ = (
+        Index("ix_character_answers_user_time", userId, submissionTime),
+    )
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.sql import func 
 from app.db.session import Base
 
@@ -10,6 +10,13 @@ class Interview_record(Base):
     position_id = Column(Integer, ForeignKey("interview_position.id"))
     interviewer_id = Column(Integer, ForeignKey("interviewer.id"))
     time = Column(DateTime, server_default=func.now())
+    # 本场面试录像的上传会话 ID (/ws/video_stream 的 session_id)，报告页据此查询录像分析结果
+    video_session_id = Column(String(32), nullable=True)
+
+    # 复合索引：面试历史按 (user_id, time DESC) 做游标分页，避免 filesort
+    __table_args__ = (
+        Index("ix_interview_record_user_time", user_id, time.desc()),
+    )
     
 
     # __init__ 方法是 Python 对象的逻辑，不会影响建表，这里保持原样即可
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime, func
+from sqlalchemy import Column, String, Text, DateTime, Index, func
 from app.db.session import Base
 import uuid
 
@@ -8,8 +8,8 @@ class Resume_messages(Base):
     # === 1. 基础信息 ===
     # 使用 String(36) 存储 UUID，作为主键
     session_id = Column(String(36), primary_key=True, index=True)
-    # 用户ID，不可为空
-    user_id = Column(String(36), nullable=False, index=True)
+    # 用户ID，不可为空；每个用户只保留一条记录 (唯一索引见 __table_args__，upsert 依赖它)
+    user_id = Column(String(36), nullable=False)
 
     # === 2. 核心业务字段 ===
     job_name = Column(String(255), nullable=False)
@@ -26,6 +26,10 @@ class Resume_messages(Base):
     # === 3. 时间戳 ===
     created_at = Column(DateTime, server_default=func.now())
 
+    __table_args__ = (
+        Index("uq_interview_resume_messages_user_id", user_id, unique=True),
+    )
+
     # === 初始化逻辑 ===
     def __init__(self, *args, **kwargs):
         # 逻辑1：如果创建时没传 Session ID，自动生成 UUID
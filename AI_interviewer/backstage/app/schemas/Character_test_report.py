@@ -30,4 +30,7 @@ class ReportSchema(BaseModel):
     competency_radar: list[CompetencyRadarItem] = []
 
     # 新增：职业动机与价值观适配（深度分析）
-    motivation_values: MotivationValues = MotivationValues()
\ No newline at end of file
+    motivation_values: MotivationValues = MotivationValues()
+
+    # 报告状态：ready 已生成 / pending 后台生成中 / failed 重试次数用完仍失败（需调用 POST /retry_report 重新生成）
+    status: str = "ready"
\ No newline at end of file
@@ -1,10 +1,12 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 
 class InterviewRecordBase(BaseModel):
     position_id: int
     interviewer_id: int
+    # 录像上传会话 ID，可选
+    video_session_id: Optional[str] = None
 
 class InterviewRecordCreate(InterviewRecordBase):
     pass
@@ -20,3 +22,8 @@ class InterviewRecord(InterviewRecordBase):
 
     class Config:
         orm_mode = True
+
+class InterviewRecordPage(BaseModel):
+    items: List[InterviewRecord] = []
+    # 下一页游标，没有更多数据时为 None
+    next_cursor: Optional[str] = None
@@ -0,0 +1,55 @@
+"""
+面试录像分析结果的会话级存储
+- 每个分析阶段 (video / audio ...) 单独一个文件：{VIDEO_UPLOAD_DIR}/{session_id}/analysis/{stage}.json
+  各阶段并行执行时互不覆盖，读取时合并
+- 文件内容：{"status": pending/running/done/failed, "updated_at", "result": {...}, "error": ...}
+"""
+
+import json
+import os
+import time
+
+from app.utils.video_session import session_dir
+
+STAGE_PENDING = "pending"
+STAGE_RUNNING = "running"
+STAGE_DONE = "done"
+STAGE_FAILED = "failed"
+
+
+def _analysis_dir(session_id: str) -> str:
+    return os.path.join(session_dir(session_id), "analysis")
+
+
+def save_stage(session_id: str, stage: str, status: str, result: dict = None, error: str = None):
+    """原子写入一个阶段的状态与结果 (同步)"""
+    directory = _analysis_dir(session_id)
+    os.makedirs(directory, exist_ok=True)
+    data = {"status": status, "updated_at": time.time()}
+    if result is not None:
+        data["result"] = result
+    if error is not None:
+        data["error"] = error
+
+    path = os.path.join(directory, f"{stage}.json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_stages(session_id: str) -> dict[str, dict]:
+    """读取该会话所有阶段的结果：{stage: {...}}，还没分析过时返回空 dict (同步)"""
+    directory = _analysis_dir(session_id)
+    if not os.path.isdir(directory):
+        return {}
+    stages = {}
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                stages[name[:-len(".json")]] = json.load(f)
+        except (OSError, ValueError):
+            continue
+    return stages
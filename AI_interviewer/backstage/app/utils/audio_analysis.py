@@ -0,0 +1,215 @@
+"""
+面试录像的音频活动分析 (纯 CPU，不依赖语音识别)
+- ffmpeg 把音轨解码成单声道 16 bit PCM，按 AUDIO_VAD_BLOCK_SECONDS 一块流式读取，内存占用与录像长度无关
+- 每块内按 AUDIO_VAD_FRAME_MS 分帧，NumPy 向量化计算帧能量 (dB) 与过零率：
+    能量明显高于噪声底且过零率不高 (浊音)，或能量远高于噪声底 → 说话
+  噪声底取每块能量的 10 分位，只允许缓慢上升；说话帧之后保留 AUDIO_VAD_HANGOVER_MS 的拖尾，避免字间断开
+- 说话 / 静音片段只做流式累计：说话时长、停顿分布、最长静音、响应等待时间
+  只有候选人麦克风音轨，无法区分面试官提问与思考时间：
+  开口前的静音与 ≥ AUDIO_VAD_TURN_GAP_SECONDS 的长停顿都视为一次问答切换，停顿时长记为响应等待时间
+"""
+
+import subprocess
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.video_analysis import ffmpeg_source
+from app.utils.video_session import VideoSession, segment_path
+
+_NOISE_RISE_DB_PER_BLOCK = 3.0   # 噪声底每块最多上升多少 dB
+_MIN_NOISE_DB = -60.0            # 噪声底下限，防止数字静音把门限压得过低
+_PAUSE_EDGES = (0.5, 1.0, 2.0, 3.0, 5.0, 10.0)
+
+
+def iter_audio_blocks(paths: list[str], sample_rate: int, block_samples: int):
+    """逐块产出 int16 单声道采样，ffmpeg 退出码非 0 (例如没有音轨) 时抛出 RuntimeError"""
+    command = [
+        settings.FFMPEG_BINARY, "-v", "error",
+        "-i", ffmpeg_source(paths),
+        "-vn", "-ac", "1", "-ar", str(sample_rate),
+        "-f", "s16le", "pipe:1",
+    ]
+    block_bytes = block_samples * 2
+
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            buf = proc.stdout.read(block_bytes)
+            usable = len(buf) - len(buf) % 2
+            if usable:
+                yield np.frombuffer(buf, dtype=np.int16, count=usable // 2)
+            if len(buf) < block_bytes:
+                break
+        stderr = proc.stderr.read().decode("utf-8", "ignore")
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg 音频解码失败: {stderr.strip()[-500:]}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+class VoiceActivityDetector:
+    """流式 VAD：每次喂入一块采样，返回这块里完整帧的说话判定 (已做拖尾平滑)"""
+
+    def __init__(self, sample_rate: int):
+        self.frame_len = int(sample_rate * settings.AUDIO_VAD_FRAME_MS / 1000)
+        self.frame_seconds = self.frame_len / sample_rate
+        self.hangover_frames = int(settings.AUDIO_VAD_HANGOVER_MS / settings.AUDIO_VAD_FRAME_MS)
+        self.noise_db = None
+        self._remainder = np.empty(0, dtype=np.int16)  # 不足一帧的尾巴留给下一块
+        self._frame_offset = 0
+        self._last_speech = -(10 ** 9)                 # 上一个说话帧的全局下标
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        x = np.concatenate([self._remainder, samples]) if len(self._remainder) else samples
+        count = len(x) // self.frame_len
+        self._remainder = x[count * self.frame_len:].copy()
+        if count == 0:
+            return np.zeros(0, dtype=bool)
+
+        frames = x[:count * self.frame_len].reshape(count, self.frame_len).astype(np.float32) / 32768.0
+        energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        block_floor = float(np.percentile(energy_db, 10))
+        if self.noise_db is None:
+            self.noise_db = block_floor
+        else:
+            self.noise_db = min(block_floor, self.noise_db + _NOISE_RISE_DB_PER_BLOCK)
+        self.noise_db = max(self.noise_db, _MIN_NOISE_DB)
+
+        threshold = self.noise_db + settings.AUDIO_VAD_ENERGY_MARGIN_DB
+        raw = ((energy_db > threshold) & (zcr < settings.AUDIO_VAD_ZCR_MAX)) | \
+              (energy_db > threshold + settings.AUDIO_VAD_ENERGY_MARGIN_DB)
+
+        # 拖尾平滑：距最近一个说话帧不超过 hangover_frames 的帧也算说话
+        index = np.arange(self._frame_offset, self._frame_offset + count)
+        last_speech = np.where(raw, index, -(10 ** 9))
+        last_speech = np.maximum.accumulate(np.concatenate([[self._last_speech], last_speech]))[1:]
+        self._last_speech = int(last_speech[-1])
+        self._frame_offset += count
+        return (index - last_speech) <= self.hangover_frames
+
+
+class SpeechStats:
+    """把说话 / 静音片段流式累计成报告指标，只保留计数与少量问答切换记录"""
+
+    def __init__(self):
+        self.min_pause = settings.AUDIO_VAD_MIN_PAUSE_SECONDS
+        self.turn_gap = settings.AUDIO_VAD_TURN_GAP_SECONDS
+        self.total_seconds = 0.0
+        self.talk_seconds = 0.0
+        self.speech_segments = 0
+        self.longest_silence = 0.0
+        self.pause_count = 0
+        self.pause_total = 0.0
+        self.pause_histogram = np.zeros(len(_PAUSE_EDGES) + 1, dtype=np.int64)
+        self.latencies: list[float] = []   # 数量与问答轮数同级
+        self.first_response = None         # 开场到第一次开口的时间
+        self._state = None
+        self._run = 0.0
+        self._seen_speech = False
+
+    def add_decisions(self, speech: np.ndarray, frame_seconds: float):
+        """把一块帧判定按游程合并进统计"""
+        if len(speech) == 0:
+            return
+        bounds = np.concatenate([[0], np.flatnonzero(np.diff(speech.astype(np.int8))) + 1, [len(speech)]])
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            self._add_run(bool(speech[start]), (end - start) * frame_seconds)
+
+    def _add_run(self, is_speech: bool, seconds: float):
+        self.total_seconds += seconds
+        if is_speech == self._state:
+            self._run += seconds
+            return
+        self._close_run(final=False)
+        self._state = is_speech
+        self._run = seconds
+
+    def _close_run(self, final: bool):
+        if self._state is None:
+            return
+        if self._state:
+            if self.first_response is None:
+                # 录像一开始就在说话
+                self.first_response = 0.0
+            self.talk_seconds += self._run
+            self.speech_segments += 1
+            self._seen_speech = True
+            return
+
+        if not self._seen_speech:
+            # 开场到第一次开口：如果一直没开口 (final) 则只算静音
+            self.longest_silence = max(self.longest_silence, self._run)
+            if not final:
+                self.first_response = self._run
+                self.latencies.append(self._run)
+            return
+        if final:
+            # 最后一次说完之后的静音是录制收尾，不计入停顿
+            return
+        self.longest_silence = max(self.longest_silence, self._run)
+        if self._run >= self.min_pause:
+            self.pause_count += 1
+            self.pause_total += self._run
+            self.pause_histogram[np.searchsorted(_PAUSE_EDGES, self._run, side="right")] += 1
+        if self._run >= self.turn_gap:
+            self.latencies.append(self._run)
+
+    def finish(self) -> dict:
+        self._close_run(final=True)
+        self._state = None
+
+        edges = (self.min_pause, *_PAUSE_EDGES)
+        histogram = []
+        for i, count in enumerate(self.pause_histogram):
+            label = f"{edges[i]:g}s-{edges[i + 1]:g}s" if i + 1 < len(edges) else f"{edges[i]:g}s+"
+            histogram.append({"range": label, "count": int(count)})
+
+        latencies = np.array(self.latencies) if self.latencies else None
+        return {
+            "duration_seconds": round(self.total_seconds, 1),
+            "talk_seconds": round(self.talk_seconds, 1),
+            "talk_ratio": round(self.talk_seconds / self.total_seconds, 3) if self.total_seconds else 0.0,
+            "speech_segments": self.speech_segments,
+            "longest_silence_seconds": round(self.longest_silence, 2),
+            "pauses": {
+                "count": self.pause_count,
+                "mean_seconds": round(self.pause_total / self.pause_count, 2) if self.pause_count else 0.0,
+                "histogram": histogram,
+            },
+            "response_latency": {
+                "count": len(self.latencies),
+                "first_response_seconds": round(self.first_response, 2) if self.first_response is not None else None,
+                "mean_seconds": round(float(latencies.mean()), 2) if latencies is not None else None,
+                "median_seconds": round(float(np.median(latencies)), 2) if latencies is not None else None,
+                "max_seconds": round(float(latencies.max()), 2) if latencies is not None else None,
+            },
+        }
+
+
+def analyze_audio(session: VideoSession) -> dict:
+    """同步执行整段音频分析 (在线程中调用)"""
+    paths = [segment_path(session, seg) for seg in session.segments]
+    if not paths:
+        raise ValueError("会话没有视频分段")
+
+    started = time.monotonic()
+    sample_rate = settings.AUDIO_ANALYSIS_SAMPLE_RATE
+    detector = VoiceActivityDetector(sample_rate)
+    stats = SpeechStats()
+    block_samples = int(sample_rate * settings.AUDIO_VAD_BLOCK_SECONDS)
+
+    for samples in iter_audio_blocks(paths, sample_rate, block_samples):
+        stats.add_decisions(detector.process(samples), detector.frame_seconds)
+
+    result = stats.finish()
+    result["elapsed_seconds"] = round(time.monotonic() - started, 2)
+    print(f"🎙️ [AudioAnalysis] {session.session_id}: 音频 {result['duration_seconds']}s, "
+          f"说话 {result['talk_seconds']}s, 耗时 {result['elapsed_seconds']}s")
+    return result
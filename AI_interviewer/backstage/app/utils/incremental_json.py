@@ -0,0 +1,74 @@
+"""
+增量 JSON 解析器（只关心最外层对象）
+大模型流式输出时，每个顶层字段一旦完整就立刻解析出来，不必等整段 JSON 结束。
+例：'{"total": 5, "strengths": ["A", "B"], ...' 在读到 strengths 后面的逗号时就能拿到 ("strengths", ["A", "B"])
+"""
+
+import json
+
+
+class IncrementalJSONObjectParser:
+    def __init__(self):
+        self._started = False    # 是否已经遇到最外层的 '{'（之前的 ```json 之类直接忽略）
+        self._finished = False   # 最外层对象是否已闭合
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member = []        # 当前顶层成员 ("key": value) 的原始文本
+
+    def feed(self, chunk: str) -> list[tuple[str, object]]:
+        """
+        喂入一段新文本，返回这段文本中刚刚完整的顶层字段 [(key, value), ...]
+        """
+        completed = []
+        for ch in chunk:
+            if self._finished:
+                break
+
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                self._member.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+
+            # 在最外层遇到 ',' 或者最外层对象闭合：当前成员结束
+            if self._depth == 1 and ch == ",":
+                self._flush(completed)
+                continue
+            if self._depth == 0:
+                self._flush(completed)
+                self._finished = True
+                continue
+
+            self._member.append(ch)
+
+        return completed
+
+    def _flush(self, completed: list):
+        text = "".join(self._member).strip()
+        self._member = []
+        if not text:
+            return
+        try:
+            member = json.loads("{" + text + "}")
+        except json.JSONDecodeError:
+            # 单个字段不合法不影响后续字段，最终结果以完整解析为准
+            return
+        completed.extend(member.items())
@@ -0,0 +1,370 @@
+"""
+轻量级任务队列
+- redis 模式：基于 redis_tool.pool，API 进程 LPUSH，独立的 worker 进程消费
+    取任务用 BLMOVE 原子地从 pending 移到 processing 列表，执行完才移除；
+    worker 崩溃 / 重启时任务仍留在 processing 中，租约 (JOB_LEASE_SECONDS) 过期后由任一 worker 放回重试
+- 失败重试：指数退避 (JOB_RETRY_BASE_SECONDS * 2^(n-1)，上限 JOB_RETRY_MAX_SECONDS)，
+  等待中的任务放在 delayed 有序集合里，到期再回到 pending；超过 max_attempts 进入死信列表 dead
+- local 模式：进程内 asyncio.Queue，不依赖 Redis，方便本地调试 / 测试 (不跨进程持久化)
+任务状态 (pending / running / done / failed) 单独存一份，接口据此返回“生成中”。
+"""
+
+import asyncio
+import json
+import time
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.db.redis_tool import pool
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class JobQueue:
+    def __init__(self, name: str, mode: str = None, max_attempts: int = 1):
+        """max_attempts: 每个任务最多执行几次 (含第一次)，用完后进入死信列表"""
+        self.name = name
+        self.mode = mode or settings.JOB_QUEUE_MODE
+        self.max_attempts = max(1, max_attempts)
+        self._pending_key = f"job_queue:{name}:pending"
+        self._processing_key = f"job_queue:{name}:processing"
+        self._delayed_key = f"job_queue:{name}:delayed"
+        self._dead_key = f"job_queue:{name}:dead"
+        self._status_prefix = f"job_queue:{name}:status:"
+        self._claim_prefix = f"job_queue:{name}:claim:"
+        # local 模式使用的进程内存储
+        self._local_queue: asyncio.Queue = asyncio.Queue()
+        self._local_status: dict[str, dict] = {}
+        self._local_dead: list[dict] = []
+        self._local_claims: dict[str, float] = {}
+        # 上一轮巡检中看起来已失联的任务，连续两轮都失联才放回 (避免误伤刚取出还没标记 running 的任务)
+        self._stale_suspects: set[str] = set()
+
+    @property
+    def is_local(self) -> bool:
+        return self.mode == "local"
+
+    def _get_redis_client(self) -> redis.Redis:
+        return redis.Redis(connection_pool=pool)
+
+    # ---------------- 状态 ----------------
+
+    async def get_status(self, job_id: str):
+        if self.is_local:
+            return self._local_status.get(job_id)
+        client = self._get_redis_client()
+        try:
+            raw = await client.get(self._status_prefix + job_id)
+            return json.loads(raw) if raw else None
+        finally:
+            await client.close()
+
+    async def set_status(self, job_id: str, status: str, **extra):
+        data = {"status": status, "updated_at": time.time(), **extra}
+        if self.is_local:
+            self._local_status[job_id] = data
+            return
+        client = self._get_redis_client()
+        try:
+            await client.set(
+                self._status_prefix + job_id,
+                json.dumps(data, ensure_ascii=False),
+                ex=settings.JOB_STATUS_TTL_SECONDS
+            )
+        finally:
+            await client.close()
+
+    async def set_job_status(self, job: dict, status: str, **extra):
+        """写入某个任务的状态，并带上入队时记录的 owner (接口据此校验任务归属)"""
+        if job.get("owner") is not None:
+            extra["owner"] = job["owner"]
+        await self.set_status(job["id"], status, **extra)
+
+    async def claim_once(self, job_id: str, ttl_seconds: int) -> bool:
+        """
+        ttl_seconds 内对同一个 job_id 只返回一次 True，用于限制“查询时顺便补排队”这类重复入队
+        (redis 模式 SET NX，多个 API 进程共享)
+        """
+        if self.is_local:
+            now = time.time()
+            expires_at = self._local_claims.get(job_id)
+            if expires_at is not None and expires_at > now:
+                return False
+            self._local_claims[job_id] = now + ttl_seconds
+            return True
+        client = self._get_redis_client()
+        try:
+            return bool(await client.set(self._claim_prefix + job_id, "1", nx=True, ex=ttl_seconds))
+        finally:
+            await client.close()
+
+    # ---------------- 入队 / 出队 ----------------
+
+    async def enqueue(self, job_id: str, payload: dict, owner: str = None) -> bool:
+        """
+        入队一个任务。同一个 job_id 已在排队或执行中时不会重复入队。
+        owner：任务所属用户，写入每一次的状态记录，查询接口按它精确校验归属
+        返回是否真正入队。
+        """
+        job = {"id": job_id, "payload": payload, "enqueued_at": time.time(), "attempts": 0}
+        status_data = {"status": STATUS_PENDING, "updated_at": job["enqueued_at"]}
+        if owner is not None:
+            job["owner"] = status_data["owner"] = str(owner)
+        status = json.dumps(status_data, ensure_ascii=False)
+
+        if self.is_local:
+            current = self._local_status.get(job_id)
+            if current and current["status"] in (STATUS_PENDING, STATUS_RUNNING):
+                return False
+            self._local_status[job_id] = json.loads(status)
+            self._local_queue.put_nowait(job)
+            return True
+
+        client = self._get_redis_client()
+        try:
+            status_key = self._status_prefix + job_id
+            # NX：已经有状态时先看看是不是已结束的任务，结束了才允许重新入队
+            created = await client.set(status_key, status, nx=True, ex=settings.JOB_STATUS_TTL_SECONDS)
+            if not created:
+                current = json.loads(await client.get(status_key) or "{}")
+                if current.get("status") in (STATUS_PENDING, STATUS_RUNNING):
+                    return False
+                await client.set(status_key, status, ex=settings.JOB_STATUS_TTL_SECONDS)
+            await client.lpush(self._pending_key, json.dumps(job, ensure_ascii=False))
+            return True
+        finally:
+            await client.close()
+
+    async def dequeue(self, timeout: float = 5.0):
+        """
+        取出一个任务，超时返回 None。
+        redis 模式下任务同时进入 processing 列表，处理结束后必须调用 ack 或 retry。
+        """
+        if self.is_local:
+            try:
+                return await asyncio.wait_for(self._local_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+        client = self._get_redis_client()
+        try:
+            raw = await client.blmove(
+                self._pending_key, self._processing_key, int(max(1, timeout)), "RIGHT", "LEFT"
+            )
+            if raw is None:
+                return None
+            job = json.loads(raw)
+            job["raw"] = raw  # 原始字符串，ack / retry 时从 processing 列表中按值删除
+            return job
+        finally:
+            await client.close()
+
+    async def ack(self, job: dict):
+        """任务执行成功，从 processing 列表移除"""
+        if self.is_local:
+            return
+        client = self._get_redis_client()
+        try:
+            await client.lrem(self._processing_key, 1, job["raw"])
+        finally:
+            await client.close()
+
+    def retry_delay(self, attempts: int) -> float:
+        """第 attempts 次失败后的等待时间 (指数退避)"""
+        delay = settings.JOB_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+        return min(delay, settings.JOB_RETRY_MAX_SECONDS)
+
+    async def retry(self, job: dict, error: str) -> bool:
+        """
+        任务执行失败：还有重试次数时按指数退避延迟重新入队，否则进入死信列表。
+        返回是否会重试。
+        """
+        now = time.time()
+        attempts = job.get("attempts", 0) + 1
+        next_job = {key: value for key, value in job.items() if key != "raw"}
+        next_job.update(attempts=attempts, last_error=error)
+
+        if attempts < self.max_attempts:
+            retry_at = now + self.retry_delay(attempts)
+            await self.set_job_status(
+                job, STATUS_PENDING, attempts=attempts, error=error, retry_at=retry_at
+            )
+            if self.is_local:
+                asyncio.get_running_loop().call_later(
+                    retry_at - now, self._local_queue.put_nowait, next_job
+                )
+                return True
+            client = self._get_redis_client()
+            try:
+                async with client.pipeline(transaction=True) as pipe:
+                    pipe.zadd(self._delayed_key, {json.dumps(next_job, ensure_ascii=False): retry_at})
+                    pipe.lrem(self._processing_key, 1, job["raw"])
+                    await pipe.execute()
+            finally:
+                await client.close()
+            return True
+
+        next_job["failed_at"] = now
+        await self.set_job_status(job, STATUS_FAILED, attempts=attempts, error=error, dead_lettered=True)
+        if self.is_local:
+            self._local_dead.append(next_job)
+            del self._local_dead[:-settings.JOB_DEAD_LETTER_MAX]
+            return False
+        client = self._get_redis_client()
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.lpush(self._dead_key, json.dumps(next_job, ensure_ascii=False))
+                pipe.ltrim(self._dead_key, 0, settings.JOB_DEAD_LETTER_MAX - 1)
+                pipe.lrem(self._processing_key, 1, job["raw"])
+                await pipe.execute()
+        finally:
+            await client.close()
+        return False
+
+    async def dead_letters(self, limit: int = 100) -> list[dict]:
+        """最近进入死信列表的任务 (新的在前)，排查问题用"""
+        if self.is_local:
+            return list(reversed(self._local_dead))[:limit]
+        client = self._get_redis_client()
+        try:
+            return [json.loads(raw) for raw in await client.lrange(self._dead_key, 0, limit - 1)]
+        finally:
+            await client.close()
+
+    # ---------------- 维护 (由 worker 定期调用，local 模式无需维护) ----------------
+
+    async def promote_due(self) -> int:
+        """把退避时间已到的任务从 delayed 移回 pending，返回移动的数量"""
+        if self.is_local:
+            return 0
+        client = self._get_redis_client()
+        try:
+            moved = 0
+            for raw in await client.zrangebyscore(self._delayed_key, "-inf", time.time(), start=0, num=100):
+                # 多个 worker 同时巡检时只有 ZREM 成功的那个负责入队
+                if await client.zrem(self._delayed_key, raw):
+                    await client.lpush(self._pending_key, raw)
+                    moved += 1
+            return moved
+        finally:
+            await client.close()
+
+    async def recover_stale(self) -> int:
+        """
+        找出 processing 中租约过期的任务 (worker 崩溃 / 被杀)，按一次失败处理：退避重试或进入死信。
+        执行中的任务由 worker 定期刷新 running 状态来续约。
+        """
+        if self.is_local:
+            return 0
+        client = self._get_redis_client()
+        try:
+            raws = await client.lrange(self._processing_key, 0, -1)
+        finally:
+            await client.close()
+
+        now = time.time()
+        suspects = set()
+        recovered = 0
+        for raw in raws:
+            job = json.loads(raw)
+            status = await self.get_status(job["id"])
+            alive = (
+                status is not None
+                and status["status"] == STATUS_RUNNING
+                and now - status["updated_at"] < settings.JOB_LEASE_SECONDS
+            )
+            if alive:
+                continue
+            if raw not in self._stale_suspects:
+                suspects.add(raw)
+                continue
+            job["raw"] = raw
+            print(f"♻️ [Worker] 任务租约过期，重新调度: {self.name}/{job['id']}")
+            await self.retry(job, "worker 失联，任务租约过期")
+            recovered += 1
+        self._stale_suspects = suspects
+        return recovered
+
+
+async def _maintain(queue: JobQueue):
+    """定期把到期的重试任务放回 pending、回收租约过期的任务"""
+    last_recover = 0.0
+    while True:
+        try:
+            await queue.promote_due()
+            if time.monotonic() - last_recover >= settings.JOB_LEASE_SECONDS / 2:
+                last_recover = time.monotonic()
+                await queue.recover_stale()
+        except Exception as e:
+            print(f"⚠️ [Worker] 队列维护失败: {e}")
+        await asyncio.sleep(1)
+
+
+async def run_worker(queue: JobQueue, handler, concurrency: int):
+    """
+    消费循环：最多同时执行 concurrency 个任务。
+    handler: async def handler(payload: dict)，抛出异常即视为本次执行失败，按队列的 max_attempts 重试
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    # 持有任务引用，防止执行中的 Task 被垃圾回收
+    running_tasks: set[asyncio.Task] = set()
+    print(f"👷 [Worker] 队列 {queue.name} 开始消费 "
+          f"(并发上限 {concurrency}, 最多执行 {queue.max_attempts} 次, 模式 {queue.mode})")
+
+    async def _heartbeat(job: dict):
+        # 续约：刷新 running 状态的 updated_at，避免长任务被当成失联
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+            try:
+                await queue.set_job_status(job, STATUS_RUNNING, attempts=job.get("attempts", 0))
+            except Exception as e:
+                print(f"⚠️ [Worker] 续约失败: {e}")
+
+    async def _process(job: dict):
+        job_id = job["id"]
+        heartbeat = None
+        try:
+            await queue.set_job_status(job, STATUS_RUNNING, attempts=job.get("attempts", 0))
+            heartbeat = asyncio.create_task(_heartbeat(job))
+            await handler(job["payload"])
+            heartbeat.cancel()
+            await queue.set_job_status(job, STATUS_DONE, attempts=job.get("attempts", 0) + 1)
+            await queue.ack(job)
+            print(f"✅ [Worker] 任务完成: {queue.name}/{job_id}")
+        except Exception as e:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            print(f"❌ [Worker] 任务失败: {queue.name}/{job_id} - {e}")
+            try:
+                if await queue.retry(job, str(e)):
+                    print(f"🔁 [Worker] 将重试: {queue.name}/{job_id} (已执行 {job.get('attempts', 0) + 1} 次)")
+                else:
+                    print(f"🪦 [Worker] 重试次数用完，进入死信: {queue.name}/{job_id}")
+            except Exception as status_error:
+                print(f"⚠️ [Worker] 状态写入失败: {status_error}")
+        finally:
+            semaphore.release()
+
+    maintenance = asyncio.create_task(_maintain(queue))
+    try:
+        while True:
+            await semaphore.acquire()
+            try:
+                job = await queue.dequeue()
+            except Exception as e:
+                semaphore.release()
+                print(f"⚠️ [Worker] 出队失败，稍后重试: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            if job is None:
+                semaphore.release()
+                continue
+            task = asyncio.create_task(_process(job))
+            running_tasks.add(task)
+            task.add_done_callback(running_tasks.discard)
+    finally:
+        maintenance.cancel()
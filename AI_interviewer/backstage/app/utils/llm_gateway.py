@@ -0,0 +1,116 @@
+"""
+统一的异步大模型网关
+- 每个服务商 (DeepSeek / 硅基流动) 共用一个 AsyncOpenAI 客户端 + 一个 httpx 长连接池
+- 超时、重试、模型名全部来自 Settings
+- 全程 async，不会阻塞 uvicorn 的事件循环
+"""
+
+import httpx
+from openai import AsyncOpenAI
+from app.core.config import settings
+
+# 服务商名称常量，业务代码里统一用这两个名字
+PROVIDER_DEEPSEEK = "deepseek"
+PROVIDER_SILICON = "silicon"
+
+# 全局客户端缓存：进程内每个服务商只创建一次
+_clients: dict[str, AsyncOpenAI] = {}
+
+
+def _provider_config(provider: str) -> dict:
+    """读取服务商的 Key / 地址 / 默认模型"""
+    if provider == PROVIDER_DEEPSEEK:
+        return {
+            "api_key": settings.DeepSeek_API_Key,
+            "base_url": settings.DEEPSEEK_BASE_URL,
+            "model": settings.DEEPSEEK_REPORT_MODEL,
+        }
+    if provider == PROVIDER_SILICON:
+        return {
+            "api_key": settings.Silicon_OCR_API_Key,
+            "base_url": settings.SILICON_BASE_URL,
+            "model": settings.SILICON_OCR_MODEL,
+        }
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+
+def default_model(provider: str) -> str:
+    return _provider_config(provider)["model"]
+
+
+def get_client(provider: str) -> AsyncOpenAI:
+    """
+    获取某个服务商的共享客户端。
+    第一次调用时创建连接池，之后所有请求复用同一个池子（keep-alive）。
+    """
+    client = _clients.get(provider)
+    if client is not None:
+        return client
+
+    cfg = _provider_config(provider)
+    if not cfg["api_key"]:
+        raise ValueError(f"API Key for provider '{provider}' is not configured.")
+
+    http_client = httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            settings.LLM_TIMEOUT_SECONDS,
+            connect=settings.LLM_CONNECT_TIMEOUT_SECONDS,
+        ),
+        limits=httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    )
+    client = AsyncOpenAI(
+        api_key=cfg["api_key"],
+        base_url=cfg["base_url"],
+        timeout=settings.LLM_TIMEOUT_SECONDS,
+        max_retries=settings.LLM_MAX_RETRIES,
+        http_client=http_client,
+    )
+    _clients[provider] = client
+    return client
+
+
+async def chat_completion(provider: str, messages: list[dict], model: str = None, **kwargs) -> str:
+    """
+    发送一次对话请求，返回模型回复的文本。
+    kwargs 原样透传给 chat.completions.create (temperature / max_tokens 等)。
+    """
+    client = get_client(provider)
+    completion = await client.chat.completions.create(
+        model=model or default_model(provider),
+        messages=messages,
+        **kwargs,
+    )
+    return completion.choices[0].message.content or ""
+
+
+async def stream_chat_completion(provider: str, messages: list[dict], model: str = None, **kwargs):
+    """
+    流式对话：异步生成器，模型每吐出一段文本就 yield 一次。
+    """
+    client = get_client(provider)
+    stream = await client.chat.completions.create(
+        model=model or default_model(provider),
+        messages=messages,
+        stream=True,
+        **kwargs,
+    )
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+
+async def close_clients():
+    """应用关闭时释放所有连接池"""
+    for provider, client in list(_clients.items()):
+        try:
+            await client.close()
+        except Exception as e:
+            print(f"⚠️ 关闭 {provider} 客户端失败: {e}")
+    _clients.clear()
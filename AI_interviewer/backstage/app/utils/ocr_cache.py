@@ -0,0 +1,98 @@
+"""
+简历 OCR 结果的内容寻址缓存
+key = sha256(文件内容 SHA-256 + Prompt + 模型名 + 解析流程版本)
+两级存储：
+- Redis：带 TTL，多个 worker 共享，命中不需要读盘
+- 磁盘：{OCR_CACHE_DIR}/{key[:2]}/{key}.txt，Redis 过期 / 清空后仍能命中，命中后回填 Redis
+同一份简历重复上传时直接复用解析结果，不再调用多模态模型。
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.db.redis_tool import pool
+
+KEY_PREFIX = "ocr_cache:"
+
+# 解析流程 (文本层快速通道 / 渲染参数等) 变化时递增，让旧结果自然失效
+# v3：旧版本会把 “PDF 转换错误: ...” 之类的错误信息当成解析结果缓存，升级版本号丢弃这些条目
+PIPELINE_VERSION = "text-layer-v3"
+
+
+def make_ocr_cache_key(file_sha256: str, prompt: str, model: str) -> str:
+    raw = json.dumps(
+        {
+            "file": file_sha256,
+            "prompt": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+            "model": model,
+            "pipeline": PIPELINE_VERSION,
+        },
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _disk_path(key: str) -> str:
+    return os.path.join(settings.OCR_CACHE_DIR, key[:2], f"{key}.txt")
+
+
+def _read_disk(key: str):
+    try:
+        with open(_disk_path(key), "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write_disk(key: str, text: str):
+    path = _disk_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+async def get_cached_ocr(key: str):
+    """命中返回解析文本，未命中返回 None"""
+    client = redis.Redis(connection_pool=pool)
+    try:
+        try:
+            cached = await client.get(KEY_PREFIX + key)
+            if cached is not None:
+                print(f"🎯 [OCRCache] Redis 命中 {key[:12]}")
+                return cached
+        except Exception as e:
+            print(f"⚠️ [OCRCache] Redis 读取失败，改查磁盘: {e}")
+
+        text = await asyncio.to_thread(_read_disk, key)
+        if text is None:
+            return None
+        print(f"🎯 [OCRCache] 磁盘命中 {key[:12]}")
+        try:
+            await client.set(KEY_PREFIX + key, text, ex=settings.OCR_CACHE_TTL_SECONDS)
+        except Exception as e:
+            print(f"⚠️ [OCRCache] Redis 回填失败: {e}")
+        return text
+    finally:
+        await client.close()
+
+
+async def set_cached_ocr(key: str, text: str):
+    """写入磁盘和 Redis；任何一边失败都只打日志，不影响主流程"""
+    try:
+        await asyncio.to_thread(_write_disk, key, text)
+    except Exception as e:
+        print(f"⚠️ [OCRCache] 磁盘写入失败: {e}")
+
+    client = redis.Redis(connection_pool=pool)
+    try:
+        await client.set(KEY_PREFIX + key, text, ex=settings.OCR_CACHE_TTL_SECONDS)
+    except Exception as e:
+        print(f"⚠️ [OCRCache] Redis 写入失败: {e}")
+    finally:
+        await client.close()
@@ -0,0 +1,142 @@
+"""
+岗位目录 (岗位 + 面试官) 缓存
+- 一条 LEFT JOIN 查询构造完整目录，不再逐个岗位查面试官 (N+1)
+- 序列化后的 JSON 与 ETag 一起缓存在 Redis，命中时不查库
+- 通过 ORM 会话事件监听 Interview_position / Jobs / Interviewer 的增删改，提交后自动失效
+  （绕过 ORM 直接改库的情况由 TTL 兜底）
+"""
+
+import asyncio
+import hashlib
+import json
+import redis
+import redis.asyncio as aioredis
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.redis_tool import pool
+from app.models.Interview_position import Interview_position
+from app.models.Jobs import Jobs
+from app.models.Interviewer import Interviewer
+
+CATALOG_KEY = "position_catalog"   # HASH: body / etag
+
+_WATCHED_MODELS = (Interview_position, Jobs, Interviewer)
+_DIRTY_FLAG = "position_catalog_dirty"
+
+# 持有失效任务的引用，防止被垃圾回收
+_pending_tasks: set = set()
+
+
+def _make_etag(body: str) -> str:
+    return '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+async def _build_catalog(db: AsyncSession) -> list[dict]:
+    """一条查询拿到所有岗位及其面试官"""
+    stmt = (
+        select(Interview_position, Interviewer)
+        .outerjoin(Jobs, Jobs.position_id == Interview_position.id)
+        .outerjoin(Interviewer, Interviewer.id == Jobs.interviewer_id)
+        .order_by(Interview_position.id, Jobs.id)
+    )
+    rows = (await db.execute(stmt)).all()
+
+    catalog: dict[int, dict] = {}
+    for pos, interviewer in rows:
+        item = catalog.get(pos.id)
+        if item is None:
+            item = {
+                "id": pos.id,
+                "position_name": pos.position_name,
+                "description": pos.description,
+                "interviewers": [],
+            }
+            catalog[pos.id] = item
+        if interviewer is not None:
+            item["interviewers"].append({
+                "id": interviewer.id,
+                "name": interviewer.name,
+                "title": interviewer.title,
+                "description": interviewer.description,
+                "avatar": interviewer.avatar,
+            })
+    return list(catalog.values())
+
+
+async def get_catalog(db: AsyncSession) -> tuple[str, str]:
+    """返回 (序列化后的目录 JSON, ETag)，优先读 Redis"""
+    client = aioredis.Redis(connection_pool=pool)
+    try:
+        try:
+            cached = await client.hgetall(CATALOG_KEY)
+            if cached.get("body") and cached.get("etag"):
+                return cached["body"], cached["etag"]
+        except Exception as e:
+            print(f"⚠️ [PositionCatalog] Redis 读取失败，直接查库: {e}")
+
+        body = json.dumps(await _build_catalog(db), ensure_ascii=False, separators=(",", ":"))
+        etag = _make_etag(body)
+
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.hset(CATALOG_KEY, mapping={"body": body, "etag": etag})
+                pipe.expire(CATALOG_KEY, settings.POSITION_CATALOG_TTL_SECONDS)
+                await pipe.execute()
+        except Exception as e:
+            print(f"⚠️ [PositionCatalog] Redis 写入失败: {e}")
+        return body, etag
+    finally:
+        await client.close()
+
+
+async def invalidate_catalog():
+    client = aioredis.Redis(connection_pool=pool)
+    try:
+        await client.delete(CATALOG_KEY)
+        print("🧹 [PositionCatalog] 岗位目录缓存已失效")
+    except Exception as e:
+        print(f"⚠️ [PositionCatalog] 缓存失效失败: {e}")
+    finally:
+        await client.close()
+
+
+def _invalidate_from_sync_context():
+    """会话事件是同步回调：有事件循环就异步删除，否则 (同步脚本) 用同步客户端删除"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    if loop is not None:
+        task = loop.create_task(invalidate_catalog())
+        _pending_tasks.add(task)
+        task.add_done_callback(_pending_tasks.discard)
+        return
+
+    try:
+        redis.Redis.from_url(settings.REDIS_URL).delete(CATALOG_KEY)
+    except Exception as e:
+        print(f"⚠️ [PositionCatalog] 缓存失效失败: {e}")
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_catalog_dirty(session, flush_context):
+    # after_flush 时 new / dirty / deleted 仍是本次 flush 前的状态
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, _WATCHED_MODELS):
+            session.info[_DIRTY_FLAG] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop(_DIRTY_FLAG, False):
+        _invalidate_from_sync_context()
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_dirty_flag(session):
+    session.info.pop(_DIRTY_FLAG, None)
@@ -0,0 +1,166 @@
+"""
+性格测试题库的进程内索引
+- 题库只在首次使用 / 版本变化时从数据库加载一次，预先构造好 SurveyQuestion
+- 每次抽题只做 O(k) 的随机下标采样，耗时与题库大小无关
+- 额外按 Character_question.type 建立分组索引，支持按维度分层抽题
+- 版本号存在 Redis (question_bank:version)，data/db_import_data.py 导入新题后递增，
+  各 worker 发现版本变化后自动重新加载
+"""
+
+import asyncio
+import random
+import time
+import redis.asyncio as redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.redis_tool import pool
+from app.models.Character_question import Character_question
+from app.schemas.Character_test_writer_problem import SurveyQuestion
+
+VERSION_KEY = "question_bank:version"
+
+
+class QuestionBank:
+    def __init__(self, version, ids: list[int], payloads: list[SurveyQuestion], types: list[str]):
+        self.version = version
+        self.ids = ids            # 题目 id，与 payloads 一一对应
+        self.payloads = payloads  # 预先构造好的接口返回结构
+        # type -> payloads 下标列表（分层抽题用）
+        self.by_type: dict[str, list[int]] = {}
+        for idx, question_type in enumerate(types):
+            self.by_type.setdefault(question_type, []).append(idx)
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def sample(self, k: int) -> list[SurveyQuestion]:
+        """随机抽取 k 道不重复的题目，O(k)"""
+        k = min(k, len(self.payloads))
+        return [self.payloads[i] for i in random.sample(range(len(self.payloads)), k)]
+
+    def sample_stratified(self, k: int, per_type: int = None, max_total: int = None) -> list[SurveyQuestion]:
+        """
+        按维度 (type) 分层抽题，O(k)：
+        - 指定 per_type：每个维度各抽 per_type 道
+        - 否则把 k 道题尽量平均分配到各维度，余数随机分给部分维度
+        - max_total：返回题目总数上限；per_type × 维度数超过上限时改为把 max_total 道题平均分配
+        某个维度题目不足时，差额从其他维度剩余的题目里补齐（仅此时需要遍历剩余题目）。
+        """
+        types = sorted(self.by_type)
+        if not types:
+            return []
+
+        if per_type is not None and max_total is not None and per_type * len(types) > max_total:
+            per_type, k = None, max_total
+        elif max_total is not None:
+            k = min(k, max_total)
+
+        if per_type is not None:
+            quotas = {t: per_type for t in types}
+            k = per_type * len(types)
+        else:
+            base, remainder = divmod(k, len(types))
+            quotas = {t: base for t in types}
+            for t in random.sample(types, remainder):
+                quotas[t] += 1
+
+        chosen = []
+        leftovers = []
+        for t in types:
+            group = self.by_type[t]
+            take = min(quotas[t], len(group))
+            picked = random.sample(group, take)
+            chosen.extend(picked)
+            # 记录还有剩余题目的维度，供补齐差额使用
+            if take < len(group):
+                leftovers.append(t)
+
+        shortage = min(k, len(self.payloads)) - len(chosen)
+        if shortage > 0:
+            chosen_set = set(chosen)
+            candidates = [i for t in leftovers for i in self.by_type[t] if i not in chosen_set]
+            chosen.extend(random.sample(candidates, min(shortage, len(candidates))))
+
+        # 打乱顺序，避免同一维度的题目扎堆出现
+        random.shuffle(chosen)
+        return [self.payloads[i] for i in chosen]
+
+
+_bank: QuestionBank = None
+_last_version_check = 0.0
+_load_lock = asyncio.Lock()
+
+
+async def _read_remote_version():
+    client = redis.Redis(connection_pool=pool)
+    try:
+        return await client.get(VERSION_KEY)
+    finally:
+        await client.close()
+
+
+async def _load_bank(db: AsyncSession, version) -> QuestionBank:
+    stmt = select(
+        Character_question.id,
+        Character_question.type,
+        Character_question.questions,
+        Character_question.answers
+    ).order_by(Character_question.id)
+    rows = (await db.execute(stmt)).all()
+
+    ids = []
+    payloads = []
+    types = []
+    for row in rows:
+        ids.append(row.id)
+        types.append((row.type or "").strip())
+        payloads.append(SurveyQuestion(
+            id=str(row.id),          # 将数据库的 int 类型 id 转为 str
+            title=row.questions,
+            required=True,
+            options=row.answers
+        ))
+    bank = QuestionBank(version, ids, payloads, types)
+    print(f"📚 [QuestionBank] 题库已加载：{len(payloads)} 道题，{len(bank.by_type)} 个维度 (version={version})")
+    return bank
+
+
+async def get_question_bank(db: AsyncSession) -> QuestionBank:
+    """
+    获取当前题库索引。
+    每隔 QUESTION_BANK_VERSION_CHECK_SECONDS 才去 Redis 看一次版本号，其余时间纯内存。
+    """
+    global _bank, _last_version_check
+
+    now = time.monotonic()
+    if _bank is not None and now - _last_version_check < settings.QUESTION_BANK_VERSION_CHECK_SECONDS:
+        return _bank
+
+    async with _load_lock:
+        # 等锁期间可能已经被其他请求刷新过
+        if _bank is not None and time.monotonic() - _last_version_check < settings.QUESTION_BANK_VERSION_CHECK_SECONDS:
+            return _bank
+
+        try:
+            remote_version = await _read_remote_version()
+        except Exception as e:
+            print(f"⚠️ [QuestionBank] 读取版本号失败，继续使用当前题库: {e}")
+            remote_version = _bank.version if _bank is not None else None
+
+        if _bank is None or remote_version != _bank.version:
+            _bank = await _load_bank(db, remote_version)
+        _last_version_check = time.monotonic()
+        return _bank
+
+
+async def bump_question_bank_version():
+    """导入 / 修改题库后调用：递增版本号，让所有 worker 重新加载"""
+    client = redis.Redis(connection_pool=pool)
+    try:
+        version = await client.incr(VERSION_KEY)
+        print(f"🔄 [QuestionBank] 题库版本号已更新为 {version}")
+        return version
+    finally:
+        await client.close()
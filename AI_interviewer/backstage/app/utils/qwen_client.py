@@ -2,24 +2,201 @@ import os
 import base64
 import mimetypes
 import io
-from openai import OpenAI
+import asyncio
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
 import fitz  # PyMuPDF，用于替代 pdf2image，不需要系统级依赖
 from app.core.config import settings
+from app.utils.llm_gateway import chat_completion, PROVIDER_SILICON
+
+class ResumeParseError(RuntimeError):
+    """简历解析失败 (缺少 Key / 文件不存在 / 类型不支持 / PDF 渲染失败 / 模型调用失败)"""
+
 
 # === 1. 辅助函数：普通图片文件转 Base64 ===
 def encode_file_to_base64(file_path):
     with open(file_path, "rb") as image_file:
         return base64.b64encode(image_file.read()).decode('utf-8')
 
-# === 2. 主调用函数 ===
-def call_vl_model_multipage(file_path: str, prompt: str = None) -> str:
+# === 2. 辅助函数：PDF 逐页渲染为 Base64 JPEG ===
+# 渲染 + JPEG 编码 + Base64 都是 CPU 密集型操作，按页分发到进程池并行执行
+_render_pool: ProcessPoolExecutor = None
+
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(max_workers=settings.PDF_RENDER_PROCESSES)
+    return _render_pool
+
+
+def shutdown_render_pool(wait: bool = False):
+    """wait=True 时等渲染子进程退出：multiprocessing 子进程结束时不会执行线程清理，不等待会留下孤儿进程"""
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=wait, cancel_futures=True)
+        _render_pool = None
+
+
+def _render_pdf_page(file_path: str, page_index: int, dpi: int) -> tuple[dict, dict]:
     """
-    调用多模态模型解析简历文件（支持图片和PDF）
-    使用 PyMuPDF 进行 PDF 渲染，无需 sudo 权限。
+    在进程池中渲染单页：返回 (image_url 内容块, 耗时统计)。
+    PyMuPDF 的文档对象不能跨进程传递，每个任务自己打开文件。
     """
-    # 默认提示词
-    if prompt is None:
-        prompt = """
+    started = time.perf_counter()
+    doc = fitz.open(file_path)
+    try:
+        page = doc.load_page(page_index)
+        # alpha=False 强制白色背景（防止透明背景变黑）
+        pix = page.get_pixmap(dpi=dpi, alpha=False)
+        rendered = time.perf_counter()
+
+        # 直接获取 JPEG 格式的二进制数据，再转 Base64
+        img_bytes = pix.tobytes("jpeg")
+        base64_img = base64.b64encode(img_bytes).decode('utf-8')
+        encoded = time.perf_counter()
+    finally:
+        doc.close()
+
+    part = {
+        "type": "image_url",
+        "image_url": {
+            "url": f"data:image/jpeg;base64,{base64_img}"
+        }
+    }
+    timing = {
+        "page": page_index + 1,
+        "render_ms": round((rendered - started) * 1000, 1),
+        "encode_ms": round((encoded - rendered) * 1000, 1),
+        "jpeg_bytes": len(img_bytes),
+    }
+    return part, timing
+
+
+async def _render_pdf_pages(file_path: str, page_indexes: list[int]) -> list[dict]:
+    """
+    使用 PyMuPDF 以 PDF_RENDER_DPI 渲染指定页 (从 0 开始)，返回可直接放入 content 的 image_url 列表。
+    每页一个进程池任务，并打印每页的渲染 / 编码耗时。
+    """
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    pool = _get_render_pool()
+    results = await asyncio.gather(*(
+        loop.run_in_executor(pool, _render_pdf_page, file_path, i, settings.PDF_RENDER_DPI)
+        for i in page_indexes
+    ))
+
+    for _, timing in results:
+        print(f"📄 [PDFRender] 第 {timing['page']} 页: 渲染 {timing['render_ms']}ms, "
+              f"编码 {timing['encode_ms']}ms, {timing['jpeg_bytes']} bytes")
+    print(f"📄 [PDFRender] 共 {len(results)} 页，总耗时 {(time.perf_counter() - started) * 1000:.1f}ms")
+    return [part for part, _ in results]
+
+# === 3. 辅助函数：PDF 文本层快速通道 ===
+# Word 导出的 PDF 自带文本层，直接抽取即可；只有扫描件 / 纯图片页才需要走多模态模型
+def _garbage_ratio(text: str) -> float:
+    """乱码字符占比：替换符、私用区、未分配码位、控制字符 (换行 / 制表符除外)"""
+    chars = [c for c in text if not c.isspace()]
+    if not chars:
+        return 1.0
+    garbage = sum(
+        1 for c in chars
+        if c == "\ufffd" or unicodedata.category(c) in ("Co", "Cn", "Cc", "Cs")
+    )
+    return garbage / len(chars)
+
+
+def _text_coverage(page) -> float:
+    """文本块面积占页面面积的比例"""
+    page_rect = page.rect
+    page_area = page_rect.width * page_rect.height
+    if page_area <= 0:
+        return 0.0
+    covered = 0.0
+    for block in page.get_text("blocks"):
+        if block[6] != 0:  # 只统计文本块，跳过图片块
+            continue
+        rect = fitz.Rect(block[:4]) & page_rect
+        covered += rect.width * rect.height
+    return min(1.0, covered / page_area)
+
+
+def _score_text_layer(text: str, coverage: float) -> dict:
+    """
+    文本层质量分 (0~1)：字符数、乱码率、页面覆盖率三项相乘，任何一项很差都会拉低总分
+    """
+    chars = sum(1 for c in text if not c.isspace())
+    garbage = _garbage_ratio(text)
+    score = (
+        min(1.0, chars / settings.PDF_TEXT_MIN_CHARS)
+        * max(0.0, 1.0 - garbage / settings.PDF_TEXT_MAX_GARBAGE_RATIO)
+        * min(1.0, coverage / settings.PDF_TEXT_MIN_COVERAGE)
+    )
+    return {
+        "chars": chars,
+        "garbage_ratio": round(garbage, 3),
+        "coverage": round(coverage, 3),
+        "score": round(score, 3),
+    }
+
+
+def _extract_text_layer(file_path: str, max_pages: int) -> list[dict]:
+    """
+    逐页抽取文本层并打分 (同步，调用方放到线程池中执行)。
+    返回 [{index, text, chars, garbage_ratio, coverage, score, use_text}, ...]
+    """
+    pages = []
+    doc = fitz.open(file_path)
+    try:
+        total_pages = len(doc)
+        # 设置最大页数防止 Token 溢出
+        if total_pages > max_pages:
+            print(f"提示: PDF 页数 ({total_pages}) 超过限制，只处理前 {max_pages} 页。")
+
+        for i in range(min(total_pages, max_pages)):
+            page = doc.load_page(i)
+            text = page.get_text("text", sort=True).strip()
+            quality = _score_text_layer(text, _text_coverage(page))
+            pages.append({
+                "index": i,
+                "text": text,
+                **quality,
+                "use_text": quality["score"] >= settings.PDF_TEXT_QUALITY_THRESHOLD,
+            })
+    finally:
+        doc.close()
+    return pages
+
+
+# === 4. 主调用函数 ===
+def _contiguous_runs(indexes: list[int]) -> list[list[int]]:
+    """[0, 2, 3, 5] -> [[0], [2, 3], [5]]"""
+    runs = []
+    for index in indexes:
+        if runs and index == runs[-1][-1] + 1:
+            runs[-1].append(index)
+        else:
+            runs.append([index])
+    return runs
+
+
+async def _ocr_images(prompt: str, image_parts: list[dict]) -> str:
+    """一次多模态调用：Prompt + 若干页图片，返回识别文本"""
+    return await chat_completion(
+        PROVIDER_SILICON,
+        messages=[
+            {
+                "role": "user",
+                "content": [{"type": "text", "text": prompt}, *image_parts]
+            }
+        ],
+        max_tokens=2048
+    )
+
+
+# 默认提示词 (也是 OCR 缓存 key 的一部分，见 app/utils/ocr_cache.py)
+DEFAULT_RESUME_PROMPT = """
         请仔细阅读这份简历图片，提取并整理简历中存在的文本信息，按照简历中的顺序进行文本转录。（不要改变简历中的文本）
         如果简历包含多页，请整合所有页面的信息。
         **注意**
@@ -28,19 +205,24 @@ def call_vl_model_multipage(file_path: str, prompt: str = None) -> str:
         - 格式清晰，分行。纯文本的形式返回，**禁止markdown格式**。
         """
 
-    try:
-        api_key =settings.Silicon_OCR_API_Key
-        if not api_key:
-            return "Error: Silicon_OCR_API_Key not found."
 
-        # 初始化客户端
-        client = OpenAI(
-            api_key=api_key,
-            base_url="https://api.siliconflow.cn/v1" 
-        )
+async def call_vl_model_multipage(file_path: str, prompt: str = None) -> str:
+    """
+    调用多模态模型解析简历文件（支持图片和PDF）
+    使用 PyMuPDF 进行 PDF 渲染，无需 sudo 权限。
+    通过共享的异步网关 (llm_gateway) 发送请求，复用长连接池。
+    只返回真实的解析文本，任何失败都抛出 ResumeParseError (错误信息不会被当成解析结果保存 / 缓存)
+    """
+    # 默认提示词
+    if prompt is None:
+        prompt = DEFAULT_RESUME_PROMPT
+
+    try:
+        if not settings.Silicon_OCR_API_Key:
+            raise ResumeParseError("Silicon_OCR_API_Key not found.")
 
         if not os.path.exists(file_path):
-            return f"Error: File not found at {file_path}"
+            raise ResumeParseError(f"File not found at {file_path}")
 
         # 准备消息内容列表
         content_parts = [
@@ -53,47 +235,43 @@ def call_vl_model_multipage(file_path: str, prompt: str = None) -> str:
         if mime_type == 'application/pdf':
             print("正在处理多页 PDF (PyMuPDF)...")
             try:
-                # 1. 打开 PDF 文档
-                doc = fitz.open(file_path)
-                
-                # 设置最大页数防止 Token 溢出
-                max_pages = 5 
-                total_pages = len(doc)
-                
-                if total_pages > max_pages:
-                    print(f"提示: PDF 页数 ({total_pages}) 超过限制，只处理前 {max_pages} 页。")
-                
-                # 2. 循环处理每一页
-                for i in range(min(total_pages, max_pages)):
-                    print(f"正在编码第 {i+1} 页...")
-                    page = doc.load_page(i)
-                    
-                    # matrix=fitz.Matrix(2, 2) 表示放大 2 倍，提高清晰度以利于 OCR
-                    # alpha=False 强制白色背景（防止透明背景变黑）
-                    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2), alpha=False)
-                    
-                    # 直接获取 JPEG 格式的二进制数据
-                    img_bytes = pix.tobytes("jpeg")
-                    
-                    # 转 Base64
-                    base64_img = base64.b64encode(img_bytes).decode('utf-8')
-                    
-                    # 3. 添加到 content 列表
-                    content_parts.append({
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_img}"
-                        }
-                    })
-                
-                doc.close()
+                # 先走文本层快速通道，只有扫描页 / 图片页才渲染后交给多模态模型
+                pdf_pages = await asyncio.to_thread(_extract_text_layer, file_path, 5)
+                for page in pdf_pages:
+                    print(f"📄 [PDFText] 第 {page['index'] + 1} 页: 字符 {page['chars']}, "
+                          f"乱码率 {page['garbage_ratio']}, 覆盖率 {page['coverage']}, "
+                          f"质量分 {page['score']} -> {'文本层' if page['use_text'] else 'OCR'}")
+
+                scanned = [page["index"] for page in pdf_pages if not page["use_text"]]
+                if not scanned:
+                    print("✅ 所有页面都有可用文本层，跳过多模态模型")
+                    return "\n\n".join(page["text"] for page in pdf_pages)
 
+                # 渲染 + 编码在进程池中按页并行，不阻塞事件循环
+                rendered = dict(zip(scanned, await _render_pdf_pages(file_path, scanned)))
             except Exception as e:
-                return f"PDF 转换错误: {str(e)}"
+                raise ResumeParseError(f"PDF 转换错误: {str(e)}") from e
+
+            # 连续的扫描页合成一段，每段单独调用一次模型 (各段并行)，结果放回该段所在页的位置，
+            # 保证 [扫描1, 文本2, 扫描3] 这样的文档输出顺序仍是 1、2、3
+            runs = _contiguous_runs(scanned)
+            print(f"发送请求中，{len(scanned)} 张扫描页分 {len(runs)} 段识别...")
+            run_texts = await asyncio.gather(*(
+                _ocr_images(prompt, [rendered[index] for index in run]) for run in runs
+            ))
+            ocr_by_start = {run[0]: text for run, text in zip(runs, run_texts)}
+
+            pieces = []
+            for page in pdf_pages:
+                if page["use_text"]:
+                    pieces.append(page["text"])
+                elif page["index"] in ocr_by_start:
+                    pieces.append(ocr_by_start[page["index"]])
+            return "\n\n".join(pieces)
 
         # === 分支 B: 处理单张图片 ===
         elif mime_type and mime_type.startswith('image'):
-            base64_img = encode_file_to_base64(file_path)
+            base64_img = await asyncio.to_thread(encode_file_to_base64, file_path)
             content_parts.append({
                 "type": "image_url",
                 "image_url": {
@@ -102,24 +280,14 @@ def call_vl_model_multipage(file_path: str, prompt: str = None) -> str:
             })
         
         else:
-            return "Error: Unsupported file type. Only PDF, JPG, PNG supported."
+            raise ResumeParseError("Unsupported file type. Only PDF, JPG, PNG supported.")
 
-        # === 4. 发送请求 ===
+        # === 5. 发送请求 ===
         print(f"发送请求中，包含 {len(content_parts)-1} 张图片...")
-        
-        completion = client.chat.completions.create(
-            model="Qwen/Qwen3-VL-235B-A22B-Thinking", 
-            messages=[
-                {
-                    "role": "user",
-                    "content": content_parts 
-                }
-            ],
-            max_tokens=2048 
-        )
-
-        return completion.choices[0].message.content
+        return await _ocr_images(prompt, content_parts[1:])
 
+    except ResumeParseError:
+        raise
     except Exception as e:
         print(f"API Error: {e}")
-        return f"Error processing resume: {str(e)}"
\ No newline at end of file
+        raise ResumeParseError(f"Error processing resume: {str(e)}") from e
\ No newline at end of file
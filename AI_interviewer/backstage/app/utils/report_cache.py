@@ -0,0 +1,170 @@
+"""
+性格测试报告的内容寻址缓存
+key = sha256(规范化后的问答对 + Prompt 版本 + 模型名)
+两级缓存：
+- 进程内 LRU (OrderedDict)，命中不需要任何网络往返 (命中次数先记在本地，随下一次访问 Redis 时一起写入全局统计)
+- Redis：带 TTL，并用一个 ZSET 记录写入时间，超过上限时淘汰最旧的条目
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.db.redis_tool import pool
+
+KEY_PREFIX = "report_cache:"
+INDEX_KEY = "report_cache:index"      # ZSET: member=hash, score=写入时间
+STATS_KEY = "report_cache:stats"      # HASH: 跨 worker 的命中统计
+
+# 进程内 LRU：hash -> JSON 字符串（每次命中 loads 一份新对象，避免被调用方修改）
+_lru: "OrderedDict[str, str]" = OrderedDict()
+
+# 进程内统计
+_stats = {"lru_hits": 0, "redis_hits": 0, "misses": 0}
+# 还没写入 Redis 全局统计的 LRU 命中次数
+_unflushed_lru_hits = 0
+
+
+def _normalize_text(text) -> str:
+    # 合并多余空白，避免前端细微差异导致缓存不命中
+    return " ".join(str(text or "").split())
+
+
+def make_cache_key(qa_list: list, prompt_version: str) -> str:
+    """根据问答对 + Prompt 版本 计算缓存 key（与题目顺序无关）"""
+    pairs = sorted(
+        (_normalize_text(qa.get("question")), _normalize_text(qa.get("answer")))
+        for qa in (qa_list or [])
+    )
+    raw = json.dumps(
+        {"v": prompt_version, "model": settings.DEEPSEEK_REPORT_MODEL, "qa": pairs},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _lru_get(key: str):
+    value = _lru.get(key)
+    if value is not None:
+        _lru.move_to_end(key)
+    return value
+
+
+def _lru_set(key: str, value: str):
+    _lru[key] = value
+    _lru.move_to_end(key)
+    while len(_lru) > settings.REPORT_CACHE_LRU_SIZE:
+        _lru.popitem(last=False)
+
+
+def _get_redis_client() -> redis.Redis:
+    return redis.Redis(connection_pool=pool)
+
+
+async def _flush_stats(client: redis.Redis, field: str = None):
+    """把积攒的 LRU 命中次数 (以及本次的 field) 一次性写入全局统计，失败时留到下次再写"""
+    global _unflushed_lru_hits
+    lru_hits, _unflushed_lru_hits = _unflushed_lru_hits, 0
+    if not lru_hits and field is None:
+        return
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            if lru_hits:
+                pipe.hincrby(STATS_KEY, "lru_hits", lru_hits)
+            if field is not None:
+                pipe.hincrby(STATS_KEY, field, 1)
+            await pipe.execute()
+    except Exception as e:
+        _unflushed_lru_hits += lru_hits
+        print(f"⚠️ [ReportCache] 统计写入失败: {e}")
+
+
+async def _incr_stat(client: redis.Redis, field: str):
+    _stats[field] += 1
+    await _flush_stats(client, field)
+
+
+async def get_cached_report(qa_list: list, prompt_version: str):
+    """查询缓存，命中返回报告字典，未命中返回 None"""
+    global _unflushed_lru_hits
+    key = make_cache_key(qa_list, prompt_version)
+    value = _lru_get(key)
+    if value is not None:
+        # 热路径不访问 Redis：只记本地计数
+        print(f"⚡ [ReportCache] 进程内缓存命中: {key[:12]}")
+        _stats["lru_hits"] += 1
+        _unflushed_lru_hits += 1
+        return json.loads(value)
+
+    client = _get_redis_client()
+    try:
+        try:
+            value = await client.get(KEY_PREFIX + key)
+        except Exception as e:
+            print(f"⚠️ [ReportCache] Redis 读取失败: {e}")
+            value = None
+
+        if value is not None:
+            print(f"⚡ [ReportCache] Redis 缓存命中: {key[:12]}")
+            _lru_set(key, value)
+            await _incr_stat(client, "redis_hits")
+            return json.loads(value)
+
+        await _incr_stat(client, "misses")
+        return None
+    finally:
+        await client.close()
+
+
+async def set_cached_report(qa_list: list, prompt_version: str, report: dict):
+    """写入两级缓存，并按上限淘汰 Redis 中最旧的条目"""
+    key = make_cache_key(qa_list, prompt_version)
+    value = json.dumps(report, ensure_ascii=False)
+    _lru_set(key, value)
+
+    client = _get_redis_client()
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.set(KEY_PREFIX + key, value, ex=settings.REPORT_CACHE_TTL_SECONDS)
+            pipe.zadd(INDEX_KEY, {key: time.time()})
+            # 顺便清理索引里已经过期的条目
+            pipe.zremrangebyscore(INDEX_KEY, 0, time.time() - settings.REPORT_CACHE_TTL_SECONDS)
+            pipe.zcard(INDEX_KEY)
+            results = await pipe.execute()
+
+        overflow = results[-1] - settings.REPORT_CACHE_REDIS_MAX_ENTRIES
+        if overflow > 0:
+            evicted = await client.zpopmin(INDEX_KEY, overflow)
+            if evicted:
+                await client.delete(*[KEY_PREFIX + member for member, _ in evicted])
+                print(f"🧹 [ReportCache] 淘汰 {len(evicted)} 条旧缓存")
+    except Exception as e:
+        print(f"⚠️ [ReportCache] Redis 写入失败: {e}")
+    finally:
+        await client.close()
+
+
+async def get_cache_stats() -> dict:
+    """返回本进程与全局 (Redis) 的命中统计"""
+    global_stats = {}
+    client = _get_redis_client()
+    try:
+        await _flush_stats(client)
+        raw = await client.hgetall(STATS_KEY)
+        global_stats = {k: int(v) for k, v in raw.items()}
+        redis_entries = await client.zcard(INDEX_KEY)
+    except Exception as e:
+        print(f"⚠️ [ReportCache] 统计读取失败: {e}")
+        redis_entries = None
+    finally:
+        await client.close()
+
+    return {
+        "process": dict(_stats, lru_entries=len(_lru)),
+        "global": global_stats,
+        "redis_entries": redis_entries,
+    }
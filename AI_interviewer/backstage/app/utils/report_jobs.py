@@ -0,0 +1,15 @@
+"""
+性格测试报告生成任务队列
+提交问卷 (Character_test_writer_api) 时入队，查看 / 重新生成报告 (Character_test_report_api) 时补投，
+由独立 worker 进程 (app/utils/report_worker.py) 消费；JOB_QUEUE_MODE=local 时在 API 进程内消费。
+"""
+
+from app.core.config import settings
+from app.utils.job_queue import JobQueue
+
+report_queue = JobQueue("character_report", max_attempts=settings.REPORT_JOB_MAX_ATTEMPTS)
+
+
+async def enqueue_report_job(answer_id: int) -> bool:
+    """为某条答卷排队生成报告（已在排队/执行中则忽略）"""
+    return await report_queue.enqueue(str(answer_id), {"answer_id": answer_id})
@@ -0,0 +1,53 @@
+"""
+性格测试报告 worker：消费提交问卷时入队的报告生成任务
+用法（在 backstage 目录下运行）：
+    python -m app.utils.report_worker
+进程数 / 每进程并发数见 Settings.REPORT_WORKER_PROCESSES / REPORT_WORKER_CONCURRENCY
+"""
+
+import sys
+import asyncio
+import multiprocessing
+
+from app.core.config import settings
+from app.utils.job_queue import run_worker
+from app.utils.report_jobs import report_queue
+from app.api.interviewee_api.Character_test_report_api import generate_report_for_answer
+
+
+async def handle_report_job(payload: dict):
+    await generate_report_for_answer(int(payload["answer_id"]))
+
+
+def _worker_process(index: int):
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    print(f"🚀 [ReportWorker-{index}] 启动")
+    asyncio.run(run_worker(report_queue, handle_report_job, settings.REPORT_WORKER_CONCURRENCY))
+
+
+def main():
+    if report_queue.is_local:
+        print("❌ JOB_QUEUE_MODE=local 时任务在 API 进程内执行，无需单独启动 worker。")
+        return
+
+    process_count = max(1, settings.REPORT_WORKER_PROCESSES)
+    if process_count == 1:
+        _worker_process(0)
+        return
+
+    processes = [
+        multiprocessing.Process(target=_worker_process, args=(i,), daemon=True)
+        for i in range(process_count)
+    ]
+    for p in processes:
+        p.start()
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        print("🛑 [ReportWorker] 正在退出...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+简历解析 worker：消费上传简历时入队的 OCR / 入库任务
+用法（在 backstage 目录下运行）：
+    python -m app.utils.resume_worker
+进程数 / 每进程并发数见 Settings.RESUME_WORKER_PROCESSES / RESUME_WORKER_CONCURRENCY，
+两者相乘即同时进行的 VL 模型调用上限
+"""
+
+import sys
+import signal
+import asyncio
+import multiprocessing
+
+from app.core.config import settings
+from app.utils.job_queue import run_worker
+from app.utils.qwen_client import shutdown_render_pool
+from app.api.interviewee_api.Resume_upload_api import resume_queue, process_and_save_resume, ensure_resume_upsert_index
+
+
+async def handle_resume_job(payload: dict):
+    await process_and_save_resume(**payload)
+
+
+def _exit_on_sigterm(signum, frame):
+    # 转成 SystemExit，让 finally 里的清理 (关闭 PDF 渲染进程池) 得以执行
+    raise SystemExit(0)
+
+
+def _worker_process(index: int):
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+    print(f"🚀 [ResumeWorker-{index}] 启动")
+    try:
+        asyncio.run(_run())
+    finally:
+        shutdown_render_pool(wait=True)
+
+
+async def _run():
+    await ensure_resume_upsert_index()
+    await run_worker(resume_queue, handle_resume_job, settings.RESUME_WORKER_CONCURRENCY)
+
+
+def start_worker_processes(process_count: int, target=_worker_process) -> list[multiprocessing.Process]:
+    """
+    启动 worker 子进程。不能用 daemon 进程：OCR 任务要在 worker 里再创建 PDF 渲染进程池，
+    守护进程不允许有子进程；退出时由 stop_worker_processes 负责终止并回收
+    """
+    processes = [
+        multiprocessing.Process(target=target, args=(i,), name=f"resume-worker-{i}")
+        for i in range(process_count)
+    ]
+    for p in processes:
+        p.start()
+    return processes
+
+
+def stop_worker_processes(processes: list[multiprocessing.Process], timeout: float = 10.0):
+    for p in processes:
+        if p.is_alive():
+            p.terminate()
+    for p in processes:
+        p.join(timeout)
+        if p.is_alive():
+            p.kill()
+            p.join()
+
+
+def main():
+    if resume_queue.is_local:
+        print("❌ JOB_QUEUE_MODE=local 时任务在 API 进程内执行，无需单独启动 worker。")
+        return
+
+    process_count = max(1, settings.RESUME_WORKER_PROCESSES)
+    if process_count == 1:
+        _worker_process(0)
+        return
+
+    processes = start_worker_processes(process_count)
+    # 子进程启动之后再安装：主进程收到 SIGTERM 时同样走下面的 finally 回收子进程
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        print("🛑 [ResumeWorker] 正在退出...")
+    finally:
+        stop_worker_processes(processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Single-flight 请求合并
+同一个 key 同时只允许一个“领头”请求真正执行（例如调用大模型），其余请求等待它的结果：
+- 进程内：key -> asyncio.Future 的映射，跟随者直接 await 同一个 Future
+- 跨进程 (多个 uvicorn worker)：基于 redis_tool.pool 的 Redis 锁 (SET NX PX)，
+  领头者把结果写入 Redis，其他 worker 的跟随者轮询结果 key
+结果必须可以 JSON 序列化（报告字典即可）。
+"""
+
+import asyncio
+import json
+import uuid
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.db.redis_tool import pool
+
+# 进程内正在执行的任务
+_inflight: dict[str, asyncio.Future] = {}
+
+LOCK_PREFIX = "single_flight:lock:"
+RESULT_PREFIX = "single_flight:result:"
+
+# 只有持有者 token 一致时才删除锁，防止误删别人的锁
+_RELEASE_LOCK_LUA = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def _get_redis_client() -> redis.Redis:
+    return redis.Redis(connection_pool=pool)
+
+
+async def _run_with_redis_lock(key: str, fn):
+    """
+    跨 worker 的合并逻辑：抢到锁的执行 fn，其余轮询结果。
+    Redis 不可用时降级为直接执行（进程内合并仍然有效）。
+    """
+    client = _get_redis_client()
+    lock_key = LOCK_PREFIX + key
+    result_key = RESULT_PREFIX + key
+    token = uuid.uuid4().hex
+    lock_ttl_ms = int(settings.SINGLE_FLIGHT_LOCK_TTL_SECONDS * 1000)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.SINGLE_FLIGHT_WAIT_TIMEOUT_SECONDS
+
+    try:
+        while True:
+            try:
+                # 先看看其他 worker 是否刚刚算完
+                cached = await client.get(result_key)
+                if cached is not None:
+                    print(f"🔗 [SingleFlight] 复用其他 worker 的结果: {key}")
+                    return json.loads(cached)
+
+                acquired = await client.set(lock_key, token, nx=True, px=lock_ttl_ms)
+            except Exception as e:
+                print(f"⚠️ [SingleFlight] Redis 不可用，直接执行: {e}")
+                return await fn()
+
+            if acquired:
+                break
+
+            if loop.time() >= deadline:
+                raise TimeoutError(f"Waiting for single-flight leader timed out: {key}")
+            await asyncio.sleep(settings.SINGLE_FLIGHT_POLL_INTERVAL_SECONDS)
+
+        # === 当前请求是领头者 ===
+        try:
+            result = await fn()
+            try:
+                await client.set(
+                    result_key,
+                    json.dumps(result, ensure_ascii=False, default=str),
+                    ex=settings.SINGLE_FLIGHT_RESULT_TTL_SECONDS
+                )
+            except Exception as e:
+                print(f"⚠️ [SingleFlight] 结果写入 Redis 失败: {e}")
+            return result
+        finally:
+            try:
+                await client.eval(_RELEASE_LOCK_LUA, 1, lock_key, token)
+            except Exception as e:
+                print(f"⚠️ [SingleFlight] 释放锁失败: {e}")
+    finally:
+        await client.close()
+
+
+async def single_flight(key: str, fn):
+    """
+    以 key 为粒度合并并发调用。
+    fn: 无参异步函数，只会被领头请求执行一次；跟随者拿到同一个结果（或同一个异常）。
+    """
+    existing = _inflight.get(key)
+    if existing is not None:
+        print(f"🔗 [SingleFlight] 等待进程内正在执行的请求: {key}")
+        # shield：跟随者自己被取消时不影响领头者
+        return await asyncio.shield(existing)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await _run_with_redis_lock(key, fn)
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # 没有跟随者时避免 "Future exception was never retrieved" 警告
+        future.exception()
+        raise
+    finally:
+        _inflight.pop(key, None)
@@ -0,0 +1,134 @@
+"""
+视频流连接的运行指标 (进程内)
+- 每个 WebSocket 连接一份 StreamStats：收到的字节数 / 分片大小 / 速率 / 落盘延迟 / 距上一个分片的时间
+- 注册时检查并发上限 VIDEO_MAX_CONCURRENT_STREAMS，超过则拒绝
+- snapshot() 供指标接口返回：其他连接只给匿名统计，user_id / session_id 只出现在调用者自己的连接里
+  (session_id 可用于续传，不能泄露给别的用户)；多 worker 部署时每个进程各自统计、各自限流
+"""
+
+import time
+
+# 速率的指数滑动平均系数，越大越偏向最近的分片
+_RATE_ALPHA = 0.3
+
+
+class StreamStats:
+    def __init__(self, connection_id: str, user_id: str):
+        self.connection_id = connection_id
+        self.user_id = str(user_id)
+        self.session_id = None
+        self.connected_at = time.time()
+        self.last_chunk_at = None
+
+        self.bytes_received = 0
+        self.chunks = 0
+        self.min_chunk = None
+        self.max_chunk = 0
+        self.recent_bytes_per_sec = 0.0
+
+        self.writes = 0
+        self.write_latency_total = 0.0
+        self.write_latency_max = 0.0
+        self.last_write_latency = 0.0
+
+    def record_chunk(self, size: int):
+        now = time.time()
+        if self.last_chunk_at is not None:
+            interval = now - self.last_chunk_at
+            if interval > 0:
+                rate = size / interval
+                self.recent_bytes_per_sec += _RATE_ALPHA * (rate - self.recent_bytes_per_sec)
+        self.last_chunk_at = now
+        self.bytes_received += size
+        self.chunks += 1
+        self.max_chunk = max(self.max_chunk, size)
+        self.min_chunk = size if self.min_chunk is None else min(self.min_chunk, size)
+
+    def record_write(self, latency: float):
+        """一批数据从提交到线程池到落盘完成的耗时"""
+        self.writes += 1
+        self.last_write_latency = latency
+        self.write_latency_total += latency
+        self.write_latency_max = max(self.write_latency_max, latency)
+
+    def to_dict(self) -> dict:
+        now = time.time()
+        elapsed = max(now - self.connected_at, 1e-6)
+        return {
+            "connection_id": self.connection_id,
+            "user_id": self.user_id,
+            "session_id": self.session_id,
+            "connected_seconds": round(elapsed, 1),
+            "bytes_received": self.bytes_received,
+            "chunks": self.chunks,
+            "avg_bytes_per_sec": round(self.bytes_received / elapsed, 1),
+            "recent_bytes_per_sec": round(self.recent_bytes_per_sec, 1),
+            "chunk_bytes": {
+                "min": self.min_chunk or 0,
+                "max": self.max_chunk,
+                "avg": round(self.bytes_received / self.chunks, 1) if self.chunks else 0,
+            },
+            "write_latency_ms": {
+                "last": round(self.last_write_latency * 1000, 2),
+                "avg": round(self.write_latency_total / self.writes * 1000, 2) if self.writes else 0,
+                "max": round(self.write_latency_max * 1000, 2),
+            },
+            "seconds_since_last_chunk": round(now - self.last_chunk_at, 1) if self.last_chunk_at else None,
+        }
+
+
+_active: dict[str, StreamStats] = {}
+_totals = {
+    "connections": 0,
+    "bytes_received": 0,
+    "rejected_concurrency": 0,
+    "closed_idle": 0,
+    "closed_quota": 0,
+}
+
+
+def register_stream(connection_id: str, user_id: str, max_streams: int):
+    """登记一个新连接；已达并发上限时返回 None"""
+    if len(_active) >= max_streams:
+        _totals["rejected_concurrency"] += 1
+        return None
+    stats = StreamStats(connection_id, user_id)
+    _active[connection_id] = stats
+    _totals["connections"] += 1
+    return stats
+
+
+def unregister_stream(stats: StreamStats):
+    if _active.pop(stats.connection_id, None) is not None:
+        _totals["bytes_received"] += stats.bytes_received
+
+
+def record_close(reason: str):
+    """记录因配额 / 空闲被服务端关闭的连接 (reason: idle / quota)"""
+    _totals[f"closed_{reason}"] += 1
+
+
+def active_count() -> int:
+    return len(_active)
+
+
+_IDENTITY_FIELDS = ("connection_id", "user_id", "session_id")
+
+
+def snapshot(user_id: str) -> dict:
+    """user_id：调用者，只有他自己的连接会带上连接 / 会话标识"""
+    streams = [stats.to_dict() for stats in _active.values()]
+    return {
+        "active_streams": len(streams),
+        "active_bytes_per_sec": round(sum(s["recent_bytes_per_sec"] for s in streams), 1),
+        # 已结束连接的累计值 + 进行中连接的当前值
+        "totals": {
+            **_totals,
+            "bytes_received": _totals["bytes_received"] + sum(s["bytes_received"] for s in streams),
+        },
+        "streams": [
+            {key: value for key, value in s.items() if key not in _IDENTITY_FIELDS}
+            for s in streams
+        ],
+        "my_streams": [s for s in streams if s["user_id"] == str(user_id)],
+    }
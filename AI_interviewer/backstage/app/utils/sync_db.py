@@ -14,6 +14,23 @@ from app.models.user import User
 from app.models.Interview_record import Interview_record
 from app.models.Interview_position import Interview_position
 from app.models.Jobs import Jobs
+from app.models.Character_answer import Character_answer
+from app.models.Resume_message import Resume_messages
+
+# 唯一索引建立前的去重规则：表名 -> 排序列 (降序)，每组只保留排在最前的一条 (最新的)，其余删除
+# 没有规则的表出现重复数据时直接报错退出，需要人工清理
+DEDUP_KEEP_NEWEST = {
+    # 简历 upsert 依赖 user_id 唯一：保留最近上传的一条
+    "interview_resume_messages": ("created_at", "session_id"),
+}
+
+# 被新索引取代的旧索引：表名 -> {旧索引名: 取代它的新索引名}，新索引建好之后删除旧索引，避免同一列维护两份索引
+REPLACED_INDEXES = {
+    # 旧版本 user_id 列上的 index=True，已由唯一索引取代
+    "interview_resume_messages": {
+        "ix_interview_resume_messages_user_id": "uq_interview_resume_messages_user_id",
+    },
+}
 
 def get_sync_engine():
     db_url = settings.DATABASE_URL
@@ -52,6 +69,95 @@ def sync_table(engine, table):
             conn.execute(text(sql))
 
 
+def sync_indexes(engine, table):
+    """补建 ORM 中声明、但数据库里还没有的索引（只增不删）"""
+    inspector = inspect(engine)
+    db_indexes = {idx["name"] for idx in inspector.get_indexes(table.name)}
+
+    for index in table.indexes:
+        if index.name in db_indexes:
+            continue
+        if index.unique:
+            remove_duplicates(engine, table, index)
+        print(f"➕ 新增索引：{index.name}")
+        index.create(bind=engine)
+
+    drop_replaced_indexes(engine, table)
+
+
+def drop_replaced_indexes(engine, table):
+    """取代它的新索引已经存在时，删除旧索引"""
+    replaced = REPLACED_INDEXES.get(table.name)
+    if not replaced:
+        return
+    db_indexes = {idx["name"] for idx in inspect(engine).get_indexes(table.name)}
+    with engine.begin() as conn:
+        for old_name, new_name in replaced.items():
+            if old_name not in db_indexes or new_name not in db_indexes:
+                continue
+            if engine.dialect.name == "mysql":
+                sql = f"DROP INDEX {old_name} ON {table.name}"
+            else:
+                sql = f"DROP INDEX {old_name}"
+            print(f"➖ 删除被 {new_name} 取代的旧索引：{old_name}")
+            conn.execute(text(sql))
+
+
+def find_duplicates(engine, table, index) -> list:
+    """返回唯一索引列上重复的取值组合"""
+    columns = ", ".join(column.name for column in index.columns)
+    sql = f"SELECT {columns} FROM {table.name} GROUP BY {columns} HAVING COUNT(*) > 1"
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(text(sql)).fetchall()]
+
+
+def remove_duplicates(engine, table, index):
+    """
+    唯一索引建立前清理重复数据：按 DEDUP_KEEP_NEWEST 每组保留最新一条、删除其余；
+    没有去重规则时抛出 RuntimeError，不建索引也不继续同步
+    """
+    groups = find_duplicates(engine, table, index)
+    if not groups:
+        return
+
+    columns = ", ".join(column.name for column in index.columns)
+    order_columns = DEDUP_KEEP_NEWEST.get(table.name)
+    if order_columns is None:
+        raise RuntimeError(
+            f"无法建立唯一索引 {index.name}：{table.name} 中 ({columns}) 存在重复数据，例如 {groups[:10]}，"
+            f"请保留每组中需要的一条记录、删除其余记录后重新运行"
+        )
+
+    key_columns = [column.name for column in index.columns]
+    pk_columns = [column.name for column in table.primary_key.columns]
+    select_columns = list(dict.fromkeys(pk_columns + key_columns + list(order_columns)))
+    duplicate_keys = set(groups)
+
+    with engine.begin() as conn:
+        rows = conn.execute(text(f"SELECT {', '.join(select_columns)} FROM {table.name}")).mappings().fetchall()
+        grouped = {}
+        for row in rows:
+            key = tuple(row[name] for name in key_columns)
+            if key in duplicate_keys:
+                grouped.setdefault(key, []).append(row)
+
+        # 排序列为 NULL 的视为最旧
+        def sort_key(row):
+            return tuple((row[name] is not None, row[name] if row[name] is not None else "") for name in order_columns)
+
+        delete_sql = text(
+            f"DELETE FROM {table.name} WHERE " + " AND ".join(f"{name} = :{name}" for name in pk_columns)
+        )
+        removed = 0
+        for key, group in grouped.items():
+            group.sort(key=sort_key, reverse=True)
+            for row in group[1:]:
+                conn.execute(delete_sql, {name: row[name] for name in pk_columns})
+                removed += 1
+
+    print(f"🧹 建立唯一索引 {index.name} 前删除 {table.name} 中 {removed} 条重复记录 (每组保留 {order_columns[0]} 最新的一条)")
+
+
 def main():
     engine = get_sync_engine()
     inspector = inspect(engine)
@@ -62,6 +168,7 @@ def main():
             table.create(bind=engine)
         else:
             sync_table(engine, table)
+            sync_indexes(engine, table)
 
     print("\n✅ 表结构同步完成")
 
@@ -0,0 +1,193 @@
+"""
+面试录像的画面分析 (纯 CPU)
+- ffmpeg 按 VIDEO_ANALYSIS_SAMPLE_FPS 抽帧并缩放成小尺寸 RGB 原始帧，通过管道流式读取，内存只保留在途批次
+- 每批帧的统计在进程池中用 NumPy 向量化计算：
+    亮度         平均亮度 (Y 通道)
+    运动能量     相邻帧亮度差的平均值
+    人脸区域     画面中上部区域的肤色像素占比 (YCrCb 阈值)，用来粗略判断人是否在镜头前
+- 解码本身由 ffmpeg 多线程完成，统计按批次并行，30 分钟录像在 2 fps 下只有 3600 帧小图
+"""
+
+import subprocess
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.video_session import VideoSession, segment_path
+
+_pool: ProcessPoolExecutor = None
+
+
+def get_analysis_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.VIDEO_ANALYSIS_PROCESSES)
+    return _pool
+
+
+def shutdown_analysis_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# ---------------- 帧统计 (在进程池中执行) ----------------
+
+def frame_batch_stats(frames: np.ndarray, prev_frame: np.ndarray = None) -> dict[str, np.ndarray]:
+    """
+    frames: (N, H, W, 3) uint8 RGB
+    prev_frame: 上一批的最后一帧，用于计算本批第一帧的运动能量
+    返回每帧的 brightness / motion / face_ratio，取值都在 0~1
+    """
+    rgb = frames.astype(np.float32)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    luma = 0.299 * r + 0.587 * g + 0.114 * b
+
+    brightness = luma.mean(axis=(1, 2)) / 255.0
+
+    if prev_frame is not None:
+        prev = prev_frame.astype(np.float32)
+        prev_luma = 0.299 * prev[..., 0] + 0.587 * prev[..., 1] + 0.114 * prev[..., 2]
+    else:
+        prev_luma = luma[0]
+    motion = np.abs(np.diff(luma, axis=0, prepend=prev_luma[None])).mean(axis=(1, 2)) / 255.0
+
+    # 人脸区域：画面纵向 10%~70%、横向 25%~75%
+    height, width = luma.shape[1:]
+    rows = slice(int(height * 0.1), int(height * 0.7))
+    cols = slice(int(width * 0.25), int(width * 0.75))
+    rr, gg, bb = r[:, rows, cols], g[:, rows, cols], b[:, rows, cols]
+    cr = 128.0 + 0.5 * rr - 0.418688 * gg - 0.081312 * bb
+    cb = 128.0 - 0.168736 * rr - 0.331264 * gg + 0.5 * bb
+    skin = (cr >= 133) & (cr <= 173) & (cb >= 77) & (cb <= 127)
+    face_ratio = skin.mean(axis=(1, 2))
+
+    return {
+        "brightness": brightness.astype(np.float32),
+        "motion": motion.astype(np.float32),
+        "face_ratio": face_ratio.astype(np.float32),
+    }
+
+
+# ---------------- 解码 ----------------
+
+def ffmpeg_source(paths: list[str]) -> str:
+    """分段是同一条流按字节切开的，用 ffmpeg 的 concat 协议按顺序拼接读取"""
+    return paths[0] if len(paths) == 1 else "concat:" + "|".join(paths)
+
+
+def iter_frame_batches(paths: list[str], fps: float, width: int, height: int, batch_frames: int):
+    """逐批产出 (N, height, width, 3) 的 uint8 帧，ffmpeg 退出码非 0 时抛出 RuntimeError"""
+    command = [
+        settings.FFMPEG_BINARY, "-v", "error", "-threads", "0",
+        "-i", ffmpeg_source(paths),
+        "-an", "-vf", f"fps={fps},scale={width}:{height}",
+        "-pix_fmt", "rgb24", "-f", "rawvideo", "pipe:1",
+    ]
+    frame_bytes = width * height * 3
+    batch_bytes = frame_bytes * batch_frames
+
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            buf = proc.stdout.read(batch_bytes)
+            count = len(buf) // frame_bytes
+            if count:
+                yield np.frombuffer(buf, dtype=np.uint8, count=count * frame_bytes).reshape(count, height, width, 3)
+            if len(buf) < batch_bytes:
+                break
+        stderr = proc.stderr.read().decode("utf-8", "ignore")
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg 解码失败: {stderr.strip()[-500:]}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+# ---------------- 汇总 ----------------
+
+def _timeline(brightness, motion, face_present, fps: float) -> list[dict]:
+    """按 VIDEO_ANALYSIS_TIMELINE_SECONDS 分桶求平均，给回放 / 报告画折线用"""
+    step = max(1, int(round(settings.VIDEO_ANALYSIS_TIMELINE_SECONDS * fps)))
+    starts = np.arange(0, len(brightness), step)
+    counts = np.diff(np.append(starts, len(brightness)))
+    buckets = zip(
+        starts,
+        np.add.reduceat(brightness, starts) / counts,
+        np.add.reduceat(motion, starts) / counts,
+        np.add.reduceat(face_present.astype(np.float32), starts) / counts,
+    )
+    return [
+        {"t": round(start / fps, 1), "brightness": round(float(b), 3),
+         "motion": round(float(m), 4), "face": round(float(f), 3)}
+        for start, b, m, f in buckets
+    ]
+
+
+def summarize_frame_stats(batches: list[dict], fps: float) -> dict:
+    if not batches:
+        raise ValueError("录像中没有可用的视频帧")
+    brightness = np.concatenate([b["brightness"] for b in batches])
+    motion = np.concatenate([b["motion"] for b in batches])
+    face_ratio = np.concatenate([b["face_ratio"] for b in batches])
+
+    face_present = face_ratio >= settings.VIDEO_ANALYSIS_FACE_SKIN_RATIO
+    return {
+        "duration_seconds": round(len(brightness) / fps, 1),
+        "sampled_frames": int(len(brightness)),
+        "sample_fps": fps,
+        "brightness": {
+            "mean": round(float(brightness.mean()), 3),
+            "std": round(float(brightness.std()), 3),
+        },
+        "motion_energy": {
+            "mean": round(float(motion.mean()), 4),
+            "p95": round(float(np.percentile(motion, 95)), 4),
+            "active_ratio": round(float((motion >= settings.VIDEO_ANALYSIS_MOTION_THRESHOLD).mean()), 3),
+        },
+        "face_presence_ratio": round(float(face_present.mean()), 3),
+        "timeline": _timeline(brightness, motion, face_present, fps),
+    }
+
+
+def analyze_video(session: VideoSession) -> dict:
+    """
+    同步执行整段画面分析 (在线程中调用)：
+    主线程读 ffmpeg 管道，按批提交到进程池，在途批次数有上限，内存占用与录像长度无关
+    """
+    paths = [segment_path(session, seg) for seg in session.segments]
+    if not paths:
+        raise ValueError("会话没有视频分段")
+
+    started = time.monotonic()
+    fps = settings.VIDEO_ANALYSIS_SAMPLE_FPS
+    pool = get_analysis_pool()
+    max_inflight = settings.VIDEO_ANALYSIS_PROCESSES * 2
+
+    inflight = deque()
+    batches = []
+    prev_frame = None
+    for frames in iter_frame_batches(
+        paths, fps,
+        settings.VIDEO_ANALYSIS_FRAME_WIDTH,
+        settings.VIDEO_ANALYSIS_FRAME_HEIGHT,
+        settings.VIDEO_ANALYSIS_BATCH_FRAMES,
+    ):
+        inflight.append(pool.submit(frame_batch_stats, frames, prev_frame))
+        prev_frame = frames[-1].copy()
+        # FIFO 取结果，保证批次顺序与时间顺序一致
+        while len(inflight) >= max_inflight:
+            batches.append(inflight.popleft().result())
+    while inflight:
+        batches.append(inflight.popleft().result())
+
+    result = summarize_frame_stats(batches, fps)
+    result["elapsed_seconds"] = round(time.monotonic() - started, 2)
+    print(f"🎞️ [VideoAnalysis] {session.session_id}: {result['sampled_frames']} 帧, "
+          f"录像 {result['duration_seconds']}s, 耗时 {result['elapsed_seconds']}s")
+    return result
@@ -0,0 +1,168 @@
+"""
+面试视频流的缓冲写入器
+- MediaRecorder 每秒推来的小块先攒在内存里，攒够 VIDEO_FLUSH_BYTES 或超过 VIDEO_FLUSH_INTERVAL_SECONDS 再落盘
+- 真正的磁盘写入在共享线程池里执行，事件循环不会被磁盘抖动卡住
+- 每个连接一个有界队列 (VIDEO_WRITE_QUEUE_SIZE)：磁盘跟不上时 write() 会等待，
+  WebSocket 处理协程随之停止读取，形成背压
+- fsync 策略 (VIDEO_FSYNC_POLICY)：always 每批都 fsync / close 关闭时 fsync / never 交给操作系统
+  ack 在批次写入返回之后才发送：always 下 ack 表示已 fsync (断电不丢)，close / never 下只能扛住进程崩溃
+- 数据写入 SegmentedVideoStore (app/utils/video_session.py)：按大小 / 时长轮转分段并维护会话清单
+- 可续传：分片可带序号，每批落盘、清单更新后通过 ack_hook (事件循环内) 通知客户端
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
+from app.utils.video_session import SegmentedVideoStore
+
+# 所有连接共享的磁盘 IO 线程池
+_io_executor = ThreadPoolExecutor(
+    max_workers=settings.VIDEO_IO_THREADS,
+    thread_name_prefix="video-io"
+)
+
+async def run_io(fn, *args):
+    """在视频磁盘 IO 线程池中执行同步函数 (会话清单读写等)，与分段写入共用同一组线程"""
+    return await asyncio.get_running_loop().run_in_executor(_io_executor, fn, *args)
+
+
+FSYNC_ALWAYS = "always"
+FSYNC_CLOSE = "close"
+FSYNC_NEVER = "never"
+
+
+class BufferedVideoWriter:
+    def __init__(
+        self,
+        store: SegmentedVideoStore,
+        flush_bytes: int = None,
+        flush_interval: float = None,
+        queue_size: int = None,
+        fsync_policy: str = None,
+        ack_hook=None,
+        stats=None,
+    ):
+        """
+        store：分段存储，同步方法都在 IO 线程中调用
+        ack_hook(last_seq, offset)：异步函数，在事件循环中、一批数据落盘后调用（用于回 ack）
+        stats：可选的 StreamStats (app/utils/stream_metrics.py)，记录每批的落盘延迟
+        """
+        self.store = store
+        self.flush_bytes = flush_bytes or settings.VIDEO_FLUSH_BYTES
+        self.flush_interval = flush_interval or settings.VIDEO_FLUSH_INTERVAL_SECONDS
+        self.fsync_policy = fsync_policy or settings.VIDEO_FSYNC_POLICY
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or settings.VIDEO_WRITE_QUEUE_SIZE)
+        self._buffer: list[bytes] = []
+        self._buffered_bytes = 0
+        self._buffer_last_seq = None
+        self._last_enqueue = 0.0
+        self._opened = False
+        self._flusher: asyncio.Task = None
+        self._error: Exception = None
+
+        self._ack_hook = ack_hook
+        self._stats = stats
+
+        self.durable_seq = None             # 最后一个已落盘分片的序号
+
+    @property
+    def bytes_written(self) -> int:
+        """已交给操作系统的字节数（整条流的有效长度）"""
+        return self.store.bytes_written
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_io_executor, self.store.open)
+        self._opened = True
+        self._last_enqueue = loop.time()
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def write(self, chunk: bytes, seq: int = None):
+        """写入一个分片；缓冲满 / 超时时交给后台落盘，队列满时在这里等待（背压）"""
+        if self._error is not None:
+            raise self._error
+
+        self._buffer.append(chunk)
+        self._buffered_bytes += len(chunk)
+        if seq is not None:
+            self._buffer_last_seq = seq
+
+        loop = asyncio.get_running_loop()
+        if (self._buffered_bytes >= self.flush_bytes
+                or loop.time() - self._last_enqueue >= self.flush_interval):
+            await self._enqueue_buffer()
+
+    def _take_buffer(self) -> tuple[bytes, int]:
+        batch = (b"".join(self._buffer), self._buffer_last_seq)
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._last_enqueue = asyncio.get_running_loop().time()
+        return batch
+
+    async def _enqueue_buffer(self):
+        if not self._buffer:
+            return
+        await self._queue.put(self._take_buffer())
+
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                batch = await asyncio.wait_for(self._queue.get(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                # 一段时间没有攒满：队列此时为空，直接把缓冲区落盘，保证数据不会在内存里停留太久
+                if not self._buffer:
+                    continue
+                batch = self._take_buffer()
+
+            if batch is None:
+                break
+            data, last_seq = batch
+
+            # 出错后继续消费队列但不再写入，避免 write() 在 put 上永远阻塞
+            if self._error is not None:
+                continue
+
+            try:
+                started = loop.time()
+                await loop.run_in_executor(_io_executor, self._write_sync, data, last_seq)
+                if self._stats is not None:
+                    self._stats.record_write(loop.time() - started)
+                if last_seq is not None:
+                    self.durable_seq = last_seq
+            except Exception as e:
+                print(f"❌ [VideoIngest] 写入失败 {self.store.path}: {e}")
+                self._error = e
+                continue
+
+            if self._ack_hook is not None:
+                try:
+                    await self._ack_hook(self.durable_seq, self.bytes_written)
+                except Exception as e:
+                    print(f"⚠️ [VideoIngest] ack 发送失败: {e}")
+
+    def _write_sync(self, data: bytes, last_seq: int = None):
+        self.store.write(
+            data,
+            last_seq,
+            fsync=self.fsync_policy == FSYNC_ALWAYS,
+            # 轮转时旧分段不会再写入，按 close 策略处理
+            fsync_on_rotate=self.fsync_policy in (FSYNC_ALWAYS, FSYNC_CLOSE),
+        )
+
+    def _close_sync(self):
+        self.store.close(fsync=self.fsync_policy in (FSYNC_ALWAYS, FSYNC_CLOSE))
+
+    async def close(self):
+        """把剩余数据全部落盘并关闭文件"""
+        if not self._opened:
+            return
+        try:
+            await self._enqueue_buffer()
+            await self._queue.put(None)
+            await self._flusher
+        finally:
+            await asyncio.get_running_loop().run_in_executor(_io_executor, self._close_sync)
+            self._opened = False
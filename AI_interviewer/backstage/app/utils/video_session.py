@@ -0,0 +1,270 @@
+"""
+视频上传会话与分段存储
+- 每个会话一个目录：{VIDEO_UPLOAD_DIR}/{session_id}/
+    manifest.json      会话清单：用户、进度 (durable_seq / durable_offset)、分段列表
+    seg_00000.webm     分段文件，按 VIDEO_SEGMENT_MAX_BYTES / VIDEO_SEGMENT_MAX_SECONDS 轮转
+- 分段是同一条 WebM 流按字节切开的连续片段 (只有第一段带文件头)，按 index 顺序拼接即完整视频；
+  清单里记录每段在整条流中的 start_offset 与 bytes，回放 / 分析可以只读需要的区间 (见 locate_range)
+- 分段不能单独解码：清单的 layout = "concat" 表示必须按 index 顺序拼接；
+  init_length 记录流开头的初始化段 [0, init_length) (EBML 头 + Segment 信息 + Tracks，即第一个 Cluster 之前的字节)，
+  需要从中间开始解码时，先取这段字节，再拼上从某个 Cluster 起始处开始的数据
+- 清单只在数据写入之后更新 (由 SegmentedVideoStore 在 IO 线程中调用)，
+  断线 / 进程崩溃后以清单为准：截断到 durable_offset，从 durable_seq + 1 继续接收
+注意：同一会话的续传需要落到同一台机器 (共享 VIDEO_UPLOAD_DIR 亦可)，进程内由视频接口的 _active_streams 保证同一时刻只有一个连接写入。
+"""
+
+import json
+import os
+import re
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+
+from app.core.config import settings
+
+MANIFEST_NAME = "manifest.json"
+
+# 分段布局：按字节切开，只能按顺序拼接后解码
+LAYOUT_CONCAT = "concat"
+
+# WebM (Matroska) Cluster 元素 ID，第一次出现的位置即初始化段的长度
+_CLUSTER_ID = b"\x1f\x43\xb6\x75"
+# 初始化段只在流开头查找，超过这个长度还没找到就放弃 (init_length 保持为 None)
+_INIT_SCAN_LIMIT = 1024 * 1024
+
+# 只接受服务端生成的 uuid4 hex，防止路径穿越
+_SESSION_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+@dataclass
+class VideoSession:
+    session_id: str
+    user_id: str
+    durable_seq: int = -1       # 最后一个已落盘分片的序号，-1 表示还没有
+    durable_offset: int = 0     # 整条流中已落盘的字节数
+    completed: bool = False     # 客户端已发送 end，不再允许续传
+    created_at: float = 0.0
+    updated_at: float = 0.0
+    # 分段列表：{index, file, start_offset, bytes, first_seq, last_seq, started_at, ended_at}
+    segments: list[dict] = field(default_factory=list)
+    layout: str = LAYOUT_CONCAT         # 分段只能按 index 顺序拼接，不能单独解码
+    init_length: int = None             # 初始化段 [0, init_length) 的长度，还没找到第一个 Cluster 时为 None
+
+    @property
+    def next_seq(self) -> int:
+        return self.durable_seq + 1
+
+    @property
+    def directory(self) -> str:
+        return session_dir(self.session_id)
+
+
+def is_valid_session_id(session_id: str) -> bool:
+    return bool(session_id) and bool(_SESSION_ID_RE.match(session_id))
+
+
+def session_dir(session_id: str) -> str:
+    return os.path.join(settings.VIDEO_UPLOAD_DIR, session_id)
+
+
+def _manifest_path(session_id: str) -> str:
+    return os.path.join(session_dir(session_id), MANIFEST_NAME)
+
+
+def segment_path(session: VideoSession, segment: dict) -> str:
+    return os.path.join(session.directory, segment["file"])
+
+
+def create_session(user_id: str) -> VideoSession:
+    now = time.time()
+    session = VideoSession(
+        session_id=uuid.uuid4().hex,
+        user_id=str(user_id),
+        created_at=now,
+        updated_at=now,
+    )
+    os.makedirs(session.directory, exist_ok=True)
+    save_session(session)
+    return session
+
+
+def load_session(session_id: str):
+    """读取会话清单，不存在 / 损坏时返回 None (同步，需在线程池中调用)"""
+    if not is_valid_session_id(session_id):
+        return None
+    try:
+        with open(_manifest_path(session_id), "r", encoding="utf-8") as f:
+            return VideoSession(**json.load(f))
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def _fsync_dir(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def save_session(session: VideoSession, fsync: bool = False):
+    """
+    原子写入会话清单：先写临时文件再 rename，崩溃时不会留下半截 JSON (同步)
+    fsync=True 时临时文件与目录都 fsync，rename 后的清单 (以及同目录新建的分段文件) 断电也不会丢
+    """
+    session.updated_at = time.time()
+    path = _manifest_path(session.session_id)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(asdict(session), f, ensure_ascii=False)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    if fsync:
+        _fsync_dir(session.directory)
+
+
+def prepare_resume(session: VideoSession):
+    """
+    续传前让磁盘与清单一致 (同步)：
+    - 每个分段截断到清单记录的 bytes，丢掉写了一半、还没记进清单的数据
+    - 删除清单里没有的分段文件 (轮转后还没来得及写清单就断了)
+    之后由客户端从 next_seq 重发，保证不重复、不空洞
+    """
+    known = {seg["file"] for seg in session.segments}
+    for name in os.listdir(session.directory):
+        if name.startswith("seg_") and name not in known:
+            os.remove(os.path.join(session.directory, name))
+
+    for seg in session.segments:
+        path = segment_path(session, seg)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"segment missing: {path}")
+        if os.path.getsize(path) != seg["bytes"]:
+            with open(path, "r+b") as f:
+                f.truncate(seg["bytes"])
+
+
+def locate_range(session: VideoSession, offset: int, length: int) -> list[tuple[str, int, int]]:
+    """
+    把整条流中的 [offset, offset + length) 映射到分段文件：
+    返回 [(分段路径, 段内偏移, 字节数), ...]，只涉及与区间相交的分段
+    """
+    end = min(offset + length, session.durable_offset)
+    parts = []
+    for seg in session.segments:
+        seg_start = seg["start_offset"]
+        seg_end = seg_start + seg["bytes"]
+        if seg_end <= offset or seg_start >= end:
+            continue
+        start = max(offset, seg_start)
+        parts.append((segment_path(session, seg), start - seg_start, min(end, seg_end) - start))
+    return parts
+
+
+class SegmentedVideoStore:
+    """
+    分段写入 + 清单维护，所有方法都是同步的，由 BufferedVideoWriter 在 IO 线程中调用。
+    轮转只发生在批次之间，一个批次不会被拆到两个分段里。
+    """
+
+    def __init__(self, session: VideoSession, max_bytes: int = None, max_seconds: float = None):
+        self.session = session
+        self.max_bytes = max_bytes or settings.VIDEO_SEGMENT_MAX_BYTES
+        self.max_seconds = max_seconds or settings.VIDEO_SEGMENT_MAX_SECONDS
+        self._file = None
+        self._segment: dict = None
+        self._head = b""                # 找到初始化段之前，流开头已写入的字节 (最多 _INIT_SCAN_LIMIT)
+
+    @property
+    def path(self) -> str:
+        return self.session.directory
+
+    @property
+    def bytes_written(self) -> int:
+        return self.session.durable_offset
+
+    def open(self):
+        os.makedirs(self.session.directory, exist_ok=True)
+        if self.session.segments:
+            # 续传：接着写最后一个分段，是否需要轮转由下一次 write 判断
+            self._segment = self.session.segments[-1]
+            self._file = open(segment_path(self.session, self._segment), "ab")
+            if self.session.init_length is None and self.session.durable_offset < _INIT_SCAN_LIMIT:
+                with open(segment_path(self.session, self.session.segments[0]), "rb") as f:
+                    self._head = f.read(self.session.segments[0]["bytes"])
+
+    def _scan_init(self, data: bytes):
+        """在流开头查找第一个 Cluster，确定初始化段长度"""
+        if self.session.init_length is not None or len(self._head) >= _INIT_SCAN_LIMIT:
+            return
+        self._head += data[:_INIT_SCAN_LIMIT - len(self._head)]
+        pos = self._head.find(_CLUSTER_ID)
+        if pos >= 0:
+            self.session.init_length = pos
+            self._head = b""
+
+    def _needs_rotation(self) -> bool:
+        if self._segment is None:
+            return True
+        if self._segment["bytes"] == 0:
+            return False
+        return (self._segment["bytes"] >= self.max_bytes
+                or time.time() - self._segment["started_at"] >= self.max_seconds)
+
+    def _rotate(self, fsync: bool):
+        if self._file is not None:
+            self._close_file(fsync)
+        index = len(self.session.segments)
+        now = time.time()
+        self._segment = {
+            "index": index,
+            "file": f"seg_{index:05d}.webm",
+            "start_offset": self.session.durable_offset,
+            "bytes": 0,
+            "first_seq": None,
+            "last_seq": None,
+            "started_at": now,
+            "ended_at": now,
+        }
+        self._file = open(segment_path(self.session, self._segment), "ab")
+        self.session.segments.append(self._segment)
+
+    def write(self, data: bytes, last_seq: int = None, fsync: bool = False, fsync_on_rotate: bool = True):
+        """
+        写入一个批次并更新清单：数据先落盘，清单后更新，清单里的 offset 永远不会超过真实数据
+        fsync=True 时数据与清单都 fsync 后才返回，调用方之后回的 ack 断电也成立
+        """
+        if self._needs_rotation():
+            self._rotate(fsync_on_rotate)
+
+        self._file.write(data)
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+
+        seg = self._segment
+        seg["bytes"] += len(data)
+        seg["ended_at"] = time.time()
+        if last_seq is not None:
+            if seg["first_seq"] is None:
+                seg["first_seq"] = self.session.durable_seq + 1
+            seg["last_seq"] = last_seq
+            self.session.durable_seq = last_seq
+        self.session.durable_offset += len(data)
+        self._scan_init(data)
+        save_session(self.session, fsync=fsync)
+
+    def _close_file(self, fsync: bool):
+        try:
+            self._file.flush()
+            if fsync:
+                os.fsync(self._file.fileno())
+        finally:
+            self._file.close()
+            self._file = None
+
+    def close(self, fsync: bool):
+        if self._file is not None:
+            self._close_file(fsync)
@@ -4,6 +4,7 @@ import asyncio
 import pandas as pd
 from app.db.session import AsyncSessionLocal
 from app.models.Character_question import Character_question
+from app.utils.question_bank import bump_question_bank_version
 
 # 1. 路径设置
 sys.path.append(os.getcwd())
@@ -83,6 +84,12 @@ async def import_data():
                 await session.commit()
                 print("------------------------------------------------")
                 print(f"🎉 成功导入 {success_count} 条题目！")
+
+                # 通知所有 API worker 重新加载题库索引
+                try:
+                    await bump_question_bank_version()
+                except Exception as e:
+                    print(f"⚠️ 题库版本号更新失败，API 需重启后才能看到新题目: {e}")
                 
                 if question_obj:
                     # 验证一下最后一条数据
@@ -0,0 +1,21 @@
+"""
+测试环境：在导入 app 之前准备好必填配置，数据库用临时 SQLite 文件
+运行 (在 backstage 目录下)：
+    python -m pytest -q
+"""
+
+import os
+import sys
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp(prefix="ai_interviewer_test_")
+
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(_tmp_dir, 'test.db')}")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("Silicon_OCR_API_Key", "test-key")
+os.environ.setdefault("DeepSeek_API_Key", "test-key")
+os.environ.setdefault("OCR_CACHE_DIR", os.path.join(_tmp_dir, "ocr_cache"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,63 @@
+"""简历解析失败时：抛出异常交给任务队列重试，错误信息不写入 OCR 缓存，也不当成解析结果入库"""
+
+import asyncio
+
+import fitz
+import pytest
+
+from app.api.interviewee_api import Resume_upload_api
+from app.db.session import engine
+from app.models.Resume_message import Resume_messages
+from app.utils import qwen_client
+
+
+def _make_scanned_pdf(path: str):
+    doc = fitz.open()
+    page = doc.new_page()
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 64, 64), False)
+    pix.clear_with(200)
+    page.insert_image(page.rect, pixmap=pix)
+    doc.save(path)
+    doc.close()
+
+
+async def _broken_render(file_path, page_indexes):
+    raise OSError("render pool unavailable")
+
+
+def test_render_failure_raises_and_is_not_cached(tmp_path, monkeypatch):
+    pdf_path = str(tmp_path / "resume.pdf")
+    _make_scanned_pdf(pdf_path)
+
+    cached = []
+
+    async def fake_get_cached_ocr(key):
+        return None
+
+    async def fake_set_cached_ocr(key, text):
+        cached.append(text)
+
+    monkeypatch.setattr(qwen_client, "_render_pdf_pages", _broken_render)
+    monkeypatch.setattr(Resume_upload_api, "get_cached_ocr", fake_get_cached_ocr)
+    monkeypatch.setattr(Resume_upload_api, "set_cached_ocr", fake_set_cached_ocr)
+
+    with pytest.raises(qwen_client.ResumeParseError, match="PDF 转换错误"):
+        asyncio.run(qwen_client.call_vl_model_multipage(pdf_path))
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(lambda c: Resume_messages.__table__.create(c, checkfirst=True))
+        try:
+            await Resume_upload_api.process_and_save_resume(
+                user_id="bob",
+                job_data={"job_name": "前端开发", "job_desc": "", "company_name": "", "company_desc": ""},
+                file_path=pdf_path,
+                resume_text_input="",
+                file_sha256="0" * 64,
+            )
+        finally:
+            await engine.dispose()
+
+    with pytest.raises(RuntimeError, match="简历解析失败"):
+        asyncio.run(run())
+    assert cached == []
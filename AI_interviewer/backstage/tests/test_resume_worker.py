@@ -0,0 +1,77 @@
+"""
+简历 worker：在与 main() 相同方式启动的 worker 子进程里跑一条真实的扫描版 PDF 任务，
+覆盖 “worker 进程内再创建 PDF 渲染进程池” 这一路径 (守护进程不允许有子进程)
+"""
+
+import asyncio
+import functools
+import sqlite3
+
+import fitz
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models.Resume_message import Resume_messages
+from app.utils import qwen_client
+from app.utils.resume_worker import handle_resume_job, start_worker_processes, stop_worker_processes
+
+FAKE_OCR_TEXT = "张三\n后端开发工程师"
+
+
+async def _fake_chat_completion(provider, messages, model=None, **kwargs):
+    images = [part for part in messages[0]["content"] if part["type"] == "image_url"]
+    assert images and images[0]["image_url"]["url"].startswith("data:image/jpeg;base64,")
+    return FAKE_OCR_TEXT
+
+
+def _make_scanned_pdf(path: str):
+    """只有一张图片、没有文本层的 PDF，会走渲染 + 多模态模型"""
+    doc = fitz.open()
+    page = doc.new_page()
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 64, 64), False)
+    pix.clear_with(200)
+    page.insert_image(page.rect, pixmap=pix)
+    doc.save(path)
+    doc.close()
+
+
+async def _run_job(file_path: str):
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda c: Resume_messages.__table__.create(c, checkfirst=True))
+    try:
+        await handle_resume_job({
+            "user_id": "alice",
+            "job_data": {"job_name": "后端开发", "job_desc": "", "company_name": "", "company_desc": ""},
+            "file_path": file_path,
+            "resume_text_input": "",
+            "file_sha256": None,
+        })
+    finally:
+        await engine.dispose()
+
+
+def _worker_target(index: int, file_path: str):
+    qwen_client.chat_completion = _fake_chat_completion
+    try:
+        asyncio.run(_run_job(file_path))
+    finally:
+        qwen_client.shutdown_render_pool(wait=True)
+
+
+def test_scanned_pdf_job_in_worker_process(tmp_path):
+    pdf_path = str(tmp_path / "resume.pdf")
+    _make_scanned_pdf(pdf_path)
+
+    processes = start_worker_processes(1, target=functools.partial(_worker_target, file_path=pdf_path))
+    try:
+        processes[0].join(60)
+        assert processes[0].exitcode == 0
+    finally:
+        stop_worker_processes(processes)
+
+    db_path = settings.DATABASE_URL.split("///", 1)[1]
+    with sqlite3.connect(db_path) as conn:
+        row = conn.execute(
+            "SELECT resume_file_text FROM interview_resume_messages WHERE user_id = ?", ("alice",)
+        ).fetchone()
+    assert row == (FAKE_OCR_TEXT,)
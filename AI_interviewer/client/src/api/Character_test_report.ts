@@ -10,6 +10,9 @@ export interface ReportSchema {
 
     competency_radar: CompetencyRadarItem[]
     motivation_values: MotivationValues
+
+    // ready 已生成 / pending 后台生成中 / failed 重试次数用完仍失败（调用 retryReport 重新生成）
+    status?: 'ready' | 'pending' | 'failed'
 }
 
 export interface CompetencyRadarItem {
@@ -24,10 +27,27 @@ export interface MotivationValues {
   risk_warnings: string[]
 }
 
-export function getReport() {
-  return request<any, ReportSchema>({
-    url: '/api/interviewee/generate_report',
-    method: 'get',
-    timeout: 120000, // 单独设置超时时间为 120 秒，防止生成报告时间过长导致前端超时
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms))
+
+export async function getReport() {
+  // 报告由后台任务生成：status 为 pending 时每 2 秒轮询一次，最多等待 120 秒
+  const deadline = Date.now() + 120000
+  while (true) {
+    const res = await request<any, ReportSchema>({
+      url: '/api/interviewee/generate_report',
+      method: 'get',
+    })
+    if (res.status !== 'pending' || Date.now() > deadline) {
+      return res
+    }
+    await sleep(2000)
+  }
+}
+
+// 报告生成失败后手动重新生成：成功后重新调用 getReport 轮询即可（冷却期内返回 429）
+export function retryReport() {
+  return request<any, { status: string }>({
+    url: '/api/interviewee/retry_report',
+    method: 'post',
   })
-}
\ No newline at end of file
+}
@@ -8,11 +8,13 @@ export interface InterviewRecord {
   time: string
   position_name?: string
   interviewer_name?: string
+  video_session_id?: string | null
 }
 
 export interface CreateRecordParams {
   position_id: number
   interviewer_id: number
+  video_session_id?: string | null // 录像上传会话 ID，报告页据此查询录像分析
 }
 
 export function createRecord(data: CreateRecordParams) {
@@ -23,9 +25,16 @@ export function createRecord(data: CreateRecordParams) {
   })
 }
 
-export function getRecords() {
-  return request<any, InterviewRecord[]>({
+export interface InterviewRecordPage {
+  items: InterviewRecord[]
+  next_cursor: string | null
+}
+
+// 游标分页：首次不传 cursor，之后传上一页返回的 next_cursor
+export function getRecords(cursor?: string | null, limit = 20) {
+  return request<any, InterviewRecordPage>({
     url: '/api/interviewee/get_records',
-    method: 'get'
+    method: 'get',
+    params: { limit, ...(cursor ? { cursor } : {}) }
   })
 }
@@ -18,4 +18,23 @@ export function getInterviewReport() {
     url: '/api/interviewee/generate_report',
     method: 'get',
   })
-}
\ No newline at end of file
+}
+
+export interface VideoAnalysis {
+  session_id: string
+  status: 'pending' | 'running' | 'done' | 'failed'
+  stages: Record<string, string>
+  errors: Record<string, string>
+  duration: string
+  emotions: { name: string, level: string }[]
+  video: Record<string, any> | null
+  audio: Record<string, any> | null
+}
+
+// 录像分析结果：分析中时后端返回 202 / status=running，调用方轮询即可
+export function getVideoAnalysis(sessionId: string) {
+  return request<any, VideoAnalysis>({
+    url: `/api/interviewee/video_analysis/${sessionId}`,
+    method: 'get',
+  })
+}
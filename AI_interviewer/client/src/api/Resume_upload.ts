@@ -1,7 +1,7 @@
 import request from '../utils/request'
 
 export function createInterviewSession(data: FormData) {
-  return request<any, { sessionId: string }>({
+  return request<any, { status: string; job_id: string }>({
     url: '/api/interview/upload_resume',
     method: 'post',
     data,
@@ -9,4 +9,21 @@ export function createInterviewSession(data: FormData) {
       'Content-Type': 'multipart/form-data'
     }
   })
-}
\ No newline at end of file
+}
+
+export interface ResumeJobStatus {
+  job_id: string
+  status: 'pending' | 'running' | 'done' | 'failed'
+  attempts: number
+  max_attempts: number
+  retry_at: number | null
+  error: string | null
+}
+
+// 简历解析任务状态，上传后轮询直到 done / failed
+export function getResumeJobStatus(jobId: string) {
+  return request<any, ResumeJobStatus>({
+    url: `/api/interview/upload_resume/status/${jobId}`,
+    method: 'get'
+  })
+}
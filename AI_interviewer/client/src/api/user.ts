@@ -21,4 +21,14 @@ export function loginApi(data: object) {
 
 export const registerApi = (data: any) => {
   return request.post('/api/interviewee/register', data)
-}
\ No newline at end of file
+}
+
+// 退出登录：吊销刷新令牌
+export function logoutApi(refreshToken: string) {
+  return request.post('/api/interviewee/logout', { refresh_token: refreshToken })
+}
+
+// 退出所有设备：吊销当前用户的全部刷新令牌
+export function logoutAllApi() {
+  return request.post('/api/interviewee/logout_all')
+}
@@ -10,6 +10,7 @@ const CreateJob_1 = () => import('../views/CreateJob_1.vue')
 const CreateJob_2 = () => import('../views/CreateJob_2.vue')
 const CreateJob_3 = () => import('../views/CreateJob_3.vue')
 const Interview_Review = () => import('../views/Interview_Review.vue')
+const Interview_report = () => import('../views/Interview_report.vue')
 const Profile = () => import('../views/Profile.vue')
 const Interview = () => import('../views/Interview.vue')
 const CharacterTest = () => import('../views/Character_test.vue')
@@ -68,6 +69,11 @@ const routes: Array<RouteRecordRaw> = [
         name: 'Interview_Review', 
         component: Interview_Review
       },
+      {
+        path: 'Interview_report/:id',
+        name: 'Interview_report',
+        component: Interview_report
+      },
       {
         path: 'Interview',
         name: 'Interview',
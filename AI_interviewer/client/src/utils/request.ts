@@ -29,15 +29,72 @@ service.interceptors.request.use(
   }
 )
 
-// 3. 响应拦截器：脱壳处理 & 统一报错
+// 3. 刷新令牌：访问令牌有效期很短，过期后用 refresh_token 换新 (同一时刻只发一个刷新请求)
+let refreshing: Promise<string | null> | null = null
+
+export function saveTokens(token: string, refreshToken?: string | null) {
+  localStorage.setItem('token', token)
+  if (refreshToken) localStorage.setItem('refresh_token', refreshToken)
+}
+
+export function clearTokens() {
+  localStorage.removeItem('token')
+  localStorage.removeItem('refresh_token')
+}
+
+export function refreshAccessToken(): Promise<string | null> {
+  if (refreshing) return refreshing
+  const refreshToken = localStorage.getItem('refresh_token')
+  if (!refreshToken) return Promise.resolve(null)
+
+  // 直接用 axios 发请求，避免走下面的 401 拦截形成循环
+  refreshing = axios
+    .post(`${service.defaults.baseURL}/api/interviewee/refresh`, { refresh_token: refreshToken })
+    .then((res) => {
+      saveTokens(res.data.token, res.data.refresh_token)
+      return res.data.token as string
+    })
+    .catch(() => {
+      clearTokens()
+      return null
+    })
+    .finally(() => {
+      refreshing = null
+    })
+  return refreshing
+}
+
+// 访问令牌快过期 (或已过期) 时先刷新，返回可用的令牌；WebSocket 每次 (重) 连接前调用
+export async function getFreshAccessToken(): Promise<string | null> {
+  const token = localStorage.getItem('token')
+  if (!token) return null
+  try {
+    const payload = JSON.parse(atob(token.split('.')[1].replace(/-/g, '+').replace(/_/g, '/')))
+    if (payload.exp * 1000 - Date.now() > 60 * 1000) return token
+  } catch {
+    return token
+  }
+  return (await refreshAccessToken()) || token
+}
+
+// 4. 响应拦截器：脱壳处理 & 统一报错
 service.interceptors.response.use(
   (response) => {
     // Axios 默认包了一层 data，我们这里直接返回后端的数据
     const res = response.data
     return res
   },
-  (error) => {
-    // 处理 401 (未授权) 等网络错误
+  async (error) => {
+    // 401：访问令牌过期，刷新后重试一次原请求
+    const config = error.config
+    if (error.response?.status === 401 && config && !config._retried) {
+      config._retried = true
+      const token = await refreshAccessToken()
+      if (token) {
+        config.headers.Authorization = `Bearer ${token}`
+        return service(config)
+      }
+    }
     console.error('请求拦截器报错:', error)
     return Promise.reject(error)
   }
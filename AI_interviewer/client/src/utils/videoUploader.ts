@@ -0,0 +1,146 @@
+// 可续传的视频分片上传（对应后端 /ws/video_stream 的 hello / ready / ack / gap / end 协议）
+// - 每个分片带 8 字节大端序号，收到 ack 之前一直留在内存里
+// - 断线后自动重连，带上 session_id 续传，从服务端返回的 next_seq 开始重发
+// - url 可以传函数：每次 (重) 连接前重新生成，用于带上刷新后的访问令牌
+
+const HEADER_BYTES = 8;
+const MAX_RETRY_DELAY = 10000;
+
+export class ResumableVideoUploader {
+  private url: string | (() => string | Promise<string>);
+  private ws: WebSocket | null = null;
+  private sessionId: string | null = null;
+  private nextSeq = 0;
+  private pending = new Map<number, Blob>(); // 已发送但未确认的分片
+  private ready = false;
+  private finishing = false;
+  private stopped = false;
+  private retry = 0;
+  private sendChain: Promise<void> = Promise.resolve(); // 保证分片按序号顺序发送
+  onReady?: (sessionId: string) => void; // 参数为服务端分配的 session_id，用于之后查询录像分析结果
+
+  constructor(url: string | (() => string | Promise<string>)) {
+    this.url = url;
+  }
+
+  // 服务端分配的上传会话 ID，收到 ready 之前为 null
+  get currentSessionId(): string | null {
+    return this.sessionId;
+  }
+
+  start() {
+    this.connect();
+  }
+
+  // 录制器每产生一个分片调用一次
+  send(blob: Blob) {
+    const seq = this.nextSeq++;
+    this.pending.set(seq, blob);
+    if (this.ready) this.sendFrame(seq, blob);
+  }
+
+  // 录制结束：等已缓存的分片发完后通知服务端
+  finish() {
+    this.finishing = true;
+    if (this.ready) this.sendEnd();
+  }
+
+  // 直接放弃上传（例如离开页面）
+  abort() {
+    this.stopped = true;
+    this.ws?.close();
+    this.ws = null;
+  }
+
+  private async connect() {
+    if (this.stopped) return;
+    const url = typeof this.url === 'function' ? await this.url() : this.url;
+    if (this.stopped) return;
+    const ws = new WebSocket(url);
+    ws.binaryType = 'arraybuffer';
+    this.ws = ws;
+
+    ws.onopen = () => {
+      ws.send(JSON.stringify({ type: 'hello', session_id: this.sessionId }));
+    };
+
+    ws.onmessage = (event) => {
+      if (typeof event.data !== 'string') return;
+      const msg = JSON.parse(event.data);
+      switch (msg.type) {
+        case 'ready':
+          this.retry = 0;
+          this.sessionId = msg.session_id;
+          this.dropAcked(msg.next_seq - 1);
+          this.ready = true;
+          this.resendFrom(msg.next_seq);
+          if (this.finishing) this.sendEnd();
+          this.onReady?.(msg.session_id);
+          break;
+        case 'ack':
+          this.dropAcked(msg.seq);
+          break;
+        case 'gap':
+          this.resendFrom(msg.expected);
+          break;
+        case 'done':
+          this.stopped = true;
+          this.pending.clear();
+          break;
+        case 'error':
+          // 会话无法续传（已结束 / 不属于当前用户），不再重连
+          console.error('视频上传会话错误:', msg.reason);
+          this.stopped = true;
+          break;
+      }
+    };
+
+    ws.onerror = (error) => {
+      console.error('WebSocket 错误:', error);
+    };
+
+    ws.onclose = (e) => {
+      console.log('WebSocket 已断开', e.code, e.reason);
+      this.ready = false;
+      if (this.ws === ws) this.ws = null;
+      if (this.stopped) return;
+      // 指数退避重连
+      const delay = Math.min(1000 * 2 ** this.retry, MAX_RETRY_DELAY);
+      this.retry++;
+      setTimeout(() => this.connect(), delay);
+    };
+  }
+
+  private dropAcked(seq: number) {
+    for (const key of this.pending.keys()) {
+      if (key <= seq) this.pending.delete(key);
+    }
+  }
+
+  private resendFrom(seq: number) {
+    const seqs = [...this.pending.keys()].filter((key) => key >= seq).sort((a, b) => a - b);
+    for (const key of seqs) {
+      this.sendFrame(key, this.pending.get(key)!);
+    }
+  }
+
+  private sendFrame(seq: number, blob: Blob) {
+    const ws = this.ws;
+    this.sendChain = this.sendChain.then(async () => {
+      const body = new Uint8Array(await blob.arrayBuffer());
+      const frame = new Uint8Array(HEADER_BYTES + body.byteLength);
+      new DataView(frame.buffer).setBigUint64(0, BigInt(seq));
+      frame.set(body, HEADER_BYTES);
+      if (ws && ws === this.ws && ws.readyState === WebSocket.OPEN) ws.send(frame);
+    }).catch((e) => console.error('视频分片发送失败:', e));
+  }
+
+  private sendEnd() {
+    const ws = this.ws;
+    this.sendChain = this.sendChain.then(() => {
+      if (ws && ws === this.ws && ws.readyState === WebSocket.OPEN) {
+        ws.send(JSON.stringify({ type: 'end' }));
+      }
+    });
+  }
+}